@@ -88,6 +88,8 @@ if __name__ == "__main__":
             'console_scripts': [
                 'veles=veles.__main__:__run__',
                 'compare_snapshots=veles.scripts.compare_snapshots:main',
+                'collect_snapshot_blobs='
+                'veles.scripts.collect_snapshot_blobs:main',
                 'bboxer=veles.scripts.bboxer:main',
                 'generate_veles_frontend=veles.scripts.generate_frontend:main',
                 'veles_graphics_client=veles.graphics_client:main']
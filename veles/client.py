@@ -58,6 +58,8 @@ from veles.network_common import NetworkAgent, StringLineReceiver, IDLogger
 from veles.prng import get as get_rg
 from veles.thread_pool import errback
 from veles.timeit2 import timeit
+from veles.tracer import tracer
+from veles.update_encoding import UpdateEncoding
 
 
 class ZmqDealer(ZmqConnection):
@@ -135,7 +137,7 @@ class ZmqDealer(ZmqConnection):
     def total_request_time(self):
         return sum((val[0] for val in self._request_timings.values()))
 
-    def request(self, command, message=b''):
+    def request(self, command, message=b'', zerocopy_owned=False):
         self.event("ZeroMQ", "begin", dir="send", command=command, height=0.5)
         if self.shmem is not None and command == 'update':
             self.shmem.seek(0)
@@ -144,7 +146,8 @@ class ZmqDealer(ZmqConnection):
                 self.send,
                 self.id, command.encode('charmap'), message,
                 io=self.shmem,
-                pickles_compression=self.pickles_compression)
+                pickles_compression=self.pickles_compression,
+                zerocopy_owned=zerocopy_owned)
             if command not in self._request_timings:
                 self._request_timings[command] = (0.0, 0)
             self._request_timings[command] = (
@@ -156,7 +159,8 @@ class ZmqDealer(ZmqConnection):
         if self.is_ipc and command == 'update' and self.shmem is None:
             self.shmem = SharedIO(
                 "veles-update-" + self.id.decode('charmap'),
-                int(pickles_size * (1.0 + ZmqDealer.RESERVE_SHMEM_SIZE)))
+                int(pickles_size * (1.0 + ZmqDealer.RESERVE_SHMEM_SIZE)),
+                root.common.engine.shared_memory_zerocopy)
         self.event("ZeroMQ", "end", dir="send", command=command, height=0.5)
 
 
@@ -211,6 +215,7 @@ class VelesProtocol(StringLineReceiver, IDLogger):
         self._power_upload_time = 0
         self._power_upload_threshold = 60
         self.rand = get_rg()
+        self._request_times = {}
 
     def connectionMade(self):
         self.info("Connected in %s state", self.state.current)
@@ -243,6 +248,7 @@ class VelesProtocol(StringLineReceiver, IDLogger):
                                "but my ID is None")
                     self.request_id()
                     return
+                self.host.workflow.set_update_encoding(msg.get("encoding"))
                 self.request_job()
                 return
             cid = msg.get("id")
@@ -266,6 +272,7 @@ class VelesProtocol(StringLineReceiver, IDLogger):
             self.host.zmq_connection = self.zmq_connection = ZmqDealer(
                 cid, self, ZmqEndpoint("connect", endpoint))
             self.info("Connected to ZeroMQ endpoint %s", endpoint)
+            self.host.workflow.set_update_encoding(msg.get("encoding"))
             data = msg.get('data')
             if data is not None:
                 self._set_deferred(
@@ -275,7 +282,17 @@ class VelesProtocol(StringLineReceiver, IDLogger):
             return
         self.disconnect("disconnect: invalid state %s", self.state.current)
 
+    def _trace_request(self, command):
+        if tracer.enabled:
+            self._request_times[command] = tracer.now()
+
+    def _trace_response(self, command):
+        start = self._request_times.pop(command, None)
+        if tracer.enabled and start is not None:
+            tracer.record("master", "wait_" + command, start, tracer.now())
+
     def job_received(self, job):
+        self._trace_response("job")
         if not job:
             # False, None or empty string mean job refusal
             self.info("Job was refused")
@@ -342,6 +359,7 @@ class VelesProtocol(StringLineReceiver, IDLogger):
             self.request_update()
 
     def update_result_received(self, result):
+        self._trace_response("update")
         if result == b'0':
             self.warning("Last update was rejected")
         else:
@@ -370,7 +388,8 @@ class VelesProtocol(StringLineReceiver, IDLogger):
                 "argv": sys.argv,
                 "executable": sys.executable,
                 "PYTHONPATH": os.getenv("PYTHONPATH"),
-                "cwd": os.getcwd()}
+                "cwd": os.getcwd(),
+                "encodings": UpdateEncoding.supported()}
 
     def send_id(self):
         common = self._common_id()
@@ -385,6 +404,7 @@ class VelesProtocol(StringLineReceiver, IDLogger):
 
     def request_job(self):
         self.state.request_job()
+        self._trace_request("job")
         self.zmq_connection.request("job")
 
     def request_update(self):
@@ -393,7 +413,12 @@ class VelesProtocol(StringLineReceiver, IDLogger):
         if self.host.async:
             # we have to copy the update since it may be overwritten in do_job
             update = copy(update)
-        self.zmq_connection.request("update", update or b'')
+        self._trace_request("update")
+        # In sync mode, the next job starts after the master confirms the
+        # update, that is, after all its frames are transmitted, so the
+        # "zerocopy" arrays need not be copied
+        self.zmq_connection.request("update", update or b'',
+                                    zerocopy_owned=not self.host.async)
 
     def disconnect(self, msg, *args, **kwargs):
         self.error(msg, *args, **kwargs)
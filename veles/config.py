@@ -199,6 +199,9 @@ root.common.update({
         "misprints": False,
         "undefined_configs": False,
         "run": False,
+        # Record the timeline of unit method calls, see veles/tracer.py
+        "timeline": False,
+        "timeline_capacity": 1 << 16,
     },
     "warnings": {
         "numba": True
@@ -210,6 +213,10 @@ root.common.update({
     "graphics": {
         "multicast_address": "239.192.1.1",
         "blacklisted_ifaces": set(),
+        # The plotters send only the changes (see veles/graphics_delta.py);
+        # the full states are resent this often (in seconds) for the late
+        # subscribers
+        "resync_interval": 60,
         "matplotlib": {
             "backend": "Qt4Agg",
             "webagg_port": 8081,
@@ -224,6 +231,13 @@ root.common.update({
         "pidfile": "/var/run/veles/web_status",
         "root": "/usr/share/veles/web",
         "drop_time": 30 * 24 * 3600,
+        # Event aggregates kept in memory (see veles/event_aggregator.py):
+        # (bucket width in seconds, number of buckets) per resolution and
+        # the maximal delay of the events in MongoDB
+        "metrics": {
+            "resolutions": ((10, 360), (300, 288), (3600, 720)),
+            "lag": 10,
+        },
     },
     "api": {
         "port": 8180,
@@ -260,9 +274,38 @@ root.common.update({
         # Disable Numba JIT while debugging or on alternative interpreters
         "disable_numba": (sys.gettrace() is not None or
                           platform.python_implementation() != "CPython"),
+        # None, "gzip", "snappy", "xz" or "zerocopy" (numpy arrays are sent
+        # as separate ZeroMQ frames instead of being pickled)
         "network_compression": (None if  # snappy is slow on CPython
                                 platform.python_implementation() == "CPython"
                                 else "snappy"),
+        # ipc slaves and the master receive read-only views of the numpy
+        # arrays in the shared memory instead of their copies; the views are
+        # overwritten by the next job or update, so they must be consumed
+        # before replying (see SharedIO.check())
+        "shared_memory_zerocopy": False,
+        # Warm processes which evaluate the chromosomes and the ensemble
+        # models (see veles/evaluation_pool.py); size = 0 means that a new
+        # interpreter is started for each evaluation, size > 0 is the
+        # maximal number of the concurrent evaluations
+        "evaluation_pool": {
+            "size": 0,
+            "max_jobs": 20,
+        },
+        # The number of threads of "pgz" compression (0 means all the cores)
+        "compression_threads": 0,
+        # Restore the deduplicated snapshot arrays as copy-on-write memory
+        # maps which are read on first access (see SnapshotBlobs)
+        "mmap_snapshots": False,
+        # Run sequential unit chains inline (see Workflow.compile_plan())
+        "compiled_plan": False,
+        # Encodings of the jobs and of the updates negotiated with slaves:
+        # None, "xor", "topk" or "float16" (see veles/update_encoding.py)
+        "update_encoding": {
+            "job": None,
+            "update": None,
+            "topk_ratio": 0.01,
+        },
         "source_dirs": (os.environ.get("VELES_ENGINE_DIRS", "").split(":") +
                         ["/usr/share/veles"]),
         "device_dirs": ["/usr/share/veles/devices",
@@ -277,6 +320,14 @@ root.common.update({
             "nvcc": "nvcc"
         }
     },
+    "loader": {
+        # MinibatchesLoader keeps this many bytes of decoded chunks
+        "chunks_cache_size": 256 * 1024 * 1024,
+        # The size limit of the blobs of the preprocessed images cache
+        # (see veles/loader/image_cache.py)
+        "preprocessed_images_cache_size": 4 * 1024 * 1024 * 1024,
+        "decompression_threads": 4,
+    },
     "genetics": {
         "disable": {
             "plotting": True
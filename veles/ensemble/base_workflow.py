@@ -44,7 +44,9 @@ from tempfile import NamedTemporaryFile
 from six import string_types, add_metaclass
 from zope.interface import implementer
 
+from veles.config import root
 from veles.distributable import IDistributable
+from veles.evaluation_pool import EvaluationPool
 from veles.launcher import filter_argv
 from veles.mutable import Bool
 from veles.paths import __root__
@@ -133,12 +135,17 @@ class EnsembleModelManagerBase(Unit):
         return {"models": self.results}
 
     def _exec(self, argv, fin, action):
-        __main__ = os.path.join(__root__, "veles", "__main__.py")
-        argv = [sys.executable, __main__] + argv
-        self.debug("exec: %s", " ".join(argv))
-        env = {"PYTHONPATH": os.getenv("PYTHONPATH", __root__)}
-        env.update(os.environ)
-        if subprocess.call(argv, env=env):
+        if root.common.engine.evaluation_pool.size > 0:
+            self.debug("exec in a warm process: %s", " ".join(argv))
+            code = EvaluationPool.instance().execute(argv)
+        else:
+            __main__ = os.path.join(__root__, "veles", "__main__.py")
+            argv = [sys.executable, __main__] + argv
+            self.debug("exec: %s", " ".join(argv))
+            env = {"PYTHONPATH": os.getenv("PYTHONPATH", __root__)}
+            env.update(os.environ)
+            code = subprocess.call(argv, env=env)
+        if code:
             self.warning("Failed to %s model #%d", action, self._model_index)
             return
         try:
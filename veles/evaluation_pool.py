@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+Pool of warm processes which execute Veles command lines.
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+import json
+import os
+from six import PY3
+import subprocess
+import sys
+import threading
+import traceback
+
+from veles.config import root
+from veles.logger import Logger
+from veles.paths import __root__
+from veles.thread_pool import ThreadPool
+
+
+class EvaluationWorker(object):
+    """
+    Handle of a single warm process. It has already imported Veles with all
+    the dependencies and forks a child for every command line it receives,
+    so the child starts executing the workflow immediately.
+    """
+
+    def __init__(self, env):
+        rfd, wfd = os.pipe()
+        kwargs = {"pass_fds": (wfd,)} if PY3 else {"close_fds": False}
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "veles.evaluation_pool", str(wfd)],
+                stdin=subprocess.PIPE, env=env, universal_newlines=True,
+                **kwargs)
+        finally:
+            os.close(wfd)
+        self.results = os.fdopen(rfd, "r")
+        self.jobs = 0
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def execute(self, argv):
+        """
+        :return: The exit code of the command line or None if the worker
+        has died.
+        """
+        self.jobs += 1
+        try:
+            self.process.stdin.write(json.dumps({
+                "argv": argv, "cwd": os.getcwd()}) + "\n")
+            self.process.stdin.flush()
+            reply = self.results.readline()
+        except (IOError, OSError):
+            return None
+        if not reply:
+            return None
+        return json.loads(reply)["code"]
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        self.process.wait()
+        self.results.close()
+
+
+class EvaluationPool(Logger):
+    """
+    Executes "python -m veles <argv>" command lines in warm processes
+    instead of starting a new interpreter each time, which saves the
+    startup and the imports. At most "size" command lines run at once; a
+    worker is replaced after "max_jobs" command lines or after a failure.
+    The methods are thread safe.
+    """
+
+    def __init__(self, size=None, max_jobs=None):
+        super(EvaluationPool, self).__init__()
+        cfg = root.common.engine.evaluation_pool
+        self.size = size if size is not None else cfg.size
+        self.max_jobs = max_jobs if max_jobs is not None else cfg.max_jobs
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.size)
+
+    @property
+    def idle_workers(self):
+        return len(self._idle)
+
+    def execute(self, argv):
+        """
+        Runs the command line in one of the warm processes and waits for it.
+        :param argv: The Veles command line arguments (without the
+        interpreter and the executable).
+        :return: The exit code.
+        """
+        with self._slots:
+            worker = self._acquire()
+            code = worker.execute(argv)
+            if code is None:
+                self.warning("Evaluation worker %d has died",
+                             worker.process.pid)
+                code = -1
+            if code != 0 or worker.jobs >= self.max_jobs or \
+                    not worker.alive:
+                self.debug("Recycling evaluation worker %d",
+                           worker.process.pid)
+                worker.close()
+            else:
+                with self._lock:
+                    self._idle.append(worker)
+        return code
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.close()
+
+    def _acquire(self):
+        with self._lock:
+            while len(self._idle) > 0:
+                worker = self._idle.pop()
+                if worker.alive:
+                    return worker
+                worker.close()
+        env = {"PYTHONPATH": os.getenv("PYTHONPATH", __root__)}
+        env.update(os.environ)
+        worker = EvaluationWorker(env)
+        self.debug("Started evaluation worker %d", worker.process.pid)
+        return worker
+
+    _instance = None
+
+    @staticmethod
+    def instance():
+        """
+        :return: The pool shared by the whole process.
+        """
+        if EvaluationPool._instance is None:
+            EvaluationPool._instance = EvaluationPool()
+            ThreadPool.register_atexit(
+                EvaluationPool._instance.shutdown, weak=False)
+        return EvaluationPool._instance
+
+
+def _execute(argv):
+    from veles.__main__ import Main
+    sys.argv = [os.path.join(__root__, "veles", "__main__.py")] + argv
+    try:
+        sys.exit(Main().run())
+    except SystemExit as e:
+        code = e.code
+    except:
+        traceback.print_exc()
+        code = Main.EXIT_FAILURE
+    if code is None:
+        code = 0
+    elif not isinstance(code, int):
+        code = 1
+    return code
+
+
+def _serve(results_fd):
+    # Import everything the workflows need before the first fork
+    import veles.__main__  # pylint: disable=W0612
+    results = os.fdopen(results_fd, "w")
+    for line in iter(sys.stdin.readline, ""):
+        job = json.loads(line)
+        pid = os.fork()
+        if pid == 0:
+            results.close()
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, sys.stdin.fileno())
+            os.chdir(job["cwd"])
+            code = _execute(job["argv"])
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        if os.WIFEXITED(status):
+            code = os.WEXITSTATUS(status)
+        else:
+            code = -os.WTERMSIG(status)
+        results.write(json.dumps({"code": code}) + "\n")
+        results.flush()
+
+
+if __name__ == "__main__":
+    _serve(int(sys.argv[1]))
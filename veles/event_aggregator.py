@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+Rolling downsampled aggregates of the events, see Logger.event().
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+from collections import defaultdict
+import numpy
+
+
+class EventSeries(object):
+    """
+    Aggregates of the events with the same session, instance and name.
+    Each resolution is a (bucket width in seconds, number of buckets) pair;
+    every event is added to the corresponding bucket of every resolution
+    and the oldest buckets are discarded. A bucket is [count, total
+    duration, histogram of durations] where the histogram has
+    power-of-two bins, so that the percentiles are estimated within 2x.
+    """
+    MIN_EXPONENT = -20  # ~1 us
+    MAX_EXPONENT = 16  # ~18 hours
+
+    def __init__(self, resolutions):
+        self.resolutions = resolutions
+        self.levels = [{} for _ in resolutions]
+        self.count = 0
+        self.first = None
+        self.last = None
+
+    def add(self, time, duration=None):
+        """
+        :param time: The event time.
+        :param duration: The time between "begin" and "end" events or None
+        for "single" events.
+        """
+        self.count += 1
+        self.first = time if self.first is None else min(self.first, time)
+        self.last = time if self.last is None else max(self.last, time)
+        if duration is not None:
+            exponent = numpy.frexp(duration)[1] \
+                if duration > 0 else self.MIN_EXPONENT
+            hbin = min(max(exponent, self.MIN_EXPONENT),
+                       self.MAX_EXPONENT) - self.MIN_EXPONENT
+        for (width, length), buckets in zip(self.resolutions, self.levels):
+            key = int(time // width)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [0, 0.0, numpy.zeros(
+                    self.MAX_EXPONENT - self.MIN_EXPONENT + 1,
+                    dtype=numpy.int32)]
+                if len(buckets) > length:
+                    newest = max(buckets)
+                    for old in [k for k in buckets if k <= newest - length]:
+                        del buckets[old]
+            bucket[0] += 1
+            if duration is not None:
+                bucket[1] += duration
+                bucket[2][hbin] += 1
+
+    def select_level(self, start=None, resolution=None):
+        """
+        :return: The index of the finest resolution which is at least as
+        coarse as "resolution" and which still has the buckets since
+        "start".
+        """
+        for index, (width, length) in enumerate(self.resolutions):
+            if resolution is not None and width < resolution:
+                continue
+            buckets = self.levels[index]
+            if start is None or len(buckets) == 0 or \
+                    (max(buckets) - length + 1) * width <= start:
+                return index
+        return len(self.resolutions) - 1
+
+    def query(self, level, start=None, end=None,
+              percentiles=(50, 90, 99)):
+        """
+        :return: The columns of the buckets between start and end.
+        """
+        width = self.resolutions[level][0]
+        keys = sorted(k for k in self.levels[level]
+                      if (start is None or (k + 1) * width > start) and
+                      (end is None or k * width <= end))
+        buckets = [self.levels[level][k] for k in keys]
+        result = {"time": [k * width for k in keys],
+                  "count": [b[0] for b in buckets],
+                  "total": [b[1] for b in buckets]}
+        for p in percentiles:
+            result["p%d" % p] = [self._percentile(b[2], p) for b in buckets]
+        return result
+
+    def _percentile(self, histogram, percentile):
+        total = histogram.sum()
+        if total == 0:
+            return None
+        index = int(numpy.searchsorted(
+            numpy.cumsum(histogram), total * percentile / 100.0))
+        # the upper bound of the bin
+        return 2.0 ** (index + self.MIN_EXPONENT)
+
+
+class EventAggregator(object):
+    """
+    Incrementally maintains EventSeries for all the sessions, instances and
+    event names. The events are the documents written by Logger.event();
+    "begin" and "end" events are paired to measure the durations; the
+    counts include "end" and "single" events.
+    The events may be fed more than once: the ones with the same "_id"
+    which arrived within "lag" seconds are skipped.
+    """
+
+    def __init__(self, resolutions=((10, 360), (300, 288), (3600, 720)),
+                 lag=10):
+        self.resolutions = tuple(tuple(r) for r in resolutions)
+        self.lag = lag
+        self.series = {}
+        self.watermark = 0
+        self._begins = defaultdict(list)
+        self._recent_ids = {}
+
+    @property
+    def retention(self):
+        """
+        The time span which is covered by the coarsest resolution.
+        """
+        width, length = self.resolutions[-1]
+        return width * length
+
+    def update(self, events):
+        """
+        Adds the events to the aggregates.
+        :return: The number of new events.
+        """
+        added = 0
+        for event in events:
+            eid = event.get("_id")
+            if eid is not None:
+                if eid in self._recent_ids:
+                    continue
+                self._recent_ids[eid] = event["time"]
+            self._add(event)
+            added += 1
+        threshold = self.watermark - self.lag
+        for eid in [i for i, t in self._recent_ids.items() if t < threshold]:
+            del self._recent_ids[eid]
+        return added
+
+    def expire(self, threshold):
+        """
+        Forgets the series which did not receive events since "threshold".
+        """
+        for key in [k for k, s in self.series.items() if s.last < threshold]:
+            del self.series[key]
+        for key in [k for k, b in self._begins.items()
+                    if len(b) == 0 or b[-1] < threshold]:
+            del self._begins[key]
+
+    def query(self, session, instance=None, name=None, start=None, end=None,
+              resolution=None):
+        """
+        :return: The aggregates of the matching series in the compact
+        (columnar) form.
+        """
+        result = []
+        for (s, i, n), series in sorted(
+                self.series.items(),
+                key=lambda item: tuple(str(k) for k in item[0])):
+            if s != session or instance is not None and i != instance or \
+                    name is not None and n != name:
+                continue
+            level = series.select_level(start, resolution)
+            item = {"instance": i, "name": n, "count": series.count,
+                    "first": series.first, "last": series.last,
+                    "resolution": series.resolutions[level][0]}
+            item.update(series.query(level, start, end))
+            result.append(item)
+        return result
+
+    def _add(self, event):
+        time = event["time"]
+        self.watermark = max(self.watermark, time)
+        key = event["session"], event["instance"], event["name"]
+        etype = event.get("type")
+        if etype == "begin":
+            begins = self._begins[key + (event.get("domain"),)]
+            begins.append(time)
+            if len(begins) > 1000:
+                del begins[0]
+            return
+        duration = None
+        if etype == "end":
+            begins = self._begins.get(key + (event.get("domain"),))
+            if begins:
+                duration = time - begins.pop()
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = EventSeries(self.resolutions)
+        series.add(time, duration)
@@ -38,7 +38,8 @@ under the License.
 from zope.interface import implementer
 
 from veles.config import Config
-from veles.genetics.core import Chromosome, Population, IChromosome
+from veles.genetics.core import Chromosome, Population, IChromosome, \
+    ArrayPopulation
 from veles.units import Unit
 
 
@@ -225,3 +226,28 @@ class ConfigPopulation(Population):
         super(ConfigPopulation, self).on_generation_changed()
         self.info("Best configuration achieved so far:")
         print_config(self[0].config)
+
+
+class ConfigArrayPopulation(ConfigPopulation, ArrayPopulation):
+    """Vectorized :class:`ConfigPopulation`.
+    """
+    def __init__(self, unit, *args, **kwargs):
+        super(ConfigArrayPopulation, self).__init__(*args, **kwargs)
+        self.unit = unit
+
+    def init_unpickled(self):
+        super(ConfigArrayPopulation, self).init_unpickled()
+        self._unit_ = None
+
+    @property
+    def unit(self):
+        return self._unit_
+
+    @unit.setter
+    def unit(self, value):
+        if value is not None and not isinstance(value, Unit):
+            raise TypeError("unit must be a Unit (got %s)" % type(value))
+        self._unit_ = value
+
+    def evaluate_chromosome(self, chromo):
+        self.unit.evaluate(chromo)
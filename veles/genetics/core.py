@@ -49,6 +49,7 @@ import copy
 import numpy
 from zope.interface import Interface
 
+from veles.compat import from_none
 from veles.distributable import Pickleable
 from veles.mutable import Bool
 import veles.prng as prng
@@ -455,8 +456,7 @@ class Population(Pickleable):
         self.improved = Bool(True)
         self.on_generation_changed_callback = lambda: None
 
-        for _ in range(self.size):
-            self.add(self.new(size=self.optimization.size))
+        self.populate()
         if self.optimization.code == "gray":
             self.compute_gray_codes()
 
@@ -494,6 +494,12 @@ class Population(Pickleable):
         """
         return len(self.chromosomes)
 
+    def populate(self):
+        """Creates the initial random chromosomes.
+        """
+        for _ in range(self.size):
+            self.add(self.new(size=self.optimization.size))
+
     def new(self, binary=None, numeric=None, size=None):
         population = self
         kwargs = {k: v for k, v in locals().items() if k != "self"}
@@ -828,3 +834,348 @@ class Population(Pickleable):
         self.prev.worst_fit = self.worst_fit
         self.prev.median_fit = self.median_fit
         self.improved <<= True
+
+
+def _unwrap_chromosome(chromo):
+    return chromo
+
+
+class ArrayChromosome(object):
+    """Chromosome which lives in a row of :class:`ArrayPopulation`'s
+    matrices. The attributes other than the genes and the fitness (e.g.,
+    config or snapshot) are kept in the population as well. It is pickled
+    as the ordinary chromosome produced by the population's
+    chromosome_factory.
+    """
+    def __init__(self, population, index):
+        object.__setattr__(self, "population", population)
+        object.__setattr__(self, "index", index)
+
+    @property
+    def numeric(self):
+        return self.population.row_to_list(self.population.numeric[self.index])
+
+    @numeric.setter
+    def numeric(self, value):
+        self.population.numeric[self.index] = value
+
+    @property
+    def fitness(self):
+        fitness = self.population.fitnesses[self.index]
+        return None if numpy.isnan(fitness) else float(fitness)
+
+    @fitness.setter
+    def fitness(self, value):
+        self.population.fitnesses[self.index] = \
+            numpy.nan if value is None else value
+
+    @property
+    def size(self):
+        return self.population.numeric.shape[1]
+
+    @property
+    def valid(self):
+        return True
+
+    def __getattr__(self, name):
+        try:
+            return self.population.attributes[self.index][name]
+        except KeyError:
+            raise from_none(AttributeError(name))
+
+    def __setattr__(self, name, value):
+        if name in ArrayChromosome.__dict__:
+            object.__setattr__(self, name, value)
+        else:
+            self.population.attributes[self.index][name] = value
+
+    def __reduce_ex__(self, protocol):
+        return _unwrap_chromosome, (self.materialize(),)
+
+    def evaluate(self):
+        self.population.evaluate_chromosome(self)
+
+    def materialize(self):
+        """
+        :return: The ordinary chromosome with the same genes and attributes.
+        """
+        chromo = self.population.new(None, self.numeric)
+        chromo.fitness = self.fitness
+        for key, value in self.population.attributes[self.index].items():
+            setattr(chromo, key, value)
+        return chromo
+
+    def copy(self):
+        clone = self.materialize()
+        clone.fitness = None
+        return clone
+
+
+class ArrayPopulation(Population):
+    """Population which keeps the genes and the fitnesses of all the
+    chromosomes in numpy matrices, so that selection, crossing and mutation
+    are batched array operations. population[i] returns
+    :class:`ArrayChromosome`. Only the float coding is supported.
+
+    Abstract methods:
+        evaluate_chromosome
+    """
+    def populate(self):
+        if self.optimization.code != "float":
+            raise ValueError("%s supports only the float coding" %
+                             type(self).__name__)
+        min_values = self.optimization.min_values
+        max_values = self.optimization.max_values
+        self.min_array = numpy.array(min_values, dtype=numpy.float64)
+        self.max_array = numpy.array(max_values, dtype=numpy.float64)
+        # Chromosome treats the genes as integers unless a limit is float
+        self.integer_genes = numpy.array([
+            not isinstance(vmin, float) and not isinstance(vmax, float)
+            for vmin, vmax in zip(min_values, max_values)], dtype=bool)
+        self.numeric = numpy.zeros((0, self.optimization.size))
+        self.fitnesses = numpy.zeros(0)
+        self.attributes = []
+        accuracy = 1.0 / self.optimization.accuracy
+        low = numpy.where(self.integer_genes, self.min_array,
+                          numpy.trunc(self.min_array * accuracy))
+        high = numpy.where(self.integer_genes, self.max_array,
+                           numpy.trunc(self.max_array * accuracy)) + 1
+        genes = numpy.floor(
+            self.rand.rand(self.size, self.optimization.size) *
+            (high - low)) + low
+        self.append(numpy.where(self.integer_genes, genes, genes / accuracy))
+
+    @property
+    def pending_size(self):
+        return int(numpy.isnan(self.fitnesses).sum())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [ArrayChromosome(self, i)
+                    for i in range(len(self))[key]]
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError("chromosome index out of range")
+        return ArrayChromosome(self, key)
+
+    def __iter__(self):
+        return (ArrayChromosome(self, i) for i in range(len(self)))
+
+    def __len__(self):
+        return len(self.fitnesses)
+
+    def row_to_list(self, row):
+        return [int(v) if i else float(v)
+                for v, i in zip(row, self.integer_genes)]
+
+    def evaluate_chromosome(self, chromo):
+        raise NotImplementedError()
+
+    def append(self, genes, fitnesses=None):
+        """Adds the chromosomes with the specified genes (a matrix).
+        """
+        genes = self.correct(numpy.array(genes, dtype=numpy.float64))
+        if fitnesses is None:
+            fitnesses = numpy.full(len(genes), numpy.nan)
+        self.numeric = numpy.concatenate((self.numeric, genes))
+        self.fitnesses = numpy.concatenate((self.fitnesses, fitnesses))
+        self.attributes.extend({} for _ in range(len(genes)))
+
+    def add(self, chromo):
+        self.append([chromo.numeric], [
+            numpy.nan if chromo.fitness is None else chromo.fitness])
+
+    def take(self, indices):
+        """Leaves only the specified chromosomes in the specified order.
+        """
+        self.numeric = self.numeric[indices]
+        self.fitnesses = self.fitnesses[indices]
+        self.attributes = [self.attributes[i] for i in indices]
+
+    def correct(self, genes):
+        """Brings the genes to their limits in place the same way as
+        :meth:`Chromosome.numeric_correct()` and truncates the integer ones.
+        """
+        diff = self.max_array - self.min_array
+        for outside, sign in ((genes < self.min_array, 1),
+                              (genes > self.max_array, -1)):
+            rows, cols = numpy.nonzero(outside)
+            if len(rows) == 0:
+                continue
+            limit = numpy.where(sign > 0, self.min_array, self.max_array)
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                steps = numpy.ceil(
+                    sign * (limit[cols] - genes[rows, cols]) / diff[cols])
+            genes[rows, cols] = numpy.where(
+                diff[cols] == 0, self.min_array[cols],
+                genes[rows, cols] + sign * steps * diff[cols])
+        if self.integer_genes.any():
+            genes[:, self.integer_genes] = numpy.trunc(
+                genes[:, self.integer_genes])
+        return genes
+
+    def sort(self):
+        order = numpy.argsort(-self.fitnesses, kind="mergesort")
+        self.take(order[:self.size])
+
+    def update(self):
+        if self.pending_size > 0:
+            return
+
+        self.info("Making the new generation #%d...", self.generation + 1)
+        self.sort()  # kill excessive worst ones
+        self.fitness = float(self.fitnesses.sum())
+        self.average_fit = self.fitness / self.size
+        self.best_fit = float(self.fitnesses[0])
+        self.worst_fit = float(self.fitnesses[-1])
+        self.median_fit = float(self.fitnesses[len(self) // 2])
+
+        this_population_size = len(self)
+
+        self.info("Breeding...")
+        parents = self.select()
+        for cross in self.crossing.pipeline:
+            cross(parents)
+
+        self.info("Mutating...")
+        mutations = {"gaussian": self._mutate_gaussian,
+                     "uniform": self._mutate_uniform,
+                     "altering": self._mutate_altering}
+        for mutnme, mutparams in self.mutations.items():
+            if not mutparams["use"]:
+                continue
+            if mutnme not in mutations:
+                self.warning("%s mutation is not supported, skipped", mutnme)
+                continue
+            count = min(int(this_population_size * mutparams["chromosomes"]),
+                        this_population_size)
+            rows = self.rand.permutation(this_population_size)[:count]
+            genes = self.numeric[rows]
+            points = int(this_population_size * (mutparams["points"] or 0))
+            mutated = mutations[mutnme](genes, points,
+                                        mutparams["probability"])
+            self.append(mutated)
+
+        self.debug("Total population size: %d", len(self))
+        self.on_generation_changed()
+        self.on_generation_changed_callback()
+
+    def select_roulette(self):
+        bound = numpy.cumsum(self.fitnesses / self.fitness)
+        bound[-1] = 1.0
+        rand = self.rand.rand(int(len(self) * self.roulette_select_size))
+        return numpy.minimum(numpy.searchsorted(bound, rand), len(self) - 1)
+
+    def select_random(self):
+        return self.rand.randint(
+            len(self), size=int(len(self) * self.random_select_size))
+
+    def select_tournament(self):
+        pool = self.rand.randint(
+            len(self), size=int(len(self) * self.tournament_size))
+        pool = pool[numpy.argsort(self.fitnesses[pool], kind="mergesort")]
+        return pool[:int(len(self) * self.tournament_select_size)]
+
+    def _choose_parents(self, parents, crossings):
+        count = int(len(self) * crossings)
+        parents = numpy.asarray(parents)
+        return (self.numeric[parents[self.rand.randint(
+                    len(parents), size=count)]],
+                self.numeric[parents[self.rand.randint(
+                    len(parents), size=count)]])
+
+    def cross_pointed(self, parents):
+        """Exchanges the segments between the crossing points. Unlike the
+        sequential version, which cuts the gray coded bits, the points lie
+        between the genes.
+        """
+        parent1, parent2 = self._choose_parents(
+            parents, self.crossing.pointed_crossings)
+        size = self.optimization.size
+        points = min(max(int(len(self) * self.crossing.pointed_points), 1),
+                     size - 1)
+        cuts = numpy.zeros(parent1.shape, dtype=int)
+        if points > 0 and len(parent1) > 0:
+            # Distinct points in each row: the first ones of a permutation
+            order = numpy.argsort(
+                self.rand.rand(len(parent1), size - 1), axis=1)
+            cuts[numpy.arange(len(parent1))[:, None],
+                 order[:, :points] + 1] = 1
+        odd = numpy.cumsum(cuts, axis=1) % 2 == 1
+        cross1 = numpy.where(odd, parent1, parent2)
+        cross2 = numpy.where(odd, parent2, parent1)
+        self.append(numpy.stack((cross1, cross2), axis=1).reshape(
+            -1, self.optimization.size))
+
+    def cross_uniform(self, parents):
+        parent1, parent2 = self._choose_parents(
+            parents, self.crossing.uniform_crossings)
+        mask = self.rand.uniform(0, 2, size=parent1.shape) < 1
+        self.append(numpy.where(mask, parent1, parent2))
+
+    def cross_arithmetic(self, parents):
+        parent1, parent2 = self._choose_parents(
+            parents, self.crossing.arithmetic_crossings)
+        a = self.rand.random(parent1.shape)
+        cross1 = a * parent1 + (1 - a) * parent2
+        cross2 = numpy.where(self.integer_genes,
+                             parent1 + parent2 - numpy.trunc(cross1),
+                             (1 - a) * parent1 + a * parent2)
+        # Interleave the sons as the sequential version does
+        self.append(numpy.stack((cross1, cross2), axis=1).reshape(
+            -1, self.optimization.size))
+
+    def cross_geometric(self, parents):
+        parent1, parent2 = self._choose_parents(
+            parents, self.crossing.geometric_crossings)
+        # correct1 is used to invert [-x1; -x2] to [x2; x1]
+        correct1 = numpy.where(self.max_array < 0, -1, 1)
+        # correct2 is used to alter [-x1; x2] to [0; x2+x1]
+        correct2 = numpy.where(
+            (self.min_array > 0) | (correct1 == -1), 0, -self.min_array)
+        a = self.rand.rand(*parent1.shape)
+        self.append(correct1 * (
+            numpy.power(correct1 * parent1 + correct2, a) *
+            numpy.power(correct1 * parent2 + correct2, 1 - a) - correct2))
+
+    def _mutation_mask(self, genes, points, probability):
+        """
+        :return: Boolean matrix of the mutated genes: each chromosome gets
+        up to "points" distinct positions which mutate with "probability".
+        """
+        points = min(points, genes.shape[1])
+        mask = numpy.zeros(genes.shape, dtype=bool)
+        if points == 0:
+            return mask
+        positions = numpy.argpartition(
+            self.rand.rand(*genes.shape), points - 1, axis=1)[:, :points]
+        rows = numpy.arange(len(genes))[:, numpy.newaxis]
+        mask[rows, positions] = \
+            self.rand.rand(len(genes), points) < probability
+        return mask
+
+    def _mutate_gaussian(self, genes, points, probability):
+        mask = self._mutation_mask(genes, points, probability)
+        diff = self.max_array - self.min_array
+        gauss = self.rand.normal(self.min_array + diff / 2,
+                                 numpy.sqrt(diff / 6), size=genes.shape)
+        sign = numpy.where(self.rand.random(genes.shape) < 0.5, -1, 1)
+        return numpy.where(mask, self.correct(genes + sign * gauss), genes)
+
+    def _mutate_uniform(self, genes, points, probability):
+        mask = self._mutation_mask(genes, points, probability)
+        return numpy.where(mask, self.rand.uniform(
+            self.min_array, self.max_array, size=genes.shape), genes)
+
+    def _mutate_altering(self, genes, points, probability):
+        genes = genes.copy()
+        rows = numpy.arange(len(genes))
+        for _ in range(points):
+            pos1 = self.rand.randint(genes.shape[1], size=len(genes))
+            pos2 = self.rand.randint(genes.shape[1], size=len(genes))
+            swap = self.rand.rand(len(genes)) < probability
+            r, pos1, pos2 = rows[swap], pos1[swap], pos2[swap]
+            genes[r, pos1], genes[r, pos2] = \
+                genes[r, pos2].copy(), genes[r, pos1].copy()
+        return genes
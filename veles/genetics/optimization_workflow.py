@@ -41,6 +41,7 @@ import os
 from six import add_metaclass
 import sys
 import subprocess
+import threading
 from tempfile import NamedTemporaryFile
 from zope.interface import implementer
 from veles import prng, __root__
@@ -49,8 +50,9 @@ from veles.compat import from_none
 from veles.accelerated_units import AcceleratedWorkflow
 from veles.config import root, fix_contents
 from veles.distributable import IDistributable
+from veles.evaluation_pool import EvaluationPool
 from veles.genetics.config import process_config, Range, print_config, \
-    ConfigChromosome, ConfigPopulation
+    ConfigChromosome, ConfigPopulation, ConfigArrayPopulation
 from veles.json_encoders import ConfigJSONEncoder
 from veles.launcher import filter_argv
 from veles.mutable import Bool
@@ -89,13 +91,17 @@ class GeneticsOptimizer(Unit):
         if self.is_slave:
             self.complete = Bool()
             return
-        self._population = ConfigPopulation(
-            lambda *a, **k: ConfigChromosome(self, *a, **k),
-            len(self.tuneables),
-            [x.min_value for x in self.tuneables],
-            [x.max_value for x in self.tuneables],
-            kwargs["size"], rand=kwargs.get("rand", prng.get()),
-            max_generations=kwargs.get("generations"))
+        args = (lambda *a, **k: ConfigChromosome(self, *a, **k),
+                len(self.tuneables),
+                [x.min_value for x in self.tuneables],
+                [x.max_value for x in self.tuneables],
+                kwargs["size"])
+        pkwargs = {"rand": kwargs.get("rand", prng.get()),
+                   "max_generations": kwargs.get("generations")}
+        if kwargs.get("vectorized", False):
+            self._population = ConfigArrayPopulation(self, *args, **pkwargs)
+        else:
+            self._population = ConfigPopulation(*args, **pkwargs)
         self.population.on_generation_changed_callback = \
             self._set_generation_changed
         self._best_config = ""  # actual type is veles.config.Config
@@ -105,6 +111,10 @@ class GeneticsOptimizer(Unit):
         super(GeneticsOptimizer, self).init_unpickled()
         self._filtered_argv_ = []
         self._pending_ = defaultdict(set)
+        # Slave's current job: the genes and (fitness, snapshot)
+        self._genes_ = None
+        self._evaluation_ = None
+        self._config_lock_ = threading.Lock()
 
     @property
     def population(self):
@@ -149,10 +159,13 @@ class GeneticsOptimizer(Unit):
     def run(self):
         self.generation_changed <<= False
         self.info("Evaluating chromosome #%d...", self._chromosome_index)
-        self.population.evaluate(self._chromosome_index)
-        self._chromosome_index += 1
         if self.is_slave:
+            self._apply_genes(self._genes_)
+            self._evaluation_ = self._evaluate_config()
             self.complete <<= True
+            return
+        self.population.evaluate(self._chromosome_index)
+        self._chromosome_index += 1
 
     def stop(self):
         if self.is_slave:
@@ -179,37 +192,40 @@ class GeneticsOptimizer(Unit):
                 "Generation": self.population.generation}
 
     def generate_data_for_master(self):
-        index = self._chromosome_index - 1
-        chromo = self.population[index]
-        return index, (chromo.fitness, chromo.config, chromo.snapshot)
+        return self._chromosome_index, self._evaluation_
 
     def generate_data_for_slave(self, slave):
+        """
+        The job is only the chromosome's genes with the full names of the
+        tuneables they are applied to; the population stays on the master.
+        """
         self._update_has_more_data_for_slave()
         self.generation_changed <<= False
         for index in range(len(self.population)):
             if self.population[index].fitness is not None:
                 continue
-            if not any(index in s for s in self._pending_):
+            if not any(index in s for s in self._pending_.values()):
                 self._pending_[slave].add(index)
-                return self.population, index
+                return index, list(self.population[index].numeric), \
+                    [t.full_name for t in self.tuneables]
 
     def apply_data_from_master(self, data):
-        self._population, self._chromosome_index = data
-        self.population[self._chromosome_index].unit = self
-        # Prevent from running Population.update()
-        for index, chromo in enumerate(self.population):
-            if index != self._chromosome_index:
-                chromo.fitness = None
+        self._chromosome_index, self._genes_, names = data
+        mine = [t.full_name for t in self.tuneables]
+        if names != mine:
+            raise ValueError(
+                "The master's tuneables differ from the slave's: %s vs %s" %
+                (names, mine))
         self.complete <<= False
 
     def apply_data_from_slave(self, data, slave):
-        index, (fitness, config, snapshot) = data
+        index, (fitness, snapshot) = data
         if index not in self._pending_[slave]:
             self.warning("No such job was given: %d", index)
             return
         chromosome = self.population[index]
         chromosome.fitness = fitness
-        chromosome.config = config
+        chromosome.config = self._config_from_genes(chromosome.numeric)
         chromosome.snapshot = snapshot
         self.info("Chromosome #%d was evaluated to %s", index, fitness)
         self.population.update()
@@ -221,9 +237,38 @@ class GeneticsOptimizer(Unit):
             self._update_has_more_data_for_slave()
 
     def evaluate(self, chromo):
-        for tune, val in zip(self.tuneables, chromo.numeric):
+        chromo.config = self._apply_genes(chromo.numeric)
+        chromo.fitness, chromo.snapshot = self._evaluate_config()
+        self.info("Chromosome #%d was evaluated to %f", self._chromosome_index,
+                  chromo.fitness)
+
+    def _apply_genes(self, numeric):
+        """
+        Sets the tuneables to the genes.
+        :return: The copy of the resulting configuration.
+        """
+        for tune, val in zip(self.tuneables, numeric):
             tune <<= val
-        chromo.config = copy.deepcopy(self.config)
+        return copy.deepcopy(self.config)
+
+    def _config_from_genes(self, numeric):
+        """
+        :return: The copy of the configuration with the tuneables set to the
+        genes; the master's own configuration is left intact.
+        """
+        with self._config_lock_:
+            saved = [tune.addr[0][tune.addr[1]] for tune in self.tuneables]
+            try:
+                return self._apply_genes(numeric)
+            finally:
+                for tune, value in zip(self.tuneables, saved):
+                    tune.addr[0][tune.addr[1]] = value
+
+    def _evaluate_config(self):
+        """
+        Runs the model with the current configuration.
+        :return: The fitness and the snapshot.
+        """
         with NamedTemporaryFile(mode="wb", prefix="veles-optimization-config-",
                                 suffix=".%d.pickle" % best_protocol) as fcfg:
             pickle.dump(self.config, fcfg)
@@ -245,14 +290,12 @@ class GeneticsOptimizer(Unit):
                 if result is None:
                     raise EvaluationError()
         try:
-            chromo.fitness = result["EvaluationFitness"]
+            fitness = result["EvaluationFitness"]
         except KeyError:
             raise from_none(EvaluationError(
                 "Failed to find \"EvaluationFitness\" in the evaluation "
                 "results"))
-        chromo.snapshot = result.get("Snapshot")
-        self.info("Chromosome #%d was evaluated to %f", self._chromosome_index,
-                  chromo.fitness)
+        return fitness, result.get("Snapshot")
 
     def _update_has_more_data_for_slave(self):
         self.has_data_for_slave = \
@@ -266,12 +309,17 @@ class GeneticsOptimizer(Unit):
         return value
 
     def _exec(self, argv, fin):
-        __main__ = os.path.join(__root__, "veles", "__main__.py")
-        argv = [sys.executable, __main__] + argv
-        self.debug("exec: %s", " ".join(argv))
-        env = {"PYTHONPATH": os.getenv("PYTHONPATH", __root__)}
-        env.update(os.environ)
-        if subprocess.call(argv, env=env):
+        if root.common.engine.evaluation_pool.size > 0:
+            self.debug("exec in a warm process: %s", " ".join(argv))
+            code = EvaluationPool.instance().execute(argv)
+        else:
+            __main__ = os.path.join(__root__, "veles", "__main__.py")
+            argv = [sys.executable, __main__] + argv
+            self.debug("exec: %s", " ".join(argv))
+            env = {"PYTHONPATH": os.getenv("PYTHONPATH", __root__)}
+            env.update(os.environ)
+            code = subprocess.call(argv, env=env)
+        if code:
             self.error("Failed to evaluate chromosome #%d",
                        self._chromosome_index)
             return
@@ -59,6 +59,7 @@ from twisted.internet import reactor
 import zmq
 
 from veles.config import root
+from veles.graphics_delta import PlotUpdateDecoder
 from veles.txzmq import ZmqConnection, ZmqEndpoint
 from veles.iplotter import IPlotter
 from veles.logger import Logger
@@ -73,12 +74,21 @@ class ZmqSubscriber(ZmqConnection):
         super(ZmqSubscriber, self).__init__(*args, **kwargs)
         self.socket.set(zmq.SUBSCRIBE, b'graphics')
         self.graphics = graphics
+        self.decoder = PlotUpdateDecoder()
 
     def messageReceived(self, message):
         self.graphics.debug("Received %d bytes", len(message[0]))
-        raw_data = snappy.decompress(message[0][len('graphics'):])
-        obj = pickle.loads(raw_data)
-        self.graphics.update(obj, raw_data)
+        update = pickle.loads(
+            snappy.decompress(message[0][len('graphics'):]))
+        if update is None:
+            self.graphics.update(None)
+            return
+        obj = self.decoder.decode(update)
+        if obj is None:
+            self.graphics.debug("Skipped the partial update of %s: waiting "
+                                "for the full state", update.id)
+            return
+        self.graphics.update(obj)
 
 
 class GraphicsClient(Logger):
@@ -196,7 +206,7 @@ class GraphicsClient(Logger):
             raise
         self._run()
 
-    def update(self, plotter, raw_data):
+    def update(self, plotter):
         """Processes one plotting event.
         """
         if plotter is not None:
@@ -205,9 +215,8 @@ class GraphicsClient(Logger):
                     plotter.name.replace(" ", "_"),
                     datetime.datetime.now().strftime('%Y-%m-%d_%H:%M:%S')))
                 with open(file_name, "wb") as fout:
-                    fout.write(raw_data)
+                    pickle.dump(plotter, fout)
                 self.info("Wrote %s", file_name)
-            del raw_data
             self._gc_counter += 1
             if self._gc_counter >= GraphicsClient.gc_limit:
                 gc.collect()
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+
+Incremental plot updates protocol between GraphicsServer and GraphicsClient.
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+from hashlib import sha1
+import numbers
+import threading
+from time import time
+
+import six
+
+from veles.config import root
+from veles.pickle2 import pickle, best_protocol
+
+
+#: The list items which can be appended without resending the whole list
+SCALAR_TYPES = (numbers.Number, six.string_types, bytes, type(None))
+
+
+class PlotUpdate(object):
+    """
+    A message of the protocol. If "base" is None, it carries the full state
+    of the plotter, otherwise it is the patch to the state of version "base".
+    The attribute values are pickled separately.
+    """
+
+    def __init__(self, id, version, base=None, cls=None):
+        self.id = id
+        self.version = version
+        self.base = base
+        self.cls = cls
+        self.changed = {}
+        self.appended = {}
+        self.removed = []
+
+    @property
+    def full(self):
+        return self.base is None
+
+    @property
+    def size(self):
+        return sum(len(v) for d in (self.changed, self.appended)
+                   for v in d.values())
+
+    def __getstate__(self):
+        return (self.id, self.version, self.base, self.cls, self.changed,
+                self.appended, self.removed)
+
+    def __setstate__(self, state):
+        (self.id, self.version, self.base, self.cls, self.changed,
+         self.appended, self.removed) = state
+
+
+class PublishedState(object):
+    """
+    What the subscribers know about the state of a single plotter.
+    """
+
+    def __init__(self, version, synced):
+        self.version = version
+        self.synced = synced
+        self.digests = {}
+        self.lists = {}
+
+
+class PlotUpdateEncoder(object):
+    """
+    Produces :class:`PlotUpdate`-s which include only the attributes of the
+    plotter changed since the previous update. The lists of scalars which
+    have only grown (e.g., the history of AccumulatingPlotter) are sent as
+    the appended items. Since the subscribers may join at any time and
+    PUB-SUB has no back channel, the full state is sent every
+    "resync_interval" seconds and after :meth:`reset()`.
+    The methods are thread safe.
+    """
+
+    def __init__(self, resync_interval=None):
+        self.resync_interval = (
+            resync_interval if resync_interval is not None
+            else root.common.graphics.resync_interval)
+        self._published = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+        Makes the next update of every plotter carry the full state.
+        """
+        with self._lock:
+            for published in self._published.values():
+                published.synced = None
+
+    def encode(self, plotter):
+        """
+        :param plotter: :class:`veles.plotter.Plotter` with stripped_pickle
+        set to True.
+        :return: :class:`PlotUpdate` instance.
+        """
+        state = plotter.__getstate__()
+        now = time()
+        with self._lock:
+            published = self._published.get(plotter.id)
+            if published is None or published.synced is None or \
+                    now - published.synced >= self.resync_interval:
+                version = published.version + 1 if published is not None \
+                    else 0
+                published = PublishedState(version, now)
+                self._published[plotter.id] = published
+                update = PlotUpdate(plotter.id, version, cls=type(plotter))
+            else:
+                published.version += 1
+                update = PlotUpdate(plotter.id, published.version,
+                                    base=published.version - 1)
+                update.removed.extend(k for k in published.digests
+                                      if k not in state)
+                update.removed.extend(k for k in published.lists
+                                      if k not in state)
+                for key in update.removed:
+                    published.digests.pop(key, None)
+                    published.lists.pop(key, None)
+            for key, value in state.items():
+                self._encode_attribute(published, update, key, value)
+        return update
+
+    def _encode_attribute(self, published, update, key, value):
+        if isinstance(value, list):
+            tail = self._tail(published.lists.get(key), value)
+            if tail is not None:
+                if len(tail) > 0:
+                    update.appended[key] = pickle.dumps(tail, best_protocol)
+                    published.lists[key].extend(tail)
+                return
+        data = pickle.dumps(value, best_protocol)
+        digest = sha1(data).digest()
+        if published.digests.get(key) == digest:
+            return
+        update.changed[key] = data
+        if isinstance(value, list) and all(
+                isinstance(v, SCALAR_TYPES) for v in value):
+            published.lists[key] = list(value)
+            published.digests.pop(key, None)
+        else:
+            published.lists.pop(key, None)
+            published.digests[key] = digest
+
+    @staticmethod
+    def _tail(published, value):
+        if published is None or len(value) < len(published):
+            return None
+        try:
+            if value[:len(published)] != published:
+                return None
+        except ValueError:
+            # numpy arrays in the list
+            return None
+        tail = value[len(published):]
+        if not all(isinstance(v, SCALAR_TYPES) for v in tail):
+            return None
+        return tail
+
+
+class PlotUpdateDecoder(object):
+    """
+    Restores the plotters from :class:`PlotUpdate`-s. If a patch does not
+    apply to the known version (the subscriber has joined late or lost a
+    message), the plotter is not restored until the next full state.
+    """
+
+    def __init__(self):
+        self._states = {}
+
+    def decode(self, update):
+        """
+        :return: The restored plotter or None.
+        """
+        if update.full:
+            cls, state = update.cls, {}
+        else:
+            known = self._states.get(update.id)
+            if known is None or known[0] != update.base:
+                self._states.pop(update.id, None)
+                return None
+            _, cls, state = known
+            state = dict(state)
+        for key in update.removed:
+            state.pop(key, None)
+        for key, data in update.changed.items():
+            state[key] = pickle.loads(data)
+        for key, data in update.appended.items():
+            state[key] = state[key] + pickle.loads(data)
+        self._states[update.id] = update.version, cls, state
+        plotter = cls.__new__(cls)
+        plotter.__setstate__(dict(state))
+        return plotter
@@ -54,6 +54,7 @@ from six.moves import cPickle as pickle, zip
 from veles.cmdline import CommandLineArgumentsRegistry
 from veles.compat import from_none
 from veles.config import root
+from veles.graphics_delta import PlotUpdateEncoder
 from veles.txzmq import ZmqConnection, ZmqEndpoint
 import veles.graphics_client as graphics_client
 from veles.logger import Logger
@@ -63,11 +64,22 @@ from veles.timeit2 import timeit
 
 
 class ZmqPublisher(ZmqConnection):
-    socketType = zmq.PUB
+    socketType = zmq.XPUB
+
+    def __init__(self, endpoints, on_subscription=None, **kwargs):
+        self.on_subscription = on_subscription
+        super(ZmqPublisher, self).__init__(endpoints, **kwargs)
+        # Report every subscription, not only the first one
+        self.socket.set(zmq.XPUB_VERBOSE, 1)
 
     def send(self, message):
         super(ZmqPublisher, self).send(b'graphics' + message)
 
+    def messageReceived(self, message):
+        # Subscriptions over EPGM are not reported
+        if message[0][:1] == b'\x01' and self.on_subscription is not None:
+            self.on_subscription()
+
 
 @six.add_metaclass(CommandLineArgumentsRegistry)
 class GraphicsServer(Logger):
@@ -109,8 +121,11 @@ class GraphicsServer(Logger):
                         (iface, root.common.graphics.multicast_address)))
         self.debug("Trying to bind to %s...", zmq_endpoints)
 
+        self._encoder = PlotUpdateEncoder()
         try:
-            self.zmq_connection, btime = timeit(ZmqPublisher, zmq_endpoints)
+            self.zmq_connection, btime = timeit(
+                ZmqPublisher, zmq_endpoints,
+                on_subscription=self._encoder.reset)
         except zmq.error.ZMQError:
             self.exception("Failed to bind to %s", zmq_endpoints)
             raise from_none(GraphicsServer.InitializationError())
@@ -151,6 +166,15 @@ class GraphicsServer(Logger):
         return parser
 
     def enqueue(self, obj):
+        """
+        Broadcasts the plotter (only what has changed since the previous
+        call, see :class:`veles.graphics_delta.PlotUpdateEncoder`) or None,
+        which terminates the clients.
+        """
+        if obj is not None:
+            obj = self._encoder.encode(obj)
+            self.debug("%s update of %s: %d bytes of attributes",
+                       "Full" if obj.full else "Partial", obj.id, obj.size)
         data = pickle.dumps(obj)
         if getattr(self, "_debug_pickle", False):
             import objgraph
@@ -37,10 +37,12 @@ under the License.
 
 from __future__ import division
 import argparse
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
 import logging
 import marshal
+import threading
 import time
 import types
 
@@ -142,6 +144,10 @@ class Loader(Unit):
         global_offset: first sample index which was not served during the
                        current epoch.
         minibatch_size: current minibatch size <= max_minibatch_size.
+        prefetch: the number of minibatches which are prepared in advance in
+                  background threads (0 means no prefetching).
+        prefetch_workers: the number of background threads which prepare
+                          the prefetched minibatches.
     """
 
     LABEL_DTYPE = numpy.int32
@@ -151,7 +157,9 @@ class Loader(Unit):
         "minibatch_labels", "minibatch_size", "max_minibatch_size", \
         "total_samples", "last_minibatch", "class_lengths", "shuffle_limit", \
         "labels_mapping", "reversed_labels_mapping", "global_offset", \
-        "minibatch_offset"
+        "minibatch_offset", "minibatch_indices"
+    prefetched_arrays = "minibatch_data", "minibatch_labels", \
+        "minibatch_indices"
 
     def __init__(self, workflow, **kwargs):
         kwargs["view_group"] = "LOADER"
@@ -201,9 +209,15 @@ class Loader(Unit):
         self.normalization_parameters = kwargs.get(
             "normalization_parameters", {})
         self.train_ratio = kwargs.get("train_ratio", self.train_ratio)
+        self.prefetch = kwargs.get("prefetch", 0)
+        self.prefetch_workers = kwargs.get("prefetch_workers", 1)
 
     def init_unpickled(self):
+        self._prefetch_local_ = threading.local()
         super(Loader, self).init_unpickled()
+        self._prefetched_ = deque()
+        self._prefetch_slots_ = []
+        self._prefetch_executor_ = None
         self._minibatch_offset_ = 0
         self._minibatch_size_ = 0
         self.pending_minibatches_ = defaultdict(list)
@@ -419,7 +433,7 @@ class Loader(Unit):
 
     @property
     def minibatch_class(self):
-        return self._minibatch_class
+        return self._prefetched("minibatch_class", self._minibatch_class)
 
     @minibatch_class.setter
     def minibatch_class(self, value):
@@ -429,7 +443,7 @@ class Loader(Unit):
 
     @property
     def minibatch_offset(self):
-        return self._minibatch_offset_
+        return self._prefetched("minibatch_offset", self._minibatch_offset_)
 
     @minibatch_offset.setter
     def minibatch_offset(self, value):
@@ -440,7 +454,7 @@ class Loader(Unit):
 
     @property
     def minibatch_size(self):
-        return self._minibatch_size_
+        return self._prefetched("minibatch_size", self._minibatch_size_)
 
     @minibatch_size.setter
     def minibatch_size(self, value):
@@ -465,7 +479,7 @@ class Loader(Unit):
 
     @property
     def minibatch_data(self):
-        return self._minibatch_data
+        return self._prefetched("minibatch_data", self._minibatch_data)
 
     @minibatch_data.setter
     def minibatch_data(self, value):
@@ -473,7 +487,7 @@ class Loader(Unit):
 
     @property
     def minibatch_indices(self):
-        return self._minibatch_indices
+        return self._prefetched("minibatch_indices", self._minibatch_indices)
 
     @minibatch_indices.setter
     def minibatch_indices(self, value):
@@ -481,7 +495,7 @@ class Loader(Unit):
 
     @property
     def minibatch_labels(self):
-        return self._minibatch_labels
+        return self._prefetched("minibatch_labels", self._minibatch_labels)
 
     @minibatch_labels.setter
     def minibatch_labels(self, value):
@@ -489,7 +503,8 @@ class Loader(Unit):
 
     @property
     def raw_minibatch_labels(self):
-        return self._raw_minibatch_labels
+        return self._prefetched("raw_minibatch_labels",
+                                self._raw_minibatch_labels)
 
     @property
     def epoch_number(self):
@@ -512,7 +527,7 @@ class Loader(Unit):
         """
         Returns the Pseudo Random Number Generator belonging to this instance.
         """
-        return self._prng
+        return self._prefetched("prng", self._prng)
 
     @prng.setter
     def prng(self, value):
@@ -533,6 +548,32 @@ class Loader(Unit):
             raise ValueError("train_ratio must be in (0, 1] (got %f)" % value)
         self._train_ratio = value
 
+    @property
+    def prefetch(self):
+        return getattr(self, "_prefetch", 0)
+
+    @prefetch.setter
+    def prefetch(self, value):
+        if not isinstance(value, int):
+            raise TypeError("prefetch must be an integer (got %s)" %
+                            type(value))
+        if value < 0:
+            raise ValueError("prefetch must be greater than or equal to 0")
+        self._prefetch = value
+
+    @property
+    def prefetch_workers(self):
+        return getattr(self, "_prefetch_workers", 1)
+
+    @prefetch_workers.setter
+    def prefetch_workers(self, value):
+        if not isinstance(value, int):
+            raise TypeError("prefetch_workers must be an integer (got %s)" %
+                            type(value))
+        if value < 1:
+            raise ValueError("prefetch_workers must be greater than 0")
+        self._prefetch_workers = value
+
     @property
     def class_ended(self):
         for offset in self.effective_class_end_offsets:
@@ -572,6 +613,8 @@ class Loader(Unit):
             self.shuffle_limit = 0
             self.global_offset = 0
             del self.failed_minibatches[:]
+        self._drop_prefetched()
+        del self._prefetch_slots_[:]
         try:
             super(Loader, self).initialize(**kwargs)
         except AttributeError:
@@ -625,6 +668,12 @@ class Loader(Unit):
         self.serve_next_minibatch(None)
         self._on_successful_serve()
 
+    def stop(self):
+        self._drop_prefetched()
+        if self._prefetch_executor_ is not None:
+            self._prefetch_executor_.shutdown(wait=False)
+            self._prefetch_executor_ = None
+
     def generate_data_for_master(self):
         return True
 
@@ -742,15 +791,9 @@ class Loader(Unit):
         if self.is_master:
             return
 
-        self.fill_minibatch()
-        self.normalize_minibatch()
-        self.map_minibatch_labels()
-
-        if minibatch_size < self.max_minibatch_size:
-            self.minibatch_data[minibatch_size:] = 0.0
-            if self.has_labels:
-                self.minibatch_labels[minibatch_size:] = -1
-            self.minibatch_indices[minibatch_size:] = -1
+        if not self._serve_prefetched(minibatch_def):
+            self._prepare_minibatch()
+        self._schedule_prefetch()
 
     def analyze_dataset(self):
         if self.class_lengths[TRAIN] == 0:
@@ -844,6 +887,167 @@ class Loader(Unit):
         raise error.Bug("Could not convert sample index to class index, "
                         "probably due to incorrect class_end_offsets.")
 
+    def _prepare_minibatch(self, on_filled=None):
+        """Fills, normalizes and maps the labels of the current minibatch.
+        Called either in the unit's thread or in a prefetching thread.
+        """
+        try:
+            self.fill_minibatch()
+        finally:
+            if on_filled is not None:
+                on_filled()
+        self.normalize_minibatch()
+        self.map_minibatch_labels()
+
+        minibatch_size = self.minibatch_size
+        if minibatch_size < self.max_minibatch_size:
+            self.minibatch_data[minibatch_size:] = 0.0
+            if self.has_labels:
+                self.minibatch_labels[minibatch_size:] = -1
+            self.minibatch_indices[minibatch_size:] = -1
+
+    def _prefetched(self, name, value):
+        """Returns the value of the specified attribute from the minibatch
+        which is being prepared in the current thread, if any.
+        """
+        slot = getattr(self._prefetch_local_, "slot", None)
+        if slot is None:
+            return value
+        return slot.get(name, value)
+
+    def _iter_prefetched_arrays(self):
+        names = set()
+        for klass in type(self).__mro__:
+            names.update(klass.__dict__.get("prefetched_arrays", tuple()))
+        for name in sorted(names):
+            array = getattr(self, name, None)
+            if isinstance(array, memory.Array) and array:
+                yield name, array
+
+    def _predict_minibatches(self, count):
+        """Returns the definitions of the next minibatches which are going
+        to be served, up to the end of the current epoch. The following
+        minibatches are unknown since they depend on the next shuffle.
+        """
+        defs = list(reversed(self.failed_minibatches[-count:]))
+        offset = self.global_offset
+        while len(defs) < count and offset < self.effective_total_samples:
+            _, remainder = self.class_index_by_sample_index(offset)
+            size = min(remainder, self.max_minibatch_size)
+            offset += size
+            defs.append((offset, size))
+        return defs
+
+    def _schedule_prefetch(self):
+        if self.prefetch == 0 or not self.is_standalone:
+            return
+        defs = self._predict_minibatches(self.prefetch)
+        queued = [(slot["minibatch_offset"], slot["minibatch_size"])
+                  for slot, _ in self._prefetched_]
+        if queued != defs[:len(queued)]:
+            self._drop_prefetched()
+            queued = []
+        if len(queued) == len(defs):
+            return
+        if self._prefetch_executor_ is None:
+            self._prefetch_executor_ = ThreadPoolExecutor(
+                self.prefetch_workers)
+        previous = self._prefetched_[-1][0]["job"] \
+            if len(self._prefetched_) > 0 else None
+        self.shuffled_indices.map_read()
+        for offset, size in defs[len(queued):]:
+            slot = self._allocate_prefetch_slot()
+            slot["minibatch_class"], _ = \
+                self.class_index_by_sample_index(offset - size)
+            slot["minibatch_offset"] = offset
+            slot["minibatch_size"] = size
+            slot["minibatch_indices"].mem[:size] = \
+                self.shuffled_indices.mem[offset - size:offset]
+            # fill_minibatch() calls continue the random sequence of prng
+            # in the same order as without prefetching
+            slot["job"] = job = {"filled": threading.Event(),
+                                 "state": None}
+            self._prefetched_.append((slot, self._prefetch_executor_.submit(
+                self._prefetch_minibatch, slot, job, previous,
+                self._prng.state)))
+            previous = job
+
+    def _allocate_prefetch_slot(self):
+        if len(self._prefetch_slots_) > 0:
+            return self._prefetch_slots_.pop()
+        slot = {name: memory.Array(numpy.zeros_like(array.mem))
+                for name, array in self._iter_prefetched_arrays()}
+        slot["raw_minibatch_labels"] = [None] * self.max_minibatch_size
+        slot["prng"] = random_generator.RandomGenerator(None)
+        return slot
+
+    def _prefetch_minibatch(self, slot, job, previous, state):
+        """
+        :param job: the dictionary which receives the state of prng after
+        fill_minibatch(); "filled" event is set then.
+        :param previous: the same dictionary of the previous prefetched
+        minibatch or None.
+        :param state: the state of prng to start with if previous is None.
+        """
+        self._prefetch_local_.slot = slot
+        try:
+            if previous is not None:
+                previous["filled"].wait()
+                state = previous["state"]
+            prng = slot["prng"]
+            prng.state = state
+
+            def on_filled():
+                job["state"] = prng.state
+                job["filled"].set()
+
+            self._prepare_minibatch(on_filled)
+        finally:
+            self._prefetch_local_.slot = None
+
+    def _serve_prefetched(self, minibatch_def):
+        """Copies the prefetched minibatch to the output arrays.
+
+        Returns:
+            True if the minibatch was prefetched; otherwise, False.
+        """
+        if len(self._prefetched_) == 0:
+            return False
+        slot, future = self._prefetched_[0]
+        offset, size = minibatch_def
+        if (slot["minibatch_offset"], slot["minibatch_size"]) != \
+                minibatch_def or (slot["minibatch_indices"].mem[:size] !=
+                                  self.minibatch_indices.mem[:size]).any():
+            self.debug("Prefetched minibatch (%d, %d) does not match "
+                       "(%d, %d)", slot["minibatch_offset"],
+                       slot["minibatch_size"], offset, size)
+            self._drop_prefetched()
+            return False
+        self._prefetched_.popleft()
+        try:
+            future.result()
+        finally:
+            self._prefetch_slots_.append(slot)
+        self._prng.state = slot["job"]["state"]
+        for name, array in self._iter_prefetched_arrays():
+            array.map_invalidate()
+            numpy.copyto(array.mem, slot[name].mem)
+        self.raw_minibatch_labels[:] = slot["raw_minibatch_labels"]
+        return True
+
+    def _drop_prefetched(self):
+        while len(self._prefetched_) > 0:
+            slot, future = self._prefetched_.popleft()
+            if future.cancel():
+                # Release the next minibatch which waits for this one
+                slot["job"]["filled"].set()
+            else:
+                try:
+                    future.result()
+                except Exception as e:
+                    self.debug("Dropped prefetched minibatch failed: %s", e)
+            self._prefetch_slots_.append(slot)
+
     def _calc_class_end_offsets(self):
         """Fills self.class_end_offsets from self.class_lengths.
         """
@@ -1041,6 +1245,8 @@ class LoaderMSEMixin(Unit):
         minibatch_targets: target data.
     """
 
+    prefetched_arrays = "minibatch_targets",
+
     def __init__(self, workflow, **kwargs):
         super(LoaderMSEMixin, self).__init__(workflow, **kwargs)
         self.class_targets = memory.Array()
@@ -1112,7 +1318,7 @@ class LoaderMSEMixin(Unit):
 
     @property
     def minibatch_targets(self):
-        return self._minibatch_targets
+        return self._prefetched("minibatch_targets", self._minibatch_targets)
 
     def initialize(self, **kwargs):
         super(LoaderMSEMixin, self).initialize(**kwargs)
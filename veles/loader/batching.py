@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+Adaptive minibatching of the served requests.
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+from collections import deque
+import numpy
+
+from veles.timeit2 import perf_counter
+
+
+class AdaptiveBatchingPolicy(object):
+    """
+    Decides when to flush the minibatch which is being filled with the
+    requests. Without latency_target, the minibatch is flushed max_wait
+    seconds after the first request arrived, or when it is full.
+    Otherwise, the waiting time is chosen so that the first request is
+    answered within latency_target: the recent minibatch processing times
+    are subtracted from the target and the result is scaled down while the
+    observed p99 latency exceeds the target. If the arrival rate is so low
+    that no more requests are expected before that time, the minibatch is
+    flushed immediately.
+
+    The owner calls arrived() for each request, dispatched() when the
+    minibatch starts to be processed and completed() when it is done.
+    All the times are perf_counter() values.
+    """
+    LATENCY_BINS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+                    1.0, 2.0, 5.0)
+
+    def __init__(self, max_batch_size, max_wait, latency_target=None,
+                 window=1000):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.latency_target = latency_target
+        self.slack = 1.0
+        self._interval = None
+        self._last_arrival = None
+        self._compute_times = deque(maxlen=100)
+        self._fills = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._in_flight = None
+        self._histogram = numpy.zeros(len(self.LATENCY_BINS) + 1,
+                                      dtype=numpy.int64)
+
+    @property
+    def arrival_rate(self):
+        """
+        Smoothed number of requests per second.
+        """
+        if not self._interval:
+            return 0.0
+        return 1.0 / self._interval
+
+    @property
+    def compute_time(self):
+        """
+        The pessimistic estimation of the minibatch processing time.
+        """
+        if len(self._compute_times) == 0:
+            return 0.0
+        return float(numpy.percentile(self._compute_times, 90))
+
+    def arrived(self, now=None):
+        now = perf_counter() if now is None else now
+        if self._last_arrival is not None:
+            interval = now - self._last_arrival
+            self._interval = interval if self._interval is None else \
+                0.9 * self._interval + 0.1 * interval
+        self._last_arrival = now
+
+    def flush_time(self, oldest_arrival, size, now=None):
+        """
+        :param oldest_arrival: The arrival time of the first request in the
+        minibatch.
+        :param size: The current number of requests in the minibatch.
+        :return: The time when the minibatch must be flushed.
+        """
+        if size >= self.max_batch_size:
+            return oldest_arrival
+        if self.latency_target is None:
+            return oldest_arrival + self.max_wait
+        now = perf_counter() if now is None else now
+        budget = self.latency_target * self.slack - self.compute_time
+        deadline = oldest_arrival + min(max(budget, 0), self.max_wait)
+        if self.arrival_rate * (deadline - now) < 1:
+            # Waiting will not make the minibatch bigger
+            return min(now, deadline)
+        return deadline
+
+    def dispatched(self, arrivals, now=None):
+        """
+        :param arrivals: The arrival times of the requests in the minibatch.
+        """
+        now = perf_counter() if now is None else now
+        self._fills.append(len(arrivals) / self.max_batch_size)
+        self._in_flight = now, arrivals
+
+    def completed(self, now=None):
+        if self._in_flight is None:
+            return
+        now = perf_counter() if now is None else now
+        start, arrivals = self._in_flight
+        self._in_flight = None
+        self._compute_times.append(now - start)
+        latencies = now - numpy.asarray(arrivals)
+        self._latencies.extend(latencies)
+        self._histogram += numpy.bincount(
+            numpy.searchsorted(self.LATENCY_BINS, latencies),
+            minlength=len(self._histogram))
+        if self.latency_target is None:
+            return
+        p99 = numpy.percentile(self._latencies, 99)
+        if p99 > self.latency_target:
+            self.slack = max(self.slack * 0.9, 0.05)
+        elif p99 < self.latency_target * 0.9:
+            self.slack = min(self.slack * 1.05, 1.0)
+
+    def get_metric_values(self):
+        """
+        :return: The dictionary with the batching statistics.
+        """
+        values = {
+            "arrival rate": self.arrival_rate,
+            "compute time": self.compute_time,
+            "fill ratio": float(numpy.mean(self._fills))
+            if len(self._fills) > 0 else 0.0,
+            "latency histogram": {
+                "bins": self.LATENCY_BINS,
+                "counts": self._histogram.tolist()}}
+        if len(self._latencies) > 0:
+            values["latency median"] = float(
+                numpy.percentile(self._latencies, 50))
+            values["latency p99"] = float(
+                numpy.percentile(self._latencies, 99))
+        return values
@@ -36,36 +36,126 @@ under the License.
 
 
 from __future__ import division
+import hashlib
 from itertools import chain
+import os
 import cv2
 import numpy
 from PIL import Image
 from zope.interface import implementer
 
 from veles.compat import from_none
+from veles.config import root
 import veles.error as error
 from veles.loader.file_loader import AutoLabelFileLoader, FileFilter, \
     FileLoaderBase, FileListLoaderBase
 from veles.loader.image import ImageLoader, IImageLoader, MODE_COLOR_MAP, \
     COLOR_CHANNELS_MAP
+from veles.loader.image_cache import PreprocessedImagesCache, params_key
 
 
 class FileImageLoaderBase(ImageLoader, FileFilter):
     """
     Base class for loading something from files. Function is_valid_fiename()
     should be used in child classes as filter for loading data.
+
+    Attributes:
+        cache_preprocessed: store the image infos and the scaled images in
+            root.common.dirs.cache, so that the next runs check only the
+            files' modification times and sizes.
     """
+    DECODING_PARAMETERS = "source_dtype", "cache_preprocessed"
 
     def __init__(self, workflow, **kwargs):
         kwargs["file_type"] = "image"
         kwargs["file_subtypes"] = kwargs.get("file_subtypes", ["jpeg", "png"])
         super(FileImageLoaderBase, self).__init__(workflow, **kwargs)
+        self.cache_preprocessed = kwargs.get("cache_preprocessed", False)
+
+    def init_unpickled(self):
+        super(FileImageLoaderBase, self).init_unpickled()
+        self._preprocessed_cache_ = None
+        self._background_digest_ = None
+
+    @property
+    def cache_preprocessed(self):
+        return getattr(self, "_cache_preprocessed", False)
+
+    @cache_preprocessed.setter
+    def cache_preprocessed(self, value):
+        if not isinstance(value, bool):
+            raise TypeError(
+                "cache_preprocessed must be boolean (got %s)" % type(value))
+        self._cache_preprocessed = value
+
+    @property
+    def preprocessed_cache(self):
+        """
+        :return: :class:`veles.loader.image_cache.PreprocessedImagesCache` or
+        None if cache_preprocessed is False.
+        """
+        if not self.cache_preprocessed:
+            return None
+        if self._preprocessed_cache_ is None:
+            self._preprocessed_cache_ = PreprocessedImagesCache(os.path.join(
+                root.common.dirs.cache, "preprocessed_images"))
+        return self._preprocessed_cache_
+
+    def _reset_background(self):
+        super(FileImageLoaderBase, self)._reset_background()
+        self._background_digest_ = None
+
+    @property
+    def preprocessing_key(self):
+        """
+        :return: The string which identifies all the parameters of
+        preprocess_image() except cropping.
+        """
+        if self._background_digest_ is None and self.scale != 1.0:
+            self._background_digest_ = hashlib.sha1(
+                self.background.tobytes()).hexdigest()
+        return params_key(
+            type(self).__name__, self.color_space, self.add_sobel, self.scale,
+            self.scale_maintain_aspect_ratio, self._background_digest_,
+            numpy.dtype(self.source_dtype).str, self.uncropped_shape)
+
+    def take_decoding_updates(self):
+        cache = self.preprocessed_cache
+        return cache.take_updated() if cache is not None else None
+
+    def merge_decoding_updates(self, updates):
+        if updates:
+            self.preprocessed_cache.merge(updates)
+
+    def load_data(self):
+        super(FileImageLoaderBase, self).load_data()
+        if self.preprocessed_cache is not None:
+            self.preprocessed_cache.flush()
+
+    def stop(self):
+        super(FileImageLoaderBase, self).stop()
+        if self._preprocessed_cache_ is not None:
+            self._preprocessed_cache_.close()
+            self._preprocessed_cache_ = None
 
     def get_image_info(self, key):
         """
         :param key: The full path to the analysed image.
         :return: tuple (image size, number of channels).
         """
+        cache = self.preprocessed_cache
+        if cache is None:
+            return self.read_image_info(key)
+        info = cache.get_info(key)
+        if info is None:
+            info = self.read_image_info(key)
+            cache.put_info(key, info)
+        return info
+
+    def read_image_info(self, key):
+        """
+        Reads the image size and the color space from the file.
+        """
         try:
             with open(key, "rb") as fin:
                 img = Image.open(fin)
@@ -107,6 +197,25 @@ class FileImageLoaderBase(ImageLoader, FileFilter):
     def get_image_label(self, key):
         return self.get_label_from_filename(key)
 
+    def _load_image(self, key, crop=True):
+        cache = self.preprocessed_cache
+        if cache is None:
+            return super(FileImageLoaderBase, self)._load_image(key, crop)
+        pkey = self.preprocessing_key
+        cached = cache.get_data(key, pkey)
+        if cached is None:
+            data, _, bbox = super(FileImageLoaderBase, self)._load_image(
+                key, False)
+            cache.put_data(key, pkey, data, bbox)
+        else:
+            data, bbox = cached
+        # Cropping is random and thus is never cached
+        if crop and self.crop is not None:
+            data, label_value = self.crop_image(data, bbox)
+        else:
+            label_value = 1
+        return data, label_value, bbox
+
     def analyze_images(self, files, pathname):
         # First pass: get the final list of files and shape
         self.debug("Analyzing %d images in %s", len(files), pathname)
@@ -181,3 +290,4 @@ class AutoLabelFileImageLoader(FileImageLoader, AutoLabelFileLoader):
     """
 
     MAPPING = "auto_label_file_image"
+    DECODING_PARAMETERS = "label_regexp",
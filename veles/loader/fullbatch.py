@@ -37,7 +37,9 @@ under the License.
 
 from __future__ import division
 from collections import Counter
+import hashlib
 import numpy
+import os
 from cuda4py import CUDARuntimeError, CUDA_ERROR_OUT_OF_MEMORY
 from opencl4py import CLRuntimeError, CL_MEM_OBJECT_ALLOCATION_FAILURE
 import six
@@ -46,9 +48,11 @@ from zope.interface import implementer, Interface
 from veles.accelerated_units import AcceleratedUnit, IOpenCLUnit, ICUDAUnit, \
     INumpyUnit
 from veles.backends import NumpyDevice
-from veles.compat import from_none
+from veles.compat import from_none, PYPY
+from veles.config import root
 import veles.memory as memory
 from veles.opencl_types import numpy_dtype_to_opencl
+from veles.pickle2 import pickle, best_protocol
 from veles.units import UnitCommandLineArgumentsRegistry
 from veles.loader.base import ILoader, Loader, LoaderMSEMixin, \
     UserLoaderRegistry, LoaderWithValidationRatio
@@ -58,6 +62,44 @@ VALID = 1
 TEST = 0
 
 
+def gather(src, indices, dst):
+    """Copies src[indices] to the beginning of dst without temporary arrays.
+
+    Arguments:
+        src: the array to take the samples from (numpy.ndarray).
+        indices: the indices of the samples in src (numpy.ndarray).
+        dst: the array to write the samples to (numpy.ndarray).
+    """
+    out = dst[:len(indices)]
+    if PYPY:
+        # int() is required by (guess what...) PyPy
+        for i, index in enumerate(indices):
+            out[i] = src[int(index)]
+        return
+    if src.dtype != dst.dtype or not out.flags.c_contiguous:
+        # numpy.take() requires out to have exactly the resulting dtype
+        out[...] = src[indices]
+        return
+    # mode="clip" disables the bounds check and thus the buffering of out;
+    # the indices are always valid here
+    numpy.take(src, indices, axis=0, out=out, mode="clip")
+
+
+def files_fingerprint(paths):
+    """Calculates the fingerprint of the specified files from their absolute
+    paths, sizes and modification times, that is, without reading them.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        if not path:
+            continue
+        stat = os.stat(path)
+        digest.update(("%s:%d:%d;" % (
+            os.path.abspath(path), stat.st_size,
+            int(stat.st_mtime * 1000000))).encode("utf-8"))
+    return digest.hexdigest()
+
+
 class FullBatchUserLevelLoaderRegistry(UnitCommandLineArgumentsRegistry,
                                        UserLoaderRegistry):
     pass
@@ -85,19 +127,34 @@ class FullBatchLoader(AcceleratedUnit, FullBatchLoaderBase):
         original_data: original data (Array).
         original_labels: original labels (Array, dtype=Loader.LABEL_DTYPE)
             (in case of classification).
+        memmap_originals: store original_data and the mapped labels in
+            numpy.memmap files inside root.common.dirs.cache. The files are
+            named after originals_cache_key or, if it is None, after
+            source_fingerprint and reused while it does not change, so that
+            load_data() is not called. One of them must be set.
+        originals_cache_key: explicit name of the originals cache files.
 
     Should be overriden in child class:
         load_data()
     """
+    cached_originals = "original_data",
+
     def __init__(self, workflow, **kwargs):
         super(FullBatchLoader, self).__init__(workflow, **kwargs)
         self.verify_interface(IFullBatchLoader)
+        self.memmap_originals = kwargs.get("memmap_originals", False)
+        self.originals_cache_key = kwargs.get("originals_cache_key")
 
     def init_unpickled(self):
         super(FullBatchLoader, self).init_unpickled()
         self._original_data_ = memory.Array()
         self._original_labels_ = []
         self._mapped_original_labels_ = memory.Array()
+        self._originals_cached_ = False
+        self._cached_normalizers_ = {}
+        self._memmap_files_ = {}
+        self.load_data = self._with_originals_cache(self.load_data)
+        self.initialize = self._with_originals_cache_saved(self.initialize)
         self.sources_["fullbatch_loader"] = {}
         self._global_size = None
         self._krn_const = numpy.zeros(2, dtype=Loader.LABEL_DTYPE)
@@ -130,6 +187,44 @@ class FullBatchLoader(AcceleratedUnit, FullBatchLoaderBase):
     def original_labels(self):
         return self._original_labels_
 
+    @property
+    def memmap_originals(self):
+        return getattr(self, "_memmap_originals", False)
+
+    @memmap_originals.setter
+    def memmap_originals(self, value):
+        if not isinstance(value, bool):
+            raise TypeError(
+                "memmap_originals must be boolean (got %s)" % type(value))
+        self._memmap_originals = value
+
+    @property
+    def source_fingerprint(self):
+        """
+        Override this to return a string which changes whenever the data
+        produced by load_data() changes, e.g., see files_fingerprint().
+        :return: None means that memmap_originals requires
+        originals_cache_key.
+        """
+        return None
+
+    @property
+    def originals_cache(self):
+        """
+        :return: The common path prefix of the files which back the originals
+        if memmap_originals is True.
+        """
+        key = self.originals_cache_key
+        if key is None:
+            key = self.source_fingerprint
+        if key is None:
+            raise ValueError(
+                "%s has neither originals_cache_key nor source_fingerprint, "
+                "so memmap_originals would leave a new copy of the dataset "
+                "in %s on each run" % (self, root.common.dirs.cache))
+        return os.path.join(root.common.dirs.cache, "%s_%s" % (
+            type(self).__name__, key))
+
     @property
     def validation_ratio(self):
         return getattr(self, "_validation_ratio", None)
@@ -280,12 +375,13 @@ class FullBatchLoader(AcceleratedUnit, FullBatchLoaderBase):
         Create original_data.mem and original_labels.mem.
         :param dshape: Future original_data.shape[1:]
         """
-        self.original_data.reset(
-            numpy.zeros((self.total_samples,) + dshape, self.dtype))
+        self.original_data.reset(self._allocate_original(
+            "original_data", (self.total_samples,) + dshape, self.dtype))
         if not labels:
             return
-        self._mapped_original_labels_.reset(
-            numpy.zeros(self.total_samples, Loader.LABEL_DTYPE))
+        self._mapped_original_labels_.reset(self._allocate_original(
+            "mapped_original_labels", (self.total_samples,),
+            Loader.LABEL_DTYPE))
         del self.original_labels[:]
         self.original_labels.extend(None for _ in range(self.total_samples))
 
@@ -310,13 +406,11 @@ class FullBatchLoader(AcceleratedUnit, FullBatchLoaderBase):
         return True
 
     def fill_minibatch(self):
-        for i, sample_index in enumerate(
-                self.minibatch_indices.mem[:self.minibatch_size]):
-            # int() is required by (guess what...) PyPy
-            self.minibatch_data[i] = self.original_data[int(sample_index)]
-            if self.has_labels:
-                self.minibatch_labels[i] = \
-                    self._mapped_original_labels_[int(sample_index)]
+        indices = self.minibatch_indices.mem[:self.minibatch_size]
+        gather(self.original_data.mem, indices, self.minibatch_data.mem)
+        if self.has_labels:
+            gather(self._mapped_original_labels_.mem, indices,
+                   self.minibatch_labels.mem)
 
     def map_minibatch_labels(self):
         pass
@@ -334,6 +428,13 @@ class FullBatchLoader(AcceleratedUnit, FullBatchLoaderBase):
         pass
 
     def analyze_original_dataset(self):
+        if self._originals_cached_:
+            state = self._cached_normalizers_.get("normalizer")
+            if state is not None:
+                self.normalizer.state = state
+            self.info("Skipped normalization since the cached originals have "
+                      "already been normalized to %s", self.normalization_type)
+            return
         self.info("Normalizing to %s...", self.normalization_type)
         self.debug(
             "Data range: (%.6f, %.6f), "
@@ -458,11 +559,131 @@ class FullBatchLoader(AcceleratedUnit, FullBatchLoaderBase):
         self._init_mapped_original_labels()
 
     def _init_mapped_original_labels(self):
-        self._mapped_original_labels_.reset(
-            numpy.zeros(self.total_samples, Loader.LABEL_DTYPE))
+        self._mapped_original_labels_.reset(self._allocate_original(
+            "mapped_original_labels", (self.total_samples,),
+            Loader.LABEL_DTYPE))
         for i, label in enumerate(self.original_labels):
             self._mapped_original_labels_[i] = self.labels_mapping[label]
 
+    def _allocate_original(self, name, shape, dtype):
+        if not self.memmap_originals or numpy.prod(shape) == 0:
+            return numpy.zeros(shape, dtype)
+        # Write to a temporary file first so that other processes never
+        # see incomplete data; it is renamed in _save_originals_cache()
+        path = "%s.%s.%d.tmp" % (self.originals_cache, name, os.getpid())
+        self._memmap_files_[name] = path
+        self.debug("Mapping %s %s to %s", name, shape, path)
+        return numpy.memmap(path, dtype, "w+", shape=shape)
+
+    def _iter_cached_originals(self):
+        names = set()
+        for klass in type(self).__mro__:
+            names.update(klass.__dict__.get("cached_originals", tuple()))
+        for name in sorted(names):
+            yield name, getattr(self, name)
+        yield "mapped_original_labels", self._mapped_original_labels_
+
+    def _originals_cache_signature(self):
+        return {"normalization": (self.normalization_type,
+                                  self.normalization_parameters),
+                "target_normalization": (
+                    getattr(self, "target_normalization_type", None),
+                    getattr(self, "target_normalization_parameters", None))}
+
+    def _open_originals_cache(self):
+        """Maps the previously saved originals if they are up to date.
+
+        Returns:
+            True if the originals were mapped; otherwise, False.
+        """
+        prefix = self.originals_cache
+        try:
+            with open(prefix + ".pickle", "rb") as fin:
+                meta = pickle.load(fin)
+        except (IOError, OSError):
+            return False
+        except Exception as e:
+            self.warning("Failed to read %s.pickle: %s", prefix, e)
+            return False
+        if meta["signature"] != self._originals_cache_signature():
+            self.info("The originals in %s were normalized differently",
+                      prefix)
+            return False
+        arrays = {}
+        for name, (shape, dtype) in meta["arrays"].items():
+            path = "%s.%s" % (prefix, name)
+            if not os.path.exists(path):
+                self.warning("%s does not exist", path)
+                return False
+            arrays[name] = numpy.memmap(path, dtype, "c", shape=shape)
+        originals = dict(self._iter_cached_originals())
+        for name, mem in arrays.items():
+            originals[name].reset(mem)
+        self.class_lengths[:] = meta["class_lengths"]
+        self.original_labels[:] = meta["original_labels"]
+        self._cached_normalizers_ = meta["normalizers"]
+        return True
+
+    def _save_originals_cache(self):
+        prefix = self.originals_cache
+        meta = {"signature": self._originals_cache_signature(),
+                "class_lengths": list(self.class_lengths),
+                "original_labels": self.original_labels,
+                "arrays": {}, "normalizers": {}}
+        originals = dict(self._iter_cached_originals())
+        for name, path in self._memmap_files_.items():
+            originals[name].mem.flush()
+            os.rename(path, "%s.%s" % (prefix, name))
+        self._memmap_files_.clear()
+        for name, array in originals.items():
+            if isinstance(array.mem, numpy.memmap):
+                meta["arrays"][name] = array.shape, array.dtype
+        for name in "normalizer", "target_normalizer":
+            normalizer = getattr(self, name, None)
+            if normalizer is not None and normalizer.is_initialized:
+                meta["normalizers"][name] = normalizer.state
+        with open(prefix + ".pickle.tmp%d" % os.getpid(), "wb") as fout:
+            pickle.dump(meta, fout, protocol=best_protocol)
+        os.rename(fout.name, prefix + ".pickle")
+        self.info("Saved the originals to %s.*", prefix)
+
+    def _with_originals_cache(self, fn):
+        def wrapped_load_data(*args, **kwargs):
+            self._originals_cached_ = False
+            if not self.memmap_originals:
+                return fn(*args, **kwargs)
+            if self._open_originals_cache():
+                self._originals_cached_ = True
+                self.info("Loaded the originals from %s.*",
+                          self.originals_cache)
+                return
+            result = fn(*args, **kwargs)
+            for name, array in self._iter_cached_originals():
+                if not array or isinstance(array.mem, numpy.memmap):
+                    continue
+                # load_data() did not call create_originals()
+                mem = self._allocate_original(name, array.shape, array.dtype)
+                mem[:] = array.mem
+                array.reset(mem)
+            return result
+
+        fnname = getattr(fn, '__name__',
+                         getattr(fn, 'func', wrapped_load_data).__name__)
+        wrapped_load_data.__name__ = fnname + '_originals_cache'
+        return wrapped_load_data
+
+    def _with_originals_cache_saved(self, fn):
+        def wrapped_initialize(*args, **kwargs):
+            retry = fn(*args, **kwargs)
+            if not retry and self.memmap_originals:
+                self._save_originals_cache()
+            return retry
+
+        fnname = getattr(fn, '__name__',
+                         getattr(fn, 'func', wrapped_initialize).__name__)
+        wrapped_initialize.__name__ = fnname + '_originals_cache_saved'
+        return wrapped_initialize
+
 
 class FullBatchLoaderMSEMixin(LoaderMSEMixin):
     hide_from_registry = True
@@ -470,6 +691,8 @@ class FullBatchLoaderMSEMixin(LoaderMSEMixin):
     Attributes:
         original_targets: original target (Array).
     """
+    cached_originals = "original_targets", "class_targets"
+
     def init_unpickled(self):
         super(FullBatchLoaderMSEMixin, self).init_unpickled()
         self._original_targets_ = memory.Array()
@@ -495,6 +718,11 @@ class FullBatchLoaderMSEMixin(LoaderMSEMixin):
             self.dtype))
 
     def analyze_and_normalize_targets(self):
+        if self._originals_cached_:
+            state = self._cached_normalizers_.get("target_normalizer")
+            if state is not None:
+                self.target_normalizer.state = state
+            return
         self.debug(
             "Target range: (%.6f, %.6f)"
             % (self.original_targets.min(), self.original_targets.max()))
@@ -555,9 +783,9 @@ class FullBatchLoaderMSEMixin(LoaderMSEMixin):
 
     def fill_minibatch(self):
         super(FullBatchLoaderMSEMixin, self).fill_minibatch()
-        for i, v in enumerate(self.minibatch_indices[:self.minibatch_size]):
-            # int() is required by PyPy
-            self.minibatch_targets[i] = self.original_targets[int(v)]
+        gather(self.original_targets.mem,
+               self.minibatch_indices.mem[:self.minibatch_size],
+               self.minibatch_targets.mem)
 
 
 class FullBatchLoaderMSE(FullBatchLoaderMSEMixin, FullBatchLoader):
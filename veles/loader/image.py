@@ -38,6 +38,9 @@ under the License.
 from __future__ import division
 from collections import defaultdict
 from itertools import chain
+import multiprocessing
+import os
+import tempfile
 try:
     import cv2
 except ImportError:
@@ -52,9 +55,27 @@ from veles.external.progressbar import ProgressBar
 from veles.loader.base import CLASS_NAME, ILoader, Loader, \
     TRAIN, VALID, TEST, LoaderError, LoaderWithValidationRatio
 from veles.memory import Array
+from veles.pickle2 import pickle
 from veles.prng import RandomGenerator
 
 
+# The loader which is inherited by the forked decoding processes
+_decoding_loader = None
+# Shared buffers opened in the current decoding process
+_decoding_buffers = {}
+
+
+def _set_decoding_loader(loader):
+    # Pool calls it in each forked process, including the respawned ones
+    global _decoding_loader
+    _decoding_loader = loader
+
+
+def _decode_keys_in_process(task):
+    return _decoding_loader.decode_keys_to_buffer(*task), \
+        _decoding_loader.take_decoding_updates()
+
+
 MODE_COLOR_MAP = {
     "1": "GRAY",
     "L": "GRAY",
@@ -113,12 +134,26 @@ class ImageLoader(LoaderWithValidationRatio):
         source_dtype: dtype to work with during various image operations.
         shape: image shape (tuple) - set after initialize().
 
+        decoding_processes: the number of processes which decode, scale,
+            crop and distort images in load_keys(); 0 means load in the
+            current process.
+
      Must be overriden in child classes:
         get_image_label()
         get_image_info()
         get_image_data()
         get_keys()
     """
+    prefetched_arrays = "minibatch_label_values",
+    SHARED_MEMORY_DIR = "/dev/shm"
+    # The attributes which influence load_keys(); the decoding processes are
+    # restarted when any of them changes. Subclasses list their own
+    # attributes in DECODING_PARAMETERS, too.
+    DECODING_PARAMETERS = (
+        "color_space", "add_sobel", "mirror", "scale",
+        "scale_maintain_aspect_ratio", "rotations", "crop", "crop_number",
+        "background_image", "background_color", "smart_crop",
+        "original_shape", "path_to_mean")
 
     def __init__(self, workflow, **kwargs):
         super(ImageLoader, self).__init__(workflow, **kwargs)
@@ -142,6 +177,29 @@ class ImageLoader(LoaderWithValidationRatio):
             "background_color", (0xff, 0x14, 0x93))
         self.smart_crop = kwargs.get("smart_crop", True)
         self.minibatch_label_values = Array()
+        self.decoding_processes = kwargs.get("decoding_processes", 0)
+
+    def init_unpickled(self):
+        super(ImageLoader, self).init_unpickled()
+        self._decoding_pool_ = None
+        self._decoding_parameters_ = None
+        self._decoding_buffer_ = None
+
+    def __setstate__(self, state):
+        # Snapshots made before minibatch_label_values became a property
+        if "minibatch_label_values" in state:
+            state["_minibatch_label_values"] = \
+                state.pop("minibatch_label_values")
+        super(ImageLoader, self).__setstate__(state)
+
+    @property
+    def minibatch_label_values(self):
+        return self._prefetched(
+            "minibatch_label_values", self._minibatch_label_values)
+
+    @minibatch_label_values.setter
+    def minibatch_label_values(self, value):
+        self._minibatch_label_values = value
 
     @property
     def source_dtype(self):
@@ -279,6 +337,21 @@ class ImageLoader(LoaderWithValidationRatio):
             raise TypeError("smart_crop must be a boolean value")
         self._smart_crop = value
 
+    @property
+    def decoding_processes(self):
+        return getattr(self, "_decoding_processes", 0)
+
+    @decoding_processes.setter
+    def decoding_processes(self, value):
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(
+                "decoding_processes must be a non-negative integer (got %s)" %
+                value)
+        if value > 0 and not hasattr(os, "fork"):
+            self.warning("Parallel decoding requires fork()")
+            value = 0
+        self._decoding_processes = value
+
     @property
     def mirror(self):
         return self._mirror
@@ -318,6 +391,7 @@ class ImageLoader(LoaderWithValidationRatio):
 
     @background_image.setter
     def background_image(self, value):
+        self._reset_background()
         if isinstance(value, str):
             with open(value, "rb") as fin:
                 self.background_image = fin
@@ -346,6 +420,7 @@ class ImageLoader(LoaderWithValidationRatio):
 
     @background_color.setter
     def background_color(self, value):
+        self._reset_background()
         if value is None:
             self._background_color = None
             return
@@ -378,6 +453,9 @@ class ImageLoader(LoaderWithValidationRatio):
         self._background = self._background.astype(self.source_dtype)
         return self._background.copy()
 
+    def _reset_background(self):
+        self._background = None
+
     @property
     def channels_number(self):
         channels = COLOR_CHANNELS_MAP[self.color_space]
@@ -558,13 +636,26 @@ class ImageLoader(LoaderWithValidationRatio):
             mirror = False
         return mirror, self.rotations[index]
 
-    def load_keys(self, keys, pbar, data, labels, label_values, crop=True):
+    def load_keys(self, keys, pbar, data, labels, label_values, crop=True,
+                  distortions=None):
         """Loads data from the specified keys.
+        :param distortions: (mirror, rotation) to apply to each loaded key.
         """
+        if self.decoding_processes > 0 and data is not None:
+            keys = list(keys)
+            if len(keys) > 1:
+                return self._load_keys_in_parallel(
+                    keys, pbar, data, labels, label_values, crop, distortions)
+        keys = list(keys)
+        if self.decoding_processes > 0:
+            # The same as in the decoding processes
+            seeds = self._draw_crop_seeds(len(keys), crop)
+        else:
+            seeds = [None] * len(keys)
         index = 0
         has_labels = False
-        for key in keys:
-            obj, label_value, _ = self._load_image(key)
+        for ki, key in enumerate(keys):
+            obj, label_value, _ = self._load_image_with_seed(key, seeds[ki])
             label, has_labels = self._load_label(key, has_labels)
             if (self.crop is None or not crop) and \
                     obj.shape[:2] != self.uncropped_shape:
@@ -572,6 +663,9 @@ class ImageLoader(LoaderWithValidationRatio):
                     "Ignored %s (label %s): shape %s",
                     key, label, obj.shape[:2])
                 continue
+            if distortions is not None:
+                obj = self.distort(
+                    obj.astype(data.dtype), *distortions[ki])
             if data is not None:
                 data[index] = obj
             if labels is not None:
@@ -583,6 +677,160 @@ class ImageLoader(LoaderWithValidationRatio):
                 pbar.inc()
         return has_labels
 
+    def decode_keys_to_buffer(self, path, shape, dtype, start, keys, crop,
+                              seeds, distortions):
+        """Loads the specified keys to the rows of the shared buffer starting
+        from start. It is executed in the decoding processes.
+        :return: The list of (label, label value or None if ignored).
+        """
+        buffer = _decoding_buffers.get(path)
+        if buffer is None:
+            _decoding_buffers.clear()
+            buffer = _decoding_buffers[path] = numpy.memmap(
+                path, dtype, "r+", shape=shape)
+        results = []
+        for index, key in enumerate(keys):
+            obj, label_value, _ = self._load_image_with_seed(
+                key, seeds[index])
+            label = self.get_image_label(key)
+            if (self.crop is None or not crop) and \
+                    obj.shape[:2] != self.uncropped_shape:
+                self.warning(
+                    "Ignored %s (label %s): shape %s",
+                    key, label, obj.shape[:2])
+                results.append((label, None))
+                continue
+            if distortions is not None:
+                obj = self.distort(
+                    obj.astype(dtype), *distortions[index])
+            buffer[start + index] = obj
+            results.append((label, label_value))
+        return results
+
+    def stop(self):
+        super(ImageLoader, self).stop()
+        self._stop_decoding_pool()
+        if self._decoding_buffer_ is not None:
+            os.remove(self._decoding_buffer_.filename)
+            self._decoding_buffer_ = None
+
+    def take_decoding_updates(self):
+        """
+        Executed in the decoding processes after decode_keys_to_buffer().
+        :return: The picklable state changes to pass to
+        merge_decoding_updates() in the parent process.
+        """
+        return None
+
+    def merge_decoding_updates(self, updates):
+        pass
+
+    def _draw_crop_seeds(self, count, crop):
+        """
+        Random crops of each key take the numbers from a separate generator
+        seeded from prng, so that they do not depend on how the keys are
+        distributed among the decoding processes.
+        """
+        if self.crop is None or not crop:
+            return [None] * count
+        return [int(s) for s in self.prng.randint(1 << 31, size=count)]
+
+    def _load_image_with_seed(self, key, seed):
+        if seed is None:
+            return self._load_image(key)
+        prng = RandomGenerator(None)
+        prng.state = numpy.random.RandomState(seed).get_state()
+        local = self._prefetch_local_
+        slot = getattr(local, "slot", None)
+        local.slot = dict(slot or {}, prng=prng)
+        try:
+            return self._load_image(key)
+        finally:
+            local.slot = slot
+
+    def _get_decoding_parameters(self):
+        """
+        :return: The pickled values of DECODING_PARAMETERS, which the
+        decoding processes have copied when they were forked.
+        """
+        names = set()
+        for klass in type(self).__mro__:
+            names.update(klass.__dict__.get("DECODING_PARAMETERS", tuple()))
+        return pickle.dumps(tuple(getattr(self, name, None)
+                                  for name in sorted(names)))
+
+    def _stop_decoding_pool(self):
+        if self._decoding_pool_ is None:
+            return
+        self._decoding_pool_.terminate()
+        self._decoding_pool_.join()
+        self._decoding_pool_ = None
+        self._decoding_parameters_ = None
+
+    def _get_decoding_buffer(self, shape, dtype):
+        buffer = self._decoding_buffer_
+        if buffer is not None and buffer.shape[1:] == shape[1:] and \
+                buffer.dtype == dtype and len(buffer) >= shape[0]:
+            return buffer
+        if buffer is not None:
+            os.remove(buffer.filename)
+            shape = (max(shape[0], len(buffer)),) + shape[1:]
+        shared_dir = self.SHARED_MEMORY_DIR
+        if not os.path.isdir(shared_dir):
+            shared_dir = None
+        fd, path = tempfile.mkstemp(
+            prefix="veles-%s-" % self.name.replace(" ", "_"),
+            dir=shared_dir)
+        os.close(fd)
+        self._decoding_buffer_ = numpy.memmap(path, dtype, "w+", shape=shape)
+        return self._decoding_buffer_
+
+    def _load_keys_in_parallel(self, keys, pbar, data, labels, label_values,
+                               crop, distortions):
+        buffer = self._get_decoding_buffer(
+            (len(keys),) + data.shape[1:], data.dtype)
+        parameters = self._get_decoding_parameters()
+        if self._decoding_pool_ is not None and \
+                parameters != self._decoding_parameters_:
+            self.debug("The decoding parameters have changed, restarting "
+                       "the decoding processes")
+            self._stop_decoding_pool()
+        if self._decoding_pool_ is None:
+            # The processes are forked with the current state of the loader
+            self._decoding_pool_ = multiprocessing.Pool(
+                self.decoding_processes, _set_decoding_loader, (self,))
+            self._decoding_parameters_ = parameters
+        seeds = self._draw_crop_seeds(len(keys), crop)
+        step = max(1, len(keys) // (self.decoding_processes * 4))
+        tasks = [(buffer.filename, buffer.shape, buffer.dtype, i,
+                  keys[i:i + step], crop, seeds[i:i + step],
+                  distortions[i:i + step] if distortions is not None
+                  else None)
+                 for i in range(0, len(keys), step)]
+        outputs = self._decoding_pool_.map(_decode_keys_in_process, tasks)
+        for _, updates in outputs:
+            self.merge_decoding_updates(updates)
+        results = chain.from_iterable(r for r, _ in outputs)
+        index = 0
+        has_labels = False
+        for ki, (label, label_value) in enumerate(results):
+            if label is not None:
+                has_labels = True
+            if has_labels and label is None:
+                raise error.BadFormatError(
+                    "%s does not have a label, but others do" % keys[ki])
+            if label_value is None:
+                continue
+            data[index] = buffer[ki]
+            if labels is not None:
+                labels[index] = label
+            if label_values is not None:
+                label_values[index] = label_value
+            index += 1
+            if pbar is not None:
+                pbar.inc()
+        return has_labels
+
     def load_labels(self):
         if not self.has_labels:
             return
@@ -659,10 +907,19 @@ class ImageLoader(LoaderWithValidationRatio):
 
     def fill_minibatch(self):
         indices = self.minibatch_indices.mem[:self.minibatch_size]
+        distortions = None
+        if self.samples_inflation > 1 and self.decoding_processes > 0:
+            # Distort in the decoding processes; the distortions are drawn
+            # before the crops
+            distortions = [
+                self.get_distortion_by_index(
+                    self._get_class_origin_distortion_from_index(index)[2])
+                for index in indices]
         assert self.has_labels == self.load_keys(
             self.keys_from_indices(indices), None, self.minibatch_data.mem,
-            self.raw_minibatch_labels, self.minibatch_label_values)
-        if self.samples_inflation == 1:
+            self.raw_minibatch_labels, self.minibatch_label_values,
+            distortions=distortions)
+        if self.samples_inflation == 1 or distortions is not None:
             return
         for pos, index in enumerate(indices):
             _, _, dist_index = \
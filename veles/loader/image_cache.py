@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+Persistent cache of the preprocessed images.
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+import hashlib
+import os
+import threading
+import uuid
+from zlib import crc32
+
+import numpy
+
+from veles.config import root
+from veles.logger import Logger
+from veles.pickle2 import pickle, best_protocol
+
+
+def file_stat(path):
+    """
+    :return: The tuple (modification time in microseconds, size in bytes).
+    """
+    stat = os.stat(path)
+    return int(stat.st_mtime * 1000000), stat.st_size
+
+
+def params_key(*params):
+    """
+    :return: The string which identifies the preprocessing parameters.
+    """
+    return hashlib.sha1(repr(params).encode("utf-8")).hexdigest()
+
+
+class PreprocessedImagesCache(Logger):
+    """
+    Stores the image infos and the preprocessed image tensors keyed by the file
+    path, the modification time and the size. Each process appends the
+    tensors to its own blob file which is read back through numpy.memmap.
+    The index is merged with the one on disk and atomically replaced in
+    flush(), so several loaders may share the same directory.
+    If the blobs take more than max_size bytes, flush() removes the least
+    recently written ones together with their entries. A blob file is
+    closed after it reaches max_size / BLOBS_RATIO bytes, so that it can be
+    evicted. The tensors are checked against their CRC32 when read.
+    Forked processes write their own blob files, too, but only the process
+    which has created the cache writes the index: the forked ones pass
+    take_updated() to its merge().
+    """
+    INDEX = "index.pickle"
+    BLOB_SUFFIX = ".blob"
+    BLOBS_RATIO = 16
+
+    def __init__(self, directory, max_size=None):
+        super(PreprocessedImagesCache, self).__init__()
+        self.directory = directory
+        self.max_size = max_size if max_size is not None \
+            else root.common.loader.preprocessed_images_cache_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+        self._updated = {}
+        self._blobs = {}
+        self._writer = None
+        self._pid = self._writer_pid = os.getpid()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, self.INDEX)
+
+    def __len__(self):
+        return len(self._index)
+
+    def get_info(self, path, stat=None):
+        """
+        :return: (size, color space) or None if the file is not cached or has
+        changed.
+        """
+        entry = self._get_entry(path, stat)
+        return entry["info"] if entry is not None else None
+
+    def put_info(self, path, info, stat=None):
+        with self._lock:
+            entry = self._get_entry(path, stat, True)
+            entry["info"] = info
+            self._updated[path] = entry
+
+    def get_data(self, path, key, stat=None):
+        """
+        :param key: The preprocessing parameters, see params_key().
+        :return: (read only preprocessed image, bbox) or None.
+        """
+        entry = self._get_entry(path, stat)
+        if entry is None or key not in entry["data"]:
+            return None
+        blob, offset, shape, dtype, bbox, checksum = entry["data"][key]
+        mapped = self._map_blob(blob, offset + int(numpy.prod(shape)) *
+                                numpy.dtype(dtype).itemsize)
+        if mapped is None:
+            return None
+        data = numpy.ndarray(shape, dtype, mapped, offset)
+        if crc32(data) != checksum:
+            self.warning("%s is corrupted in %s", path, blob)
+            return None
+        return data, bbox
+
+    def put_data(self, path, key, data, bbox, stat=None):
+        self._check_fork()
+        data = numpy.ascontiguousarray(data)
+        with self._lock:
+            name, fout = self._get_writer()
+            offset = fout.tell()
+            fout.write(data.tobytes())
+            fout.flush()
+            entry = self._get_entry(path, stat, True)
+            entry["data"][key] = (name, offset, data.shape, data.dtype, bbox,
+                                  crc32(data))
+            self._updated[path] = entry
+            if fout.tell() >= self.max_size // self.BLOBS_RATIO:
+                fout.close()
+                self._writer = None
+
+    def take_updated(self):
+        """
+        :return: The entries updated since the previous call.
+        """
+        self._check_fork()
+        with self._lock:
+            updated, self._updated = self._updated, {}
+        return updated
+
+    def merge(self, updated):
+        """
+        Adds the entries returned by take_updated() in a forked process, so
+        that flush() saves them.
+        """
+        with self._lock:
+            for path, entry in updated.items():
+                mine = self._index.get(path)
+                if mine is not None and mine["stat"] == entry["stat"]:
+                    mine["data"].update(entry["data"])
+                    if entry["info"] is not None:
+                        mine["info"] = entry["info"]
+                    entry = mine
+                else:
+                    self._index[path] = entry
+                self._updated[path] = entry
+
+    def flush(self):
+        """
+        Merges the updated entries into the index on disk.
+        """
+        if os.getpid() != self._pid:
+            return
+        with self._lock:
+            if len(self._updated) == 0:
+                return
+            index = self._load_index()
+            index.update(self._updated)
+            self._evict(index)
+            self._index.update(index)
+            tmp_path = "%s.%d.tmp" % (self.index_path, self._pid)
+            with open(tmp_path, "wb") as fout:
+                pickle.dump(index, fout, protocol=best_protocol)
+            os.rename(tmp_path, self.index_path)
+            self.debug("Saved %d new entries to %s", len(self._updated),
+                       self.index_path)
+            self._updated.clear()
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer[1].close()
+            self._writer = None
+        self._blobs.clear()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "rb") as fin:
+                return pickle.load(fin)
+        except (IOError, OSError):
+            return {}
+        except Exception as e:
+            self.warning("Failed to load %s: %s", self.index_path, e)
+            return {}
+
+    def _get_entry(self, path, stat, create=False):
+        if stat is None:
+            stat = file_stat(path)
+        entry = self._index.get(path)
+        if entry is not None and entry["stat"] != stat:
+            entry = None
+        if entry is None and create:
+            entry = self._index[path] = {
+                "stat": stat, "info": None, "data": {}}
+        return entry
+
+    def _evict(self, index):
+        blobs = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.BLOB_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            blobs.append((stat.st_mtime, name, stat.st_size))
+        total = sum(size for _, _, size in blobs)
+        if total <= self.max_size:
+            return
+        active = self._writer[0] if self._writer is not None else None
+        evicted = set()
+        for _, name, size in sorted(blobs):
+            if total <= self.max_size:
+                break
+            if name == active:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+            evicted.add(name)
+            self._blobs.pop(name, None)
+        for entry in index.values():
+            for key, value in list(entry["data"].items()):
+                if value[0] in evicted:
+                    del entry["data"][key]
+        self.info("Evicted %d blobs from %s", len(evicted), self.directory)
+
+    def _check_fork(self):
+        if os.getpid() == self._writer_pid:
+            return
+        # The parent's blob file, lock and updates must not be shared
+        self._writer_pid = os.getpid()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._updated = {}
+
+    def _get_writer(self):
+        if self._writer is None:
+            name = uuid.uuid4().hex + self.BLOB_SUFFIX
+            self._writer = name, open(os.path.join(self.directory, name), "ab")
+        return self._writer
+
+    def _map_blob(self, name, size):
+        mapped = self._blobs.get(name)
+        if mapped is not None and len(mapped) >= size:
+            return mapped
+        path = os.path.join(self.directory, name)
+        try:
+            mapped = numpy.memmap(path, numpy.uint8, "r")
+        except (IOError, OSError, ValueError):
+            return None
+        if len(mapped) < size:
+            return None
+        self._blobs[name] = mapped
+        return mapped
@@ -44,9 +44,11 @@ from wget import bar_adaptive, callback_progress, urllib
 from veles import is_interactive
 
 from veles.loader.base import Loader, ILoader, TEST, TRAIN, VALID
+from veles.loader.batching import AdaptiveBatchingPolicy
 from veles.loader.image import ImageLoader, MODE_COLOR_MAP
 from veles.loader.libsndfile_loader import SndFileMixin
 from veles.mutable import Bool
+from veles.timeit2 import perf_counter
 
 
 class NotFeededError(Exception):
@@ -55,30 +57,49 @@ class NotFeededError(Exception):
 
 @implementer(ILoader)
 class InteractiveLoader(Loader):
+    """
+    Waits for the user to call feed(). If minibatch_size is greater than 1,
+    the fed samples are gathered into minibatches according to
+    AdaptiveBatchingPolicy with max_response_time and latency_target.
+    """
     MAPPING = "interactive"
 
     def __init__(self, workflow, **kwargs):
         super(InteractiveLoader, self).__init__(workflow, **kwargs)
         self._event = threading.Event()
         self._event.clear()
-        self._max_minibatch_size = 1
+        self._max_minibatch_size = kwargs.get("minibatch_size", 1)
         self._loadtxt_kwargs = kwargs.get("loadtxt_kwargs", {})
+        self.max_response_time = kwargs.get("max_response_time", 0.1)
+        self.latency_target = kwargs.get("latency_target")
         self.complete = Bool(False)
 
+    def init_unpickled(self):
+        super(InteractiveLoader, self).init_unpickled()
+        self._lock_ = threading.Lock()
+        self._timer_ = None
+        self._batching_ = None
+        self._arrivals_ = []
+
     def reset_normalization(self):
         pass
 
     def load_data(self):
         assert is_interactive(), \
             "This loader may only operate in interactive mode"
-        self.class_lengths[TEST] = 1
+        self.class_lengths[TEST] = self._max_minibatch_size
         self.class_lengths[TRAIN] = self.class_lengths[VALID] = 0
+        self._batching_ = AdaptiveBatchingPolicy(
+            self.max_minibatch_size, getattr(self, "max_response_time", 0.1),
+            getattr(self, "latency_target", None))
 
     def create_minibatch_data(self):
-        self.minibatch_data.reset(numpy.zeros(self._minibatch_data_shape,
-                                              dtype=self.dtype))
+        self.minibatch_data.reset(numpy.zeros(
+            (self.max_minibatch_size,) + self._minibatch_data_shape[1:],
+            dtype=self.dtype))
 
     def fill_minibatch(self):
+        self._batching_.completed()
         self._provide_feed()
         self.info("Waiting for the user's input...")
         try:
@@ -86,6 +107,25 @@ class InteractiveLoader(Loader):
         finally:
             self._revoke_feed()
             self._event.clear()
+        with self._lock_:
+            if self._timer_ is not None:
+                self._timer_.cancel()
+                self._timer_ = None
+            arrivals, self._arrivals_ = self._arrivals_, []
+        if len(arrivals) > 0:
+            self._minibatch_size_ = len(arrivals)
+            self._batching_.dispatched(arrivals)
+
+    def get_metric_names(self):
+        return super(InteractiveLoader, self).get_metric_names() | \
+            {"Batching"}
+
+    def get_metric_values(self):
+        values = super(InteractiveLoader, self).get_metric_values()
+        if self._batching_ is not None:
+            values["Batching"] = self._batching_.get_metric_values()
+            values["Batching"]["queue depth"] = len(self._arrivals_)
+        return values
 
     def feed(self, obj):
         if obj is None:
@@ -108,11 +148,40 @@ class InteractiveLoader(Loader):
         if not isinstance(food[0], numpy.ndarray):
             raise ValueError(
                 "Do not know how to digest this food type: %s", type(food))
-        self._feed(food)
-        self._event.set()
+        with self._lock_:
+            size = len(self._arrivals_)
+            if size >= self.max_minibatch_size:
+                raise ValueError("The minibatch is already full")
+            self.minibatch_data.mem[size] = self._feed(food)
+            now = perf_counter()
+            self._arrivals_.append(now)
+            self._batching_.arrived(now)
+            self._flush_if_due(now)
+
+    def _flush_if_due(self, now=None):
+        now = perf_counter() if now is None else now
+        if len(self._arrivals_) == 0 or self._event.is_set():
+            return
+        delay = self._batching_.flush_time(
+            self._arrivals_[0], len(self._arrivals_), now) - now
+        if delay <= 0:
+            self._event.set()
+            return
+        if self._timer_ is not None:
+            self._timer_.cancel()
+        self._timer_ = threading.Timer(delay, self._locked_flush_if_due)
+        self._timer_.daemon = True
+        self._timer_.start()
+
+    def _locked_flush_if_due(self):
+        with self._lock_:
+            self._flush_if_due()
 
     def _feed(self, obj):
-        self.minibatch_data.mem[0] = obj[0]
+        """
+        :return: The sample to put into the minibatch.
+        """
+        return obj[0]
 
     def _load_from_stream(self, stream):
         try:
@@ -212,5 +281,4 @@ class InteractiveImageLoader(InteractiveLoader, ImageLoader):
         color = data[1] if len(data) > 1 else self.color_space
         data = data[0]
         bbox = ImageLoader.get_image_bbox(self, None, data.shape[:2])
-        self.minibatch_data.mem[0], _, _ = self.preprocess_image(
-            data, color, True, bbox)
+        return self.preprocess_image(data, color, True, bbox)[0]
@@ -47,7 +47,8 @@ from veles.external.progressbar import ProgressBar
 from veles.memory import interleave
 from veles.loader.base import CLASS_NAME, Loader
 from veles.loader.image import IImageLoader, COLOR_CHANNELS_MAP
-from veles.loader.fullbatch import FullBatchLoader, IFullBatchLoader
+from veles.loader.fullbatch import FullBatchLoader, IFullBatchLoader, \
+    files_fingerprint
 from veles.loader.fullbatch_image import FullBatchImageLoader
 
 
@@ -76,6 +77,10 @@ class PicklesLoader(FullBatchLoader):
     def train_pickles(self):
         return self._train_pickles
 
+    @property
+    def source_fingerprint(self):
+        return files_fingerprint(sum(self._pickles, []))
+
     def reshape(self, shape):
         return shape
 
@@ -181,6 +186,11 @@ class PicklesImageFullBatchLoader(PicklesLoader, FullBatchImageLoader):
     def get_image_data(self, key):
         return self.image_data[key]
 
+    @property
+    def source_fingerprint(self):
+        # FullBatchImageLoader.load_data() has side effects besides originals
+        return None
+
     def get_keys(self, index):
         offsets = [0, self.class_lengths[0],
                    self.class_lengths[0] + self.class_lengths[1],
@@ -212,4 +222,6 @@ class PicklesImageFullBatchLoader(PicklesLoader, FullBatchImageLoader):
     def initialize(self, device, **kwargs):
         super(PicklesImageFullBatchLoader, self).initialize(
             device=device, **kwargs)
-        del self.image_labels
+        if hasattr(self, "image_labels"):
+            # load_data() is skipped if memmap_originals hits the cache
+            del self.image_labels
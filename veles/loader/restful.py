@@ -34,28 +34,45 @@ under the License.
 ███████████████████████████████████████████████████████████████████████████████
 """
 
+from collections import deque
 import numpy
 import threading
-from twisted.internet.task import LoopingCall
+from twisted.internet import reactor
 from zope.interface import implementer
 
 from veles.loader.base import Loader, ILoader, TEST, TRAIN, VALID
+from veles.loader.batching import AdaptiveBatchingPolicy
 from veles.loader.image import ImageLoader
 from veles.mutable import Bool
+from veles.timeit2 import perf_counter
 
 
 class NotFeededError(Exception):
     pass
 
 
+class QueueOverflowError(Exception):
+    pass
+
+
 @implementer(ILoader)
 class RestfulLoader(Loader):
+    """
+    Gathers the requests into minibatches. The next minibatches are filled
+    while the current one is being processed, up to max_queued_minibatches
+    (1 means double buffering); after that, feed() raises
+    QueueOverflowError. A minibatch is processed when it is full or when
+    AdaptiveBatchingPolicy decides so, according to max_response_time and
+    latency_target.
+    """
     MAPPING = "restful"
 
     def __init__(self, workflow, **kwargs):
         super(RestfulLoader, self).__init__(workflow, **kwargs)
         self.complete = Bool(False)
         self.max_response_time = kwargs.get("max_response_time", 0.1)
+        self.latency_target = kwargs.get("latency_target")
+        self.max_queued_minibatches = kwargs.get("max_queued_minibatches", 1)
         self._requests = []
 
     def init_unpickled(self):
@@ -63,8 +80,15 @@ class RestfulLoader(Loader):
         self._event_ = threading.Event()
         self._event_.clear()
         self._lock_ = threading.Lock()
-        self._flusher_ = LoopingCall(self.locked_flush)
+        self._flush_call_ = None
+        self._batching_ = None
         self._minibatch_size_ = 0
+        # (samples, requests, arrival times) which are being filled
+        self._filling_ = None
+        # (samples, requests, arrival times) which are complete and wait for
+        # fill_minibatch()
+        self._queued_ = deque()
+        self._free_buffers_ = []
 
     @property
     def max_response_time(self):
@@ -80,6 +104,34 @@ class RestfulLoader(Loader):
             raise ValueError("max_response_time must be >= 0 (got %s)" % value)
         self._max_response_time = value
 
+    @property
+    def latency_target(self):
+        return getattr(self, "_latency_target", None)
+
+    @latency_target.setter
+    def latency_target(self, value):
+        if value is not None and (not isinstance(value, (int, float)) or
+                                  value <= 0):
+            raise ValueError(
+                "latency_target must be either None or a positive number "
+                "(got %s)" % value)
+        self._latency_target = value
+
+    @property
+    def max_queued_minibatches(self):
+        return getattr(self, "_max_queued_minibatches", 1)
+
+    @max_queued_minibatches.setter
+    def max_queued_minibatches(self, value):
+        if not isinstance(value, int):
+            raise TypeError(
+                "max_queued_minibatches must be an integer (got %s)" %
+                type(value))
+        if value < 1:
+            raise ValueError(
+                "max_queued_minibatches must be >= 1 (got %s)" % value)
+        self._max_queued_minibatches = value
+
     @property
     def requests(self):
         return self._requests
@@ -92,42 +144,132 @@ class RestfulLoader(Loader):
         self.class_lengths[TRAIN] = self.class_lengths[VALID] = 0
         del self._requests[:]
         self._requests.extend((None,) * self.max_minibatch_size)
-        self._flusher_.start(self.max_response_time)
+        self._batching_ = AdaptiveBatchingPolicy(
+            self.max_minibatch_size, self.max_response_time,
+            self.latency_target)
 
     def create_minibatch_data(self):
         self.minibatch_data.reset(numpy.zeros(
-            self._minibatch_data_shape, dtype=self.dtype))
+            (self.max_minibatch_size,) + self._minibatch_data_shape[1:],
+            dtype=self.dtype))
 
     def fill_minibatch(self):
-        self._minibatch_size_ = 0
-        try:
-            self._event_.wait()
-        finally:
-            self._event_.clear()
+        self._batching_.completed()
+        self._event_.wait()
+        with self._lock_:
+            if len(self._queued_) == 0:
+                # stop() was called
+                self._event_.clear()
+                self._minibatch_size_ = 0
+                self._requests[:] = (None,) * self.max_minibatch_size
+                return
+            samples, requests, arrivals = self._queued_.popleft()
+            if len(self._queued_) == 0:
+                self._event_.clear()
+                if self._filling_ is not None:
+                    # The timer does not flush while another minibatch is
+                    # queued, so check the next one now
+                    reactor.callFromThread(self.locked_flush)
+        self._batching_.dispatched(arrivals)
+        size = len(requests)
+        self.minibatch_data.map_invalidate()
+        self.minibatch_data.mem[:size] = samples[:size]
+        self._requests[:] = requests
+        self._requests.extend((None,) * (self.max_minibatch_size - size))
+        self._minibatch_size_ = size
+        with self._lock_:
+            self._free_buffers_.append(samples)
 
     def stop(self):
-        self._flusher_.stop()
+        if self._flush_call_ is not None and self._flush_call_.active():
+            self._flush_call_.cancel()
         self._event_.set()
+        super(RestfulLoader, self).stop()
+
+    def get_metric_names(self):
+        return super(RestfulLoader, self).get_metric_names() | {"Batching"}
+
+    def get_metric_values(self):
+        values = super(RestfulLoader, self).get_metric_values()
+        if self._batching_ is None:
+            return values
+        batching = self._batching_.get_metric_values()
+        with self._lock_:
+            batching["queue depth"] = sum(
+                len(b[1]) for b in self._queued_) + (
+                len(self._filling_[1]) if self._filling_ is not None else 0)
+        values["Batching"] = batching
+        return values
 
     def feed(self, obj, request):
         assert isinstance(obj, numpy.ndarray)
         with self._lock_:
-            self._feed(obj, request)
-            self.requests[self._minibatch_size_] = request
-            self._minibatch_size_ += 1
-            if self._minibatch_size_ == self.max_minibatch_size:
+            filling = self._filling_
+            if filling is None and \
+                    len(self._queued_) >= self.max_queued_minibatches:
+                raise QueueOverflowError(
+                    "%d minibatches are already queued" % len(self._queued_))
+            sample = self._feed(obj, request)
+            if filling is None:
+                filling = self._allocate_buffer(), [], []
+            samples, requests, arrivals = filling
+            try:
+                samples[len(requests)] = sample
+            except Exception:
+                if filling is not self._filling_:
+                    self._free_buffers_.append(samples)
+                raise
+            self._filling_ = filling
+            requests.append(request)
+            now = perf_counter()
+            arrivals.append(now)
+            self._batching_.arrived(now)
+            if len(requests) == self.max_minibatch_size:
                 self.flush()
+            else:
+                self._schedule_flush(now)
 
     def locked_flush(self):
         with self._lock_:
+            if len(self._queued_) == 0:
+                self._flush_if_due()
+
+    def _flush_if_due(self):
+        if self._filling_ is None or len(self._filling_[1]) == 0:
+            return
+        now = perf_counter()
+        if self._flush_time(now) <= now:
             self.flush()
+        else:
+            self._schedule_flush(now)
+
+    def _flush_time(self, now):
+        _, requests, arrivals = self._filling_
+        return self._batching_.flush_time(arrivals[0], len(requests), now)
+
+    def _schedule_flush(self, now):
+        delay = max(self._flush_time(now) - now, 0)
+        if self._flush_call_ is not None and self._flush_call_.active():
+            self._flush_call_.reset(delay)
+        else:
+            self._flush_call_ = reactor.callLater(delay, self.locked_flush)
 
     def flush(self):
-        if self._minibatch_size_ > 0:
+        if self._filling_ is not None:
+            self._queued_.append(self._filling_)
+            self._filling_ = None
             self._event_.set()
 
+    def _allocate_buffer(self):
+        if len(self._free_buffers_) > 0:
+            return self._free_buffers_.pop()
+        return numpy.empty_like(self.minibatch_data.mem)
+
     def _feed(self, obj, request):
-        self.minibatch_data.mem[self._minibatch_size_] = obj
+        """
+        :return: The sample to put into the minibatch.
+        """
+        return obj
 
 
 class RestfulImageLoader(RestfulLoader, ImageLoader):
@@ -163,5 +305,4 @@ class RestfulImageLoader(RestfulLoader, ImageLoader):
     def _feed(self, data, request):
         color = request.get("color_space", self.color_space)
         bbox = ImageLoader.get_image_bbox(self, None, data.shape[:2])
-        self.minibatch_data.mem[self._minibatch_size_], _, _ = \
-            self.preprocess_image(data, color, True, bbox)
+        return self.preprocess_image(data, color, True, bbox)[0]
@@ -12,6 +12,17 @@ Created on Jan 23, 2015
 
 Defines classes to save and to load an arbitrary Loader's output for 1 epoch.
 
+There are two file layouts:
+
+"pickle" - the stream of pickled and compressed chunks in the order of
+serving, followed by the offset table.
+
+"columnar" - the random access layout: the magic, the header offset, the
+fixed stride samples (or the independently compressed blocks of
+block_size samples) in the order of their global indices and finally the
+pickled header with the block offset table. The uncompressed variant is
+read through mmap without unpickling anything, so that it can be shuffled.
+
 ███████████████████████████████████████████████████████████████████████████████
 
 Licensed to the Apache Software Foundation (ASF) under one
@@ -36,9 +47,15 @@ under the License.
 
 
 import bz2
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import gzip
 from io import SEEK_END
+import mmap
 import os
+import struct
+import threading
+import zlib
 
 import numpy
 from six import BytesIO
@@ -49,8 +66,9 @@ from veles import error
 from veles.compat import from_none, lzma
 from veles.config import root
 from veles.loader.base import Loader, ILoader, CLASS_NAME, TRAIN
+from veles.loader.fullbatch import gather
 from veles.pickle2 import pickle, best_protocol
-from veles.snapshotter import SnappyFile
+from veles.snapshotter import SnappyFile, ParallelBlockFile
 from veles.units import Unit, IUnit
 
 
@@ -65,16 +83,42 @@ if not hasattr(gzip, "decompress"):
     gzip.decompress = decompress
 
 
+COLUMNAR_MAGIC = b"VELESMBC"
+COLUMNAR_ALIGNMENT = 4096
+
+# One-shot (compress, decompress) of the independent columnar blocks
+BLOCK_CODECS = {
+    "raw": (lambda b, _: b, lambda b: b),
+    "snappy": (lambda b, _: snappy.compress(b), snappy.decompress),
+    "gz": (zlib.compress, zlib.decompress),
+    "bz2": (bz2.compress, bz2.decompress),
+    "xz": (lambda b, l: lzma.compress(b, preset=l), lzma.decompress),
+    "pgz": (ParallelBlockFile.compress, ParallelBlockFile.decompress)
+}
+
+
+def align_offset(offset, alignment=COLUMNAR_ALIGNMENT):
+    return (offset + alignment - 1) // alignment * alignment
+
+
 @implementer(IUnit)
 class MinibatchesSaver(Unit):
     """Saves data from Loader to pickle file.
+
+    Attributes:
+        layout: "pickle" or "columnar" (see the module's docstring).
+        block_size: the number of samples in each compressed block of the
+            columnar layout.
     """
+    LAYOUTS = "pickle", "columnar"
+
     CODECS = {
         "raw": lambda f, _: f,
         "snappy": lambda f, _: SnappyFile(f, "wb"),
         "gz": lambda f, l: gzip.GzipFile(None, fileobj=f, compresslevel=l),
         "bz2": lambda f, l: bz2.BZ2File(f, compresslevel=l),
-        "xz": lambda f, l: lzma.LZMAFile(f, preset=l)
+        "xz": lambda f, l: lzma.LZMAFile(f, preset=l),
+        "pgz": lambda f, l: ParallelBlockFile(f, "wb", l)
     }
 
     def __init__(self, workflow, **kwargs):
@@ -86,20 +130,56 @@ class MinibatchesSaver(Unit):
         self.compression = kwargs.get("compression", "snappy")
         self.compression_level = kwargs.get("compression_level", 9)
         self.class_chunk_sizes = kwargs.get("class_chunk_sizes", (0, 0, 1))
+        self.layout = kwargs.get("layout", "pickle")
+        self.block_size = kwargs.get("block_size", 64)
         self.offset_table = []
         self.demand(
             "minibatch_data", "minibatch_labels", "minibatch_class",
             "class_lengths", "max_minibatch_size", "minibatch_size",
             "shuffle_limit", "has_labels", "labels_mapping")
+        if self.layout == "columnar":
+            self.demand("minibatch_indices")
 
     def init_unpickled(self):
         super(MinibatchesSaver, self).init_unpickled()
         self._file_ = None
+        self._columns_ = None
 
     @property
     def file(self):
         return self._file_
 
+    @property
+    def layout(self):
+        return self._layout
+
+    @layout.setter
+    def layout(self, value):
+        if value not in self.LAYOUTS:
+            raise ValueError("layout must be one of %s (got %s)" % (
+                ", ".join(self.LAYOUTS), value))
+        self._layout = value
+
+    @property
+    def block_size(self):
+        return self._block_size
+
+    @block_size.setter
+    def block_size(self, value):
+        if not isinstance(value, int) or value < 1:
+            raise ValueError(
+                "block_size must be a positive integer (got %s)" % value)
+        self._block_size = value
+
+    @property
+    def raw_file_name(self):
+        """
+        The columnar layout is first written uncompressed to this file.
+        """
+        if self.compression == "raw":
+            return self.file_name
+        return self.file_name + ".raw"
+
     @property
     def effective_class_chunk_sizes(self):
         chunk_sizes = []
@@ -114,13 +194,56 @@ class MinibatchesSaver(Unit):
         return tuple(chunk_sizes)
 
     def initialize(self, **kwargs):
+        if self.layout == "columnar":
+            self.init_columnar()
+            return
         if self.shuffle_limit != 0:
             raise error.VelesException(
                 "You must disable shuffling in your loader (set shuffle_limit "
-                "to 0)")
+                "to 0) or use the columnar layout")
         self._file_ = open(self.file_name, "wb")
         pickle.dump(self.get_header_data(), self.file, protocol=best_protocol)
 
+    def init_columnar(self):
+        if self.compression not in BLOCK_CODECS:
+            raise ValueError("Unsupported compression: %s" % self.compression)
+        total_samples = sum(self.class_lengths)
+        columns = [("data", self.minibatch_data.shape[1:],
+                    self.minibatch_data.dtype)]
+        if self.has_labels:
+            columns.append(("labels", self.minibatch_labels.shape[1:],
+                            self.minibatch_labels.dtype))
+        self._file_ = open(self.raw_file_name, "w+b")
+        self.file.write(COLUMNAR_MAGIC + struct.pack("<Q", 0))
+        offset = self.file.tell()
+        self._columns_ = []
+        for _, shape, dtype in columns:
+            offset = align_offset(offset)
+            self._columns_.append(offset)
+            offset += total_samples * int(numpy.prod(shape)) * \
+                numpy.dtype(dtype).itemsize
+        self.file.truncate(offset)
+        self._columns_ = [
+            numpy.memmap(self.file, dtype, "r+", offset=offset,
+                         shape=(total_samples,) + shape)
+            for offset, (_, shape, dtype) in zip(self._columns_, columns)]
+
+    def get_columnar_header_data(self):
+        return {
+            "compression": self.compression,
+            "class_lengths": list(self.class_lengths),
+            "data_shape": self.minibatch_data.shape[1:],
+            "data_dtype": self.minibatch_data.dtype,
+            "labels_shape":
+                self.minibatch_labels.shape[1:] if self.has_labels else None,
+            "labels_dtype":
+                self.minibatch_labels.dtype if self.has_labels else None,
+            "labels_mapping": self.labels_mapping,
+            "offsets": [int(column.offset) for column in self._columns_],
+            "block_size": self.block_size,
+            "blocks": None
+        }
+
     def get_header_data(self):
         return self.compression, self.class_lengths, self.max_minibatch_size, \
             self.effective_class_chunk_sizes, \
@@ -149,6 +272,9 @@ class MinibatchesSaver(Unit):
             prepared[1][:] = self.minibatch_labels[interval[0]:interval[1]]
 
     def run(self):
+        if self.layout == "columnar":
+            self.run_columnar()
+            return
         prepared = self.prepare_chunk_data()
         chunk_size = self.effective_class_chunk_sizes[self.minibatch_class]
         chunks_number = int(numpy.ceil(self.max_minibatch_size / chunk_size))
@@ -161,8 +287,22 @@ class MinibatchesSaver(Unit):
             pickle.dump(prepared, file, protocol=best_protocol)
             file.flush()
 
+    def run_columnar(self):
+        self.minibatch_data.map_read()
+        self.minibatch_labels.map_read()
+        self.minibatch_indices.map_read()
+        indices = self.minibatch_indices.mem[:self.minibatch_size]
+        self._columns_[0][indices] = self.minibatch_data.mem[
+            :self.minibatch_size]
+        if self.has_labels:
+            self._columns_[1][indices] = self.minibatch_labels.mem[
+                :self.minibatch_size]
+
     def stop(self):
-        if self.file.closed:
+        if self.file is None or self.file.closed:
+            return
+        if self.layout == "columnar":
+            self.stop_columnar()
             return
         pos = self.file.tell()
         pickle.dump(self.offset_table, self.file, protocol=best_protocol)
@@ -170,6 +310,45 @@ class MinibatchesSaver(Unit):
         self.file.close()
         self.info("Wrote %s", self.file_name)
 
+    def stop_columnar(self):
+        header = self.get_columnar_header_data()
+        for column in self._columns_:
+            column.flush()
+        if self.compression == "raw":
+            self._write_columnar_header(self.file, header)
+        else:
+            with open(self.file_name, "wb") as fout:
+                fout.write(COLUMNAR_MAGIC + struct.pack("<Q", 0))
+                header["blocks"] = self._write_columnar_blocks(fout)
+                header["offsets"] = None
+                self._write_columnar_header(fout, header)
+        self._columns_ = None
+        self.file.close()
+        if self.file.name != self.file_name:
+            os.remove(self.file.name)
+        self.info("Wrote %s", self.file_name)
+
+    def _write_columnar_blocks(self, fout):
+        compress = BLOCK_CODECS[self.compression][0]
+        total_samples = len(self._columns_[0])
+        blocks = []
+        for start in range(0, total_samples, self.block_size):
+            blocks.append(fout.tell())
+            fout.write(compress(b"".join(
+                column[start:start + self.block_size].tobytes()
+                for column in self._columns_), self.compression_level))
+        blocks.append(fout.tell())
+        self.debug("Compressed %d blocks", len(blocks) - 1)
+        return blocks
+
+    @staticmethod
+    def _write_columnar_header(fout, header):
+        fout.seek(0, SEEK_END)
+        pos = fout.tell()
+        pickle.dump(header, fout, protocol=best_protocol)
+        fout.seek(len(COLUMNAR_MAGIC))
+        fout.write(struct.pack("<Q", pos))
+
 
 def decompress_snappy(data):
     bio_in = BytesIO(data)
@@ -178,8 +357,58 @@ def decompress_snappy(data):
     return bio_out.getvalue()
 
 
+class DecodedChunksCache(object):
+    """Thread safe LRU cache of the decoded chunks which is bounded by the
+    total size of the cached chunks in bytes.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def __contains__(self, key):
+        return key in self._chunks
+
+    def get(self, key):
+        with self._lock:
+            try:
+                item = self._chunks.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self._chunks[key] = item
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, chunk, size):
+        if size > self.max_size:
+            return
+        with self._lock:
+            old = self._chunks.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._chunks[key] = chunk, size
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted) = self._chunks.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+            self.size = 0
+
+
 @implementer(ILoader)
 class MinibatchesLoader(Loader):
+    """Loads the data written by MinibatchesSaver in any layout.
+    """
 
     CODECS = {
         "raw": lambda b: b,
@@ -187,6 +416,7 @@ class MinibatchesLoader(Loader):
         "gz": gzip.decompress,
         "bz2": bz2.decompress,
         "xz": lzma.decompress,
+        "pgz": ParallelBlockFile.decompress,
     }
     MAPPING = "minibatches_loader"
 
@@ -203,13 +433,90 @@ class MinibatchesLoader(Loader):
         self.minibatch_labels_shape = None
         self.minibatch_labels_dtype = None
         self.decompress = None
+        self.columnar = False
+        self.block_size = None
+
+    def init_unpickled(self):
+        super(MinibatchesLoader, self).init_unpickled()
+        self._mmap_ = None
+        self._columns_ = None
+        self._file_lock_ = threading.Lock()
+        self._chunks_cache_ = DecodedChunksCache(
+            root.common.loader.chunks_cache_size)
+        self._decompressor_ = None
+
+    @property
+    def decompression_threads(self):
+        return root.common.loader.decompression_threads
+
+    @property
+    def chunks_cache(self):
+        return self._chunks_cache_
 
     @property
     def file(self):
         return self._file_
 
     def load_data(self):
+        self.chunks_cache.clear()
         self._file_ = open(self.file_name, "rb")
+        self.columnar = self.file.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC
+        if self.columnar:
+            self.load_columnar_header()
+        else:
+            self.file.seek(0)
+            self.load_pickle_header()
+        if self.class_lengths[TRAIN] == 0:
+            assert self.normalization_type == "none", \
+                "You specified \"%s\" normalization but there are no train " \
+                "samples to analyze." % self.normalization_type
+            self.normalizer.analyze(self.minibatch_data.mem)
+
+    def load_columnar_header(self):
+        header_offset, = struct.unpack(
+            "<Q", self.file.read(struct.calcsize("<Q")))
+        self.file.seek(header_offset)
+        header = pickle.load(self.file)
+        self.class_lengths[:] = header["class_lengths"]
+        self._labels_mapping = header["labels_mapping"]
+        self._has_labels = header["labels_shape"] is not None
+        self._reversed_labels_mapping[:] = sorted(self.labels_mapping)
+        self.minibatch_data_shape = (0,) + header["data_shape"]
+        self.minibatch_data_dtype = header["data_dtype"]
+        if self.has_labels:
+            self.minibatch_labels_shape = (0,) + header["labels_shape"]
+            self.minibatch_labels_dtype = header["labels_dtype"]
+        self.decompress = BLOCK_CODECS[header["compression"]][1]
+        self.block_size = header["block_size"]
+        if header["blocks"] is not None:
+            self.offset_table = header["blocks"]
+            self.debug("Blocks: %d", len(self.offset_table) - 1)
+            return
+        # Uncompressed samples are accessed directly
+        self._mmap_ = mmap.mmap(
+            self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._columns_ = [
+            numpy.frombuffer(
+                self._mmap_, dtype, self.total_samples * int(
+                    numpy.prod(shape[1:])), offset).reshape(
+                (self.total_samples,) + shape[1:])
+            for offset, shape, dtype in zip(
+                header["offsets"], self._columnar_shapes,
+                self._columnar_dtypes)]
+
+    @property
+    def _columnar_shapes(self):
+        if self.has_labels:
+            return self.minibatch_data_shape, self.minibatch_labels_shape
+        return self.minibatch_data_shape,
+
+    @property
+    def _columnar_dtypes(self):
+        if self.has_labels:
+            return self.minibatch_data_dtype, self.minibatch_labels_dtype
+        return self.minibatch_data_dtype,
+
+    def load_pickle_header(self):
         (codec, class_lengths, self.old_max_minibatch_size,
          self.class_chunk_lengths,
          self.minibatch_data_shape, self.minibatch_data_dtype,
@@ -250,11 +557,6 @@ class MinibatchesLoader(Loader):
         # Virtual end
         self.offset_table.append(self.file.tell() - bm.size)
         self.debug("Offsets: %s", self.offset_table)
-        if self.class_lengths[TRAIN] == 0:
-            assert self.normalization_type == "none", \
-                "You specified \"%s\" normalization but there are no train " \
-                "samples to analyze." % self.normalization_type
-            self.normalizer.analyze(self.minibatch_data.mem)
 
     def create_minibatch_data(self):
         self.minibatch_data.reset(numpy.zeros(
@@ -262,24 +564,100 @@ class MinibatchesLoader(Loader):
             dtype=self.minibatch_data_dtype))
 
     def fill_minibatch(self):
+        if self.columnar:
+            self.fill_minibatch_columnar()
+            return
         chunks_map = [
             self.get_address(sample) + (i,) for i, sample in
             enumerate(self.minibatch_indices.mem[:self.minibatch_size])]
-        chunks_map.sort()
-        prev_chunk_number = -1
-        chunk = None
+        chunks = self.get_chunks(set(c[0] for c in chunks_map))
         for chunk_number, chunk_offset, index in chunks_map:
-            if prev_chunk_number != chunk_number:
-                prev_chunk_number = chunk_number
-                self.file.seek(self.offset_table[chunk_number])
-                buffer = self.file.read(self.offset_table[chunk_number + 1] -
-                                        self.offset_table[chunk_number])
-                chunk = pickle.loads(self.decompress(buffer))
-            mb_data, mb_labels = chunk
+            mb_data, mb_labels = chunks[chunk_number]
             self.minibatch_data[index] = mb_data[chunk_offset]
             if self.has_labels:
                 self.minibatch_labels[index] = mb_labels[chunk_offset]
 
+    def fill_minibatch_columnar(self):
+        indices = self.minibatch_indices.mem[:self.minibatch_size]
+        outputs = [self.minibatch_data.mem]
+        if self.has_labels:
+            outputs.append(self.minibatch_labels.mem)
+        if self._columns_ is not None:
+            for column, output in zip(self._columns_, outputs):
+                gather(column, indices, output)
+            return
+        blocks = indices // self.block_size
+        chunks = self.get_chunks(int(b) for b in numpy.unique(blocks))
+        for block, columns in chunks.items():
+            mask = blocks == block
+            for column, output in zip(columns, outputs):
+                output[:len(indices)][mask] = \
+                    column[indices[mask] - block * self.block_size]
+
+    def get_chunks(self, numbers):
+        """
+        Reads and decodes the specified chunks (blocks in the columnar layout)
+        which are not in the cache, decompressing them in parallel.
+        :return: The mapping from chunk numbers to the decoded chunks.
+        """
+        chunks = {}
+        missing = []
+        for number in numbers:
+            chunk = self._chunks_cache_.get(number)
+            if chunk is None:
+                missing.append(number)
+            else:
+                chunks[number] = chunk
+        if len(missing) == 0:
+            return chunks
+        with self._file_lock_:
+            buffers = []
+            for number in sorted(missing):
+                start, finish = self.offset_table[number:number + 2]
+                self.file.seek(start)
+                buffers.append((number, self.file.read(finish - start)))
+        if len(buffers) > 1 and self.decompression_threads > 1:
+            if self._decompressor_ is None:
+                self._decompressor_ = ThreadPoolExecutor(
+                    self.decompression_threads)
+            decoded = self._decompressor_.map(self.decode_chunk, *zip(
+                *buffers))
+        else:
+            decoded = (self.decode_chunk(*b) for b in buffers)
+        for (number, _), (chunk, size) in zip(buffers, decoded):
+            chunks[number] = chunk
+            self._chunks_cache_.put(number, chunk, size)
+        return chunks
+
+    def decode_chunk(self, number, buffer):
+        """
+        Decompresses and deserializes the chunk. Snappy, zlib, bz2 and lzma
+        release the GIL, so this is executed in parallel.
+        :return: The chunk and its size in bytes.
+        """
+        buffer = self.decompress(buffer)
+        if not self.columnar:
+            chunk = pickle.loads(buffer)
+            return chunk, sum(a.nbytes for a in chunk if a is not None)
+        length = min(self.block_size,
+                     self.total_samples - number * self.block_size)
+        columns = []
+        offset = 0
+        for shape, dtype in zip(self._columnar_shapes, self._columnar_dtypes):
+            count = length * int(numpy.prod(shape[1:]))
+            columns.append(numpy.frombuffer(
+                buffer, dtype, count, offset).reshape((length,) + shape[1:]))
+            offset += count * numpy.dtype(dtype).itemsize
+        return columns, len(buffer)
+
+    def stop(self):
+        super(MinibatchesLoader, self).stop()
+        if self._decompressor_ is not None:
+            self._decompressor_.shutdown()
+            self._decompressor_ = None
+        self.debug("Decoded chunks cache: %d hits, %d misses",
+                   self._chunks_cache_.hits, self._chunks_cache_.misses)
+
     def map_minibatch_labels(self):
         # Already done in fill_minibatch()
         pass
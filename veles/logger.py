@@ -40,9 +40,16 @@ from copy import copy
 import logging.handlers
 import os
 from pymongo import MongoClient
+try:
+    from pymongo.write_concern import WriteConcern
+except ImportError:
+    # pymongo < 3.0
+    WriteConcern = None
 import re
-from six import StringIO, PY3
+from six import StringIO, PY3, print_
+from six.moves.queue import Queue, Empty, Full
 import sys
+import threading
 import time
 
 if PY3:
@@ -208,9 +215,11 @@ class Logger(object):
 
     @staticmethod
     def duplicate_all_logging_to_mongo(addr, docid, nodeid):
+        from veles.thread_pool import ThreadPool
         handler = MongoLogHandler(addr=addr, docid=docid, nodeid=nodeid)
         logging.getLogger("Logger").info("Saving logs to Mongo on %s", addr)
         logging.getLogger().addHandler(handler)
+        ThreadPool.register_atexit(handler.flush, weak=False)
 
     def change_log_message(self, msg):
         return msg
@@ -286,18 +295,46 @@ class Logger(object):
                     raise ValueError("Event kwargs may not contain %s" %
                                      dupkeys)
                 data.update(info)
-                handler.events.insert(data, w=0)
+                handler.emit_event(data)
 
 
 class MongoLogHandler(logging.Handler):
-    def __init__(self, addr, docid, nodeid, level=logging.NOTSET):
+    """
+    Ships the log records and the events to MongoDB from a background
+    thread, so that logging never waits for the database. The documents
+    are queued and inserted in bulks of up to batch_size, at least every
+    flush_interval seconds. If the queue is full (queue_size), the new
+    documents are dropped and counted in "dropped".
+    """
+    FLUSH = "flush"
+    STOP = "stop"
+
+    def __init__(self, addr, docid, nodeid, level=logging.NOTSET,
+                 queue_size=10000, batch_size=500, flush_interval=0.5):
         super(MongoLogHandler, self).__init__(level)
         self._client = MongoClient("mongodb://" + addr)
         self._db = self._client.veles
-        self._collection = self._db.logs
-        self._events = self._db.events
+        if WriteConcern is not None:
+            unacknowledged = WriteConcern(w=0)
+            self._collection = self._db.logs.with_options(
+                write_concern=unacknowledged)
+            self._events = self._db.events.with_options(
+                write_concern=unacknowledged)
+        else:
+            self._collection = self._db.logs
+            self._events = self._db.events
         self._log_id = docid
         self._node_id = nodeid
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.shipped = 0
+        self._counters_lock = threading.Lock()
+        self._queue = Queue(queue_size)
+        self._shipper = threading.Thread(
+            target=self._ship, name="MongoLogHandler")
+        self._shipper.daemon = True
+        self._shipper.start()
 
     @property
     def log_id(self):
@@ -326,7 +363,79 @@ class MongoLogHandler(logging.Handler):
             data["pathname"] = os.path.relpath(data["pathname"], __root__)
         if data["exc_info"] is not None:
             data["exc_info"] = repr(data["exc_info"])
+        self._enqueue(self._collection, data)
+
+    def emit_event(self, data):
+        self._enqueue(self._events, data)
+
+    def flush(self):
+        """
+        Waits until all the queued documents are sent.
+        """
+        if self._shipper.is_alive():
+            self._queue.put(MongoLogHandler.FLUSH)
+            self._queue.join()
+
+    def close(self):
+        if self._shipper.is_alive():
+            self._queue.put(MongoLogHandler.STOP)
+            self._shipper.join()
+        super(MongoLogHandler, self).close()
+
+    def _count(self, name, value):
+        with self._counters_lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def _enqueue(self, collection, data):
+        try:
+            self._queue.put_nowait((collection, data))
+        except Full:
+            self._count("dropped", 1)
+
+    def _ship(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.time() + self.flush_interval
+            while len(items) < self.batch_size and \
+                    isinstance(items[-1], tuple):
+                try:
+                    items.append(self._queue.get(
+                        timeout=max(deadline - time.time(), 0)))
+                except Empty:
+                    break
+            for collection in self._collection, self._events:
+                self._insert(collection, [
+                    i[1] for i in items
+                    if isinstance(i, tuple) and i[0] is collection])
+            for _ in items:
+                self._queue.task_done()
+            if items[-1] == MongoLogHandler.STOP:
+                break
+
+    def _insert(self, collection, docs):
+        if len(docs) == 0:
+            return
         try:
-            self._collection.insert(data, w=0)
+            if hasattr(collection, "insert_many"):
+                collection.insert_many(docs, ordered=False)
+            else:
+                collection.insert(docs, w=0, continue_on_error=True)
         except bson.errors.InvalidDocument:
-            raise TypeError("bson failed to encode %s" % data)
+            for doc in docs:
+                try:
+                    if hasattr(collection, "insert_one"):
+                        collection.insert_one(doc)
+                    else:
+                        collection.insert(doc, w=0)
+                except bson.errors.InvalidDocument:
+                    self._count("dropped", 1)
+                    print_("bson failed to encode %s" % doc, file=sys.stderr)
+                else:
+                    self._count("shipped", 1)
+            return
+        except Exception as e:
+            self._count("dropped", len(docs))
+            print_("Failed to send %d documents to MongoDB: %s" %
+                   (len(docs), e), file=sys.stderr)
+            return
+        self._count("shipped", len(docs))
@@ -57,6 +57,9 @@ class Uniform(AcceleratedUnit):
     """
 
     backend_methods = AcceleratedUnit.backend_methods + ("fill",)
+    # xorshift1024* constants, must be the same as in ocl/random.cl
+    SHIFTS = tuple(numpy.uint64(s) for s in (31, 11, 30))
+    MULTIPLIER = numpy.uint64(1181783497276652981)
 
     def __init__(self, workflow, **kwargs):
         super(Uniform, self).__init__(workflow, **kwargs)
@@ -135,32 +138,27 @@ class Uniform(AcceleratedUnit):
         self.output.map_invalidate()
         n_rounds = nbytes // bytes_per_round
 
-        u64 = numpy.array([1181783497276652981], dtype=numpy.uint64)
-        s0 = numpy.zeros(1, dtype=numpy.uint64)
-        s1 = numpy.zeros(1, dtype=numpy.uint64)
-
-        states = self.states.mem.view(dtype=numpy.uint64)
-        states = states.reshape(states.size // 16, 16)
-        output = self.output.mem.view(dtype=numpy.uint64)
-        for i in range(self.num_states):
-            offs = i
-            s = states[i]
-            self.p = 0
-            for _round in range(n_rounds):
-                for _iter in range(16):
-                    output[offs] = self._next_rand(s, s0, s1, u64)
-                    offs += self.num_states
-
-    def _next_rand(self, s, s0, s1, u64):
-        s0[0] = s[self.p]
-        self.p = (self.p + 1) & 15
-        s1[0] = s[self.p]
-        s1 ^= s1 << 31
-        s1 ^= s1 >> 11
-        s0 ^= s0 >> 30
-        s0 ^= s1
-        s[self.p] = s0[0]
-        return (s0 * u64)[0]
+        # All the generators advance in lock-step: row i holds the i-th
+        # word of every state, and step j of the kernel writes output row j
+        states = self.states.mem.view(dtype=numpy.uint64).reshape(-1, 16)
+        s = states.transpose().copy()
+        # output may be of any dtype, so nbytes must be counted in bytes
+        output = self.output.plain.view(dtype=numpy.uint8)[:nbytes].view(
+            dtype=numpy.uint64).reshape(n_rounds * 16, self.num_states)
+        s1 = numpy.empty(self.num_states, dtype=numpy.uint64)
+        tmp = numpy.empty_like(s1)
+        for step in range(n_rounds * 16):
+            s0 = s[step & 15]
+            p = (step + 1) & 15
+            numpy.left_shift(s[p], Uniform.SHIFTS[0], out=s1)
+            s1 ^= s[p]
+            numpy.right_shift(s1, Uniform.SHIFTS[1], out=tmp)
+            s1 ^= tmp
+            numpy.right_shift(s0, Uniform.SHIFTS[2], out=tmp)
+            tmp ^= s0
+            numpy.bitwise_xor(tmp, s1, out=s[p])
+            numpy.multiply(s[p], Uniform.MULTIPLIER, out=output[step])
+        states[:] = s.transpose()
 
     def fill(self, nbytes):
         self._backend_fill_(nbytes)
@@ -36,6 +36,7 @@ under the License.
 
 
 import base64
+from collections import deque
 import json
 from itertools import islice
 from time import strftime, localtime
@@ -48,9 +49,33 @@ from zope.interface import implementer
 from veles.config import root
 from veles.distributable import TriviallyDistributable, IDistributable
 from veles.json_encoders import NumpyJSONEncoder
+from veles.loader.restful import QueueOverflowError
+from veles.memory import Array
+from veles.result_provider import IResultProvider
+from veles.timeit2 import perf_counter
 from veles.units import IUnit, Unit
 
 
+JSON_CONTENT_TYPE = b"application/json"
+BINARY_CONTENT_TYPE = b"application/octet-stream"
+
+
+def parse_dtype(name):
+    """
+    Converts numpy.dtype name with the optional byte order suffix ("<", "="
+    or ">"), e.g. "float32<", to numpy.dtype.
+    """
+    if name and name[-1] in "<=>":
+        byte_order = name[-1]
+        name = name[:-1]
+    else:
+        byte_order = None
+    dtype = numpy.dtype(name)
+    if byte_order is not None:
+        dtype = dtype.newbyteorder(byte_order)
+    return dtype
+
+
 class APIResource(Resource):
     isLeaf = True
 
@@ -64,28 +89,46 @@ class APIResource(Resource):
             page = NoResource(
                 message="API path %s is not supported" % request.URLPath())
             return page.render(request)
-        if request.getHeader(b"Content-Type") != b"application/json":
+        content_type = request.getHeader(b"Content-Type")
+        if content_type not in (JSON_CONTENT_TYPE, BINARY_CONTENT_TYPE):
             page = NoResource(
-                message="Unsupported Content-Type (must be \"application/json"
-                        "\")" % request.URLPath())
+                message="Unsupported Content-Type (must be either \"%s\" or "
+                        "\"%s\")" % (JSON_CONTENT_TYPE.decode(),
+                                     BINARY_CONTENT_TYPE.decode()))
             return page.render(request)
-        request.setHeader(b"Content-Type", b"application/json")
+        request.setHeader(b"Content-Type", content_type)
         self._callback(request)
         return NOT_DONE_YET
 
 
-@implementer(IUnit, IDistributable)
+@implementer(IUnit, IDistributable, IResultProvider)
 class RESTfulAPI(Unit, TriviallyDistributable):
+    """
+    Serves the model over HTTP. The input is POST-ed either as JSON
+    ({"input": ..., "codec": "list" | "base64", ...}) or as the raw array
+    bytes with "application/octet-stream" Content-Type and the array type
+    and shape in X-Veles-Type and X-Veles-Shape headers. The result is
+    returned in the same format as the input.
+    """
+    TYPE_HEADER = b"X-Veles-Type"
+    SHAPE_HEADER = b"X-Veles-Shape"
+    LATENCY_HEADER = b"X-Veles-Latency"
+
     def __init__(self, workflow, **kwargs):
         kwargs["view_group"] = "SERVICE"
         super(RESTfulAPI, self).__init__(workflow, **kwargs)
         self.port = kwargs.get("port", root.common.api.port)
         self.path = kwargs.get("path", root.common.api.path)
+        self.latency_window = kwargs.get("latency_window", 1000)
+        self._latencies_ = deque(maxlen=self.latency_window)
         self.demand("feed", "requests", "results", "minibatch_size")
 
     def init_unpickled(self):
         super(RESTfulAPI, self).init_unpickled()
         self._listener_ = None
+        self._arrivals_ = {}
+        self._latencies_ = deque(maxlen=getattr(self, "latency_window", 1000))
+        self._served_ = 0
 
     @property
     def port(self):
@@ -109,33 +152,96 @@ class RESTfulAPI(Unit, TriviallyDistributable):
             raise ValueError("Invalid path: %s", value)
         self._path = value
 
+    @property
+    def latencies(self):
+        """
+        The response times of the last "latency_window" requests, in seconds.
+        """
+        return numpy.array(self._latencies_)
+
     def initialize(self, **kwargs):
         self._listener_ = reactor.listenTCP(
             self.port, Site(APIResource(self.path, self.serve)))
         self.info("Listening on 0.0.0.0:%d%s", self.port, self.path)
 
     def run(self):
-        reactor.callFromThread(self.respond)
+        # The responses are encoded here, because the loader may start to
+        # fill the next minibatch as soon as this method returns
+        responses = [(request, self.encode(request, result))
+                     for request, result in islice(
+                         zip(self.requests, self.results), 0,
+                         self.minibatch_size)
+                     if request is not None]
+        reactor.callFromThread(self.respond, responses)
 
     def stop(self):
         if self._listener_ is not None:
             self._listener_.stopListening()
 
-    def respond(self):
-        for request, result in islice(zip(self.requests, self.results),
-                                      0, self.minibatch_size):
-            if request is None:
-                continue
-            request.write(json.dumps({"result": result},
-                                     cls=NumpyJSONEncoder).encode("utf-8"))
+    def get_metric_names(self):
+        return {"Latency"}
+
+    def get_metric_values(self):
+        latencies = self.latencies
+        if len(latencies) == 0:
+            return {"Latency": {"requests": self._served_}}
+        return {"Latency": {
+            "requests": self._served_,
+            "mean": float(numpy.mean(latencies)),
+            "median": float(numpy.percentile(latencies, 50)),
+            "p99": float(numpy.percentile(latencies, 99)),
+            "max": float(numpy.max(latencies))}}
+
+    @staticmethod
+    def is_binary(request):
+        return request.getHeader(b"Content-Type") == BINARY_CONTENT_TYPE
+
+    def encode(self, request, result):
+        """
+        Serializes the result of the specified request.
+        :return: The tuple of the response headers and the body.
+        """
+        if isinstance(result, Array):
+            result.map_read()
+            result = result.mem
+        if not self.is_binary(request):
+            return {}, json.dumps({"result": result},
+                                  cls=NumpyJSONEncoder).encode("utf-8")
+        result = numpy.asarray(result)
+        result = numpy.ascontiguousarray(
+            result, dtype=result.dtype.newbyteorder("<"))
+        return {self.TYPE_HEADER: (result.dtype.name + "<").encode(),
+                self.SHAPE_HEADER: ",".join(
+                    str(d) for d in result.shape).encode()}, result.tobytes()
+
+    def respond(self, responses):
+        for request, (headers, body) in responses:
+            for key, value in headers.items():
+                request.setHeader(key, value)
+            self._register_latency(request)
+            request.write(body)
             request.finish()
 
-    def fail(self, request, message):
+    def fail(self, request, message, code=400):
         self.warning(message)
-        request.setResponseCode(400)
-        request.write(json.dumps({"error": message}).encode('utf-8'))
+        self._arrivals_.pop(request, None)
+        request.setResponseCode(code)
+        if self.is_binary(request):
+            request.setHeader(b"Content-Type", b"text/plain")
+            request.write(message.encode('utf-8'))
+        else:
+            request.write(json.dumps({"error": message}).encode('utf-8'))
         request.finish()
 
+    def _register_latency(self, request):
+        arrival = self._arrivals_.pop(request, None)
+        if arrival is None:
+            return
+        latency = perf_counter() - arrival
+        self._latencies_.append(latency)
+        self._served_ += 1
+        request.setHeader(self.LATENCY_HEADER, ("%.6f" % latency).encode())
+
     def _decode_base64(self, request, response, input_obj):
         # base64 codec
         if "shape" not in response:
@@ -157,19 +263,12 @@ class RESTfulAPI(Unit, TriviallyDistributable):
             # this will result in numpy.float64
             self.fail(request, "\"type\" must not be null")
             return None
-        if dtype_name[-1] in "<=>":
-            byte_order = dtype_name[-1]
-            dtype_name = dtype_name[:-1]
-        else:
-            byte_order = None
         try:
-            dtype = numpy.dtype(dtype_name)
+            dtype = parse_dtype(dtype_name)
         except TypeError:
             self.fail(request, "Invalid \"type\" value. For the list of "
                                "supported values, see numpy.dtype.")
             return None
-        if byte_order is not None:
-            dtype = dtype.newbyteorder(byte_order)
         try:
             buffer = base64.b64decode(input_obj)
         except base64.binascii.Error as e:
@@ -181,37 +280,75 @@ class RESTfulAPI(Unit, TriviallyDistributable):
             self.fail(request, "Failed to create the numpy array: %s." % e)
             return None
 
-    def serve(self, request):
-        raw_response = request.content.read()
+    def _decode_binary(self, request, raw):
+        dtype_name = request.getHeader(self.TYPE_HEADER)
+        if not dtype_name:
+            self.fail(request, "There is no %s header which defines the "
+                               "array data type (e.g., \"float32<\" or "
+                               "\"uint8\", see numpy.dtype)" %
+                      self.TYPE_HEADER.decode())
+            return None
+        try:
+            dtype = parse_dtype(dtype_name.decode("charmap"))
+        except TypeError:
+            self.fail(request, "Invalid %s value. For the list of supported "
+                               "values, see numpy.dtype." %
+                      self.TYPE_HEADER.decode())
+            return None
+        shape = request.getHeader(self.SHAPE_HEADER)
+        try:
+            shape = tuple(int(d) for d in shape.split(b","))
+        except (AttributeError, ValueError):
+            self.fail(request, "%s header must be the comma separated array "
+                               "dimensions" % self.SHAPE_HEADER.decode())
+            return None
+        try:
+            return numpy.frombuffer(raw, dtype).reshape(shape)
+        except Exception as e:
+            self.fail(request, "Failed to create the numpy array: %s." % e)
+            return None
+
+    def _decode_json(self, request, raw):
         try:
-            response = json.loads(raw_response.decode('utf-8'))
+            response = json.loads(raw.decode('utf-8'))
         except ValueError:
             self.fail(request, "Failed to parse JSON")
-            return
+            return None
         if not isinstance(response, dict) or "input" not in response \
                 or "codec" not in response:
             self.fail(request, "Invalid input format: there must be \"input\" "
                                "and \"codec\" attributes")
-            return
+            return None
         input_obj = response["input"]
         codec = response["codec"]
         if codec not in ("list", "base64"):
             self.fail(request, "Invalid codec value: must be either \"list\" "
                                "or \"base64\"")
-            return
+            return None
         if codec == "list":
             try:
-                data = numpy.array(input_obj, numpy.float32)
+                return numpy.array(input_obj, numpy.float32)
             except ValueError:
                 self.fail(request, "Invalid input array format")
-                return
+                return None
+        return self._decode_base64(request, response, input_obj)
+
+    def serve(self, request):
+        self._arrivals_[request] = perf_counter()
+        raw_response = request.content.read()
+        if self.is_binary(request):
+            data = self._decode_binary(request, raw_response)
         else:
-            data = self._decode_base64(request, response, input_obj)
-            if data is None:
-                return
+            data = self._decode_json(request, raw_response)
+        if data is None:
+            return
         try:
             self.feed(data, request)
+        except QueueOverflowError as e:
+            self.fail(request, "Server is overloaded: %s" % e, 503)
+            return
         except Exception as e:
             self.fail(request, "Invalid input value: %s" % e)
+            return
         self.debug("%s: received %d bytes", strftime("%X", localtime()),
                    len(raw_response))
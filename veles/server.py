@@ -164,7 +164,8 @@ class ZmqRouter(ZmqConnection, Logger):
             if io_overflow or self.shmem.get(node_id) is None:
                 self.shmem[node_id] = SharedIO(
                     "veles-job-" + node_id,
-                    int(pickles_size * (1.0 + ZmqRouter.RESERVE_SHMEM_SIZE)))
+                    int(pickles_size * (1.0 + ZmqRouter.RESERVE_SHMEM_SIZE)),
+                    root.common.engine.shared_memory_zerocopy)
         self.event("ZeroMQ", "end", dir="send", id=node_id,
                    command=channel.decode('charmap'), height=0.5)
 
@@ -502,7 +503,8 @@ class VelesProtocol(StringLineReceiver, IDLogger):
                 self.warning("Did not recognize the received ID %s")
                 must_reply = True
             else:
-                self.sendLine({'reconnect': "ok"})
+                self.sendLine({'reconnect': "ok",
+                               'encoding': self._negotiateEncoding(msg)})
         if must_reply:
             try:
                 _, mid, pid = self._extractClientInformation(msg)
@@ -513,7 +515,8 @@ class VelesProtocol(StringLineReceiver, IDLogger):
                 SlaveDescription.make(self.nodes[self.id]))
             endpoint = self.host.choose_endpoint(self.id, mid, pid, self.hip)
             self.nodes[self.id]['endpoint'] = self._endpoint = endpoint
-            retmsg = {'endpoint': endpoint, 'data': data}
+            retmsg = {'endpoint': endpoint, 'data': data,
+                      'encoding': self._negotiateEncoding(msg)}
             if not msgid:
                 retmsg['id'] = self.id
             retmsg['log_id'] = self.host.launcher.log_id
@@ -537,6 +540,10 @@ class VelesProtocol(StringLineReceiver, IDLogger):
             self.error("no 'power' key in the message")
         return
 
+    def _negotiateEncoding(self, msg):
+        return self.host.workflow.negotiate_update_encoding(
+            self.id, msg.get("encodings", []))
+
     def _extractClientInformation(self, msg):
         power = msg.get("power")
         mid = msg.get("mid")
@@ -36,14 +36,24 @@ under the License.
 
 
 import bz2
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 import gzip
+import hashlib
+from io import SEEK_END
+import json
 import logging
+import multiprocessing
+import numpy
 import os
 import pyodbc
 from six import BytesIO, add_metaclass
 import snappy
+import struct
+import threading
 import time
+import zlib
 from zope.interface import implementer, Interface
 
 from veles.compat import lzma, from_none, FileNotFoundError
@@ -52,7 +62,7 @@ from veles.distributable import IDistributable
 from veles.external.prettytable import PrettyTable
 from veles.mapped_object_registry import MappedObjectsRegistry
 from veles.mutable import Bool
-from veles.pickle2 import pickle, best_protocol
+from veles.pickle2 import pickle, best_protocol, UnpicklingError
 from veles.result_provider import IResultProvider
 from veles.unit_registry import UnitRegistry
 from veles.units import Unit, IUnit
@@ -93,7 +103,7 @@ class SnapshotterBase(Unit):
 
     Attributes:
         compression - the compression applied to pickles: None or '', snappy,
-                      gz, bz2, xz
+                      gz, bz2, xz, pgz (see :class:`ParallelBlockFile`)
         compression_level - the compression level in [0..9]
         interval - take only one snapshot within this run() invocations number
         time_interval - take no more than one snapshot within this time window
@@ -234,9 +244,12 @@ class SnapshotterBase(Unit):
             self.run()
 
     @staticmethod
-    def _import_fobj(fobj):
+    def _import_fobj(fobj, blobs=None):
         try:
-            obj = pickle.load(fobj)
+            if blobs is None:
+                obj = pickle.load(fobj)
+            else:
+                obj = blobs.unpickler(fobj).load()
         except ImportError as e:
             logging.getLogger("Snapshotter").error(
                 "Are you trying to import snapshot belonging to a different "
@@ -356,9 +369,402 @@ class SnappyFile(object):
         self.close()
 
 
+class ParallelBlockFile(object):
+    """
+    File-like object which splits the stream into independent blocks of
+    block_size bytes and (de)compresses them with zlib in a thread pool.
+    zlib releases the GIL, so this scales with the number of cores.
+    The stream is laid out as follows:
+
+        HEADER | block 0 | block 1 | ... | block N-1 | index | FOOTER
+
+    where index is N + 1 little endian uint64 offsets of the blocks relative
+    to the beginning of the stream (the last one is the offset of the index).
+    Like in :class:`SnappyFile`, flush() finishes the stream.
+    All the instances share the thread pools, and the streams of a single
+    block are (de)compressed in the calling thread.
+    """
+    MAGIC = b"VELESPGZ"
+    HEADER = struct.Struct("<8sI")
+    FOOTER = struct.Struct("<QQ8s")
+    _executors = {}
+    _executors_lock = threading.Lock()
+
+    def __init__(self, file_name_or_obj, file_mode, level=6,
+                 block_size=1 << 22, threads=None):
+        if isinstance(file_name_or_obj, str):
+            self._file = open(file_name_or_obj, file_mode)
+            self._owns_file = True
+        else:
+            self._file = file_name_or_obj
+            self._owns_file = False
+        if threads is None:
+            threads = root.common.engine.compression_threads
+        if not threads:
+            threads = multiprocessing.cpu_count()
+        self.threads = threads
+        self.level = level
+        self._pending = deque()
+        self._start = self._file.tell()
+        self._writing = file_mode == "wb"
+        self.closed = False
+        if self._writing:
+            self.block_size = block_size
+            self._buffer = bytearray()
+            self._offsets = []
+            self._pos = ParallelBlockFile.HEADER.size
+            self._finished = False
+            self._file.write(ParallelBlockFile.HEADER.pack(
+                ParallelBlockFile.MAGIC, block_size))
+        else:
+            self._buffer = b""
+            self._buffer_pos = 0
+            self._read_index()
+
+    @property
+    def mode(self):
+        return self._file.mode
+
+    @property
+    def fileobj(self):
+        return self._file
+
+    @property
+    def window(self):
+        """
+        The maximal number of blocks in flight.
+        """
+        return self.threads * 2
+
+    def write(self, data):
+        if self._finished:
+            raise ValueError("The stream has already been finished")
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def read(self, length=-1):
+        parts = []
+        while length is None or length < 0 or length > 0:
+            if self._buffer_pos >= len(self._buffer) and \
+                    not self._next_block():
+                break
+            end = len(self._buffer) if length is None or length < 0 \
+                else self._buffer_pos + length
+            part = self._buffer[self._buffer_pos:end]
+            self._buffer_pos += len(part)
+            if length is not None and length > 0:
+                length -= len(part)
+            parts.append(part)
+        return b"".join(parts)
+
+    def readline(self):
+        parts = []
+        while self._buffer_pos < len(self._buffer) or self._next_block():
+            end = self._buffer.find(b"\n", self._buffer_pos) + 1
+            if end == 0:
+                end = len(self._buffer)
+            parts.append(self._buffer[self._buffer_pos:end])
+            self._buffer_pos = end
+            if parts[-1].endswith(b"\n"):
+                break
+        return b"".join(parts)
+
+    def flush(self):
+        if not self._writing or self._finished:
+            return
+        if len(self._buffer) > 0:
+            self._submit(bytes(self._buffer), len(self._pending) == 0)
+            self._buffer = bytearray()
+        while len(self._pending) > 0:
+            self._write_block(self._pending.popleft().result())
+        self._offsets.append(self._pos)
+        self._file.write(struct.pack(
+            "<%dQ" % len(self._offsets), *self._offsets))
+        self._file.write(ParallelBlockFile.FOOTER.pack(
+            self._pos, len(self._offsets) - 1, ParallelBlockFile.MAGIC))
+        self._file.flush()
+        self._finished = True
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        for future in self._pending:
+            future.cancel()
+        if self._owns_file:
+            self._file.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    @staticmethod
+    def compress(data, level=6):
+        fio = BytesIO()
+        with ParallelBlockFile(fio, "wb", level) as fout:
+            fout.write(data)
+        return fio.getvalue()
+
+    @staticmethod
+    def decompress(data):
+        with ParallelBlockFile(BytesIO(data), "rb") as fin:
+            return fin.read()
+
+    @staticmethod
+    def _get_executor(threads):
+        with ParallelBlockFile._executors_lock:
+            executor = ParallelBlockFile._executors.get(threads)
+            if executor is None:
+                executor = ParallelBlockFile._executors[threads] = \
+                    ThreadPoolExecutor(threads)
+            return executor
+
+    def _execute(self, inline, func, *args):
+        """
+        :return: The future of func(*args), which is executed in the shared
+        thread pool unless inline is True.
+        """
+        if not inline and self.threads > 1:
+            return self._get_executor(self.threads).submit(func, *args)
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+    def _submit(self, block, inline=False):
+        self._pending.append(self._execute(
+            inline, zlib.compress, block, self.level))
+        while len(self._pending) > self.window:
+            self._write_block(self._pending.popleft().result())
+
+    def _write_block(self, data):
+        self._offsets.append(self._pos)
+        self._file.write(data)
+        self._pos += len(data)
+
+    def _read_index(self):
+        magic, _ = ParallelBlockFile.HEADER.unpack(
+            self._file.read(ParallelBlockFile.HEADER.size))
+        if magic != ParallelBlockFile.MAGIC:
+            raise ValueError("Not a parallel block compressed stream")
+        self._file.seek(-ParallelBlockFile.FOOTER.size, SEEK_END)
+        index_pos, blocks, magic = ParallelBlockFile.FOOTER.unpack(
+            self._file.read(ParallelBlockFile.FOOTER.size))
+        if magic != ParallelBlockFile.MAGIC:
+            raise ValueError("The parallel block compressed stream is "
+                             "truncated")
+        self._file.seek(self._start + index_pos)
+        self._offsets = struct.unpack(
+            "<%dQ" % (blocks + 1), self._file.read(8 * (blocks + 1)))
+        self._file.seek(self._start + self._offsets[0])
+        self._next_index = 0
+
+    def _next_block(self):
+        # The file is read sequentially in this thread, only the
+        # decompression is parallel
+        while len(self._pending) < self.window and \
+                self._next_index < len(self._offsets) - 1:
+            data = self._file.read(self._offsets[self._next_index + 1] -
+                                   self._offsets[self._next_index])
+            self._pending.append(self._execute(
+                len(self._offsets) == 2, zlib.decompress, data))
+            self._next_index += 1
+        if len(self._pending) == 0:
+            return False
+        self._buffer = self._pending.popleft().result()
+        self._buffer_pos = 0
+        return True
+
+
+class SnapshotBlobs(object):
+    """
+    Content-addressed storage of numpy arrays shared by the snapshots in the
+    same directory. Each array is written once as raw bytes under its SHA1
+    and the snapshot pickle holds only the references. If mmap is True, the
+    arrays are restored as copy-on-write memory maps of the blobs, so that
+    the pages are read on first access and are shared with the page cache.
+    If deferred is True, the new blobs are copied into memory and are written
+    by flush(), so that a background thread can do it.
+    """
+    PERSISTENT_TAG = "veles-blob"
+
+    def __init__(self, directory, threshold=1 << 16, mmap=False,
+                 deferred=False):
+        self.directory = directory
+        self.threshold = threshold
+        self.mmap = mmap
+        self.deferred = deferred
+        self.referenced = set()
+        self.pending = {}
+        self.written = 0
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def pickler(self, fobj):
+        """
+        :return: Pickler which stores the big arrays into the blobs.
+        """
+        pickler = pickle.Pickler(fobj, protocol=best_protocol)
+        # Persistent ids bypass the pickle memo, so every array is numbered
+        # to be restored as a single object wherever it is referenced.
+        # The arrays are kept alive till the end so that ids are not reused.
+        stored = {}
+
+        def persistent_id(obj):
+            known = stored.get(id(obj))
+            if known is not None:
+                return known[1]
+            pid = self.store(obj)
+            if pid is not None:
+                pid += (len(stored),)
+                stored[id(obj)] = obj, pid
+            return pid
+
+        pickler.persistent_id = persistent_id
+        return pickler
+
+    def unpickler(self, fobj):
+        """
+        :return: Unpickler which restores the big arrays from the blobs.
+        """
+        unpickler = pickle.Unpickler(fobj)
+        loaded = {}
+
+        def persistent_load(pid):
+            if len(pid) < 5:
+                # written before the arrays were numbered
+                return self.load(pid)
+            arr = loaded.get(pid[4])
+            if arr is None:
+                arr = loaded[pid[4]] = self.load(pid[:4])
+            return arr
+
+        unpickler.persistent_load = persistent_load
+        return unpickler
+
+    def store(self, obj):
+        if not isinstance(obj, numpy.ndarray) or obj.dtype.hasobject or \
+                obj.nbytes < self.threshold:
+            return None
+        arr = numpy.ascontiguousarray(obj)
+        digest = hashlib.sha1(
+            memoryview(arr.reshape(-1).view(numpy.uint8))).hexdigest()
+        path = self.path(digest)
+        # the existing blob is touched so that collect_garbage() keeps it
+        # until the manifest of this snapshot is written
+        if digest not in self.referenced and not self._touch(path):
+            if self.deferred:
+                # the array may change before flush()
+                self.pending[digest] = numpy.array(arr)
+            else:
+                self._write(path, arr)
+        self.referenced.add(digest)
+        return SnapshotBlobs.PERSISTENT_TAG, digest, arr.dtype, arr.shape
+
+    def flush(self):
+        """
+        Writes the blobs which were stored in deferred mode.
+        """
+        for digest, arr in sorted(self.pending.items()):
+            path = self.path(digest)
+            if not self._touch(path):
+                self._write(path, arr)
+        self.pending = {}
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            return False
+        return True
+
+    def _write(self, path, arr):
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                pass
+        temp_path = "%s.%d.%d.tmp" % (
+            path, os.getpid(), threading.current_thread().ident)
+        arr.tofile(temp_path)
+        os.rename(temp_path, path)
+        self.written += arr.nbytes
+
+    def load(self, pid):
+        tag, digest, dtype, shape = pid
+        if tag != SnapshotBlobs.PERSISTENT_TAG:
+            raise UnpicklingError("Unsupported persistent id %s" % tag)
+        path = self.path(digest)
+        if not os.path.exists(path):
+            raise UnpicklingError("Snapshot blob %s does not exist" % path)
+        if self.mmap and numpy.prod(shape) > 0:
+            # "c" means copy-on-write: the changes never reach the blob
+            return numpy.memmap(path, dtype=dtype, mode="c", shape=shape)
+        return numpy.fromfile(path, dtype=dtype).reshape(shape)
+
+    def write_manifest(self, file_name):
+        with open(file_name, "w") as fout:
+            json.dump(sorted(self.referenced), fout)
+
+    @staticmethod
+    def collect_garbage(directory, min_age=3600):
+        """
+        Removes the blobs which are not referenced by any snapshot in the
+        directory. The manifests of the removed snapshots are deleted as
+        well. Blobs and manifests younger than min_age seconds are kept
+        because they may belong to a snapshot which is being written.
+        :return: The number of removed blobs and the number of freed bytes.
+        """
+        referenced = set()
+        now = time.time()
+        for name in os.listdir(directory):
+            if not name.endswith(".blobs"):
+                continue
+            manifest = os.path.join(directory, name)
+            if not os.path.exists(manifest[:-len(".blobs")]) and \
+                    now - os.path.getmtime(manifest) >= min_age:
+                os.remove(manifest)
+                continue
+            with open(manifest) as fin:
+                referenced.update(json.load(fin))
+        blobs = SnapshotBlobs(os.path.join(directory, "blobs"))
+        removed = freed = 0
+        if not os.path.isdir(blobs.directory):
+            return removed, freed
+        for subdir in os.listdir(blobs.directory):
+            for digest in os.listdir(os.path.join(blobs.directory, subdir)):
+                path = blobs.path(digest)
+                if digest in referenced or \
+                        now - os.path.getmtime(path) < min_age:
+                    continue
+                freed += os.path.getsize(path)
+                os.remove(path)
+                removed += 1
+        return removed, freed
+
+
 @implementer(ISnapshotter)
 class SnapshotterToFile(SnapshotterBase):
     """Takes workflow snapshots to the file system.
+
+    Attributes:
+        asynchronous - pickle the workflow into memory and compress and write
+                       it in a background thread; the file appears under the
+                       final name and becomes the destination only when it
+                       is complete
+        max_async - the maximal number of background snapshots at once;
+                    export() blocks until one of them finishes
+        deduplicate - store the big numpy arrays once in the
+                      content-addressed "blobs" subdirectory
+                      (see :class:`SnapshotBlobs`)
     """
     MAPPING = "file"
 
@@ -368,7 +774,8 @@ class SnapshotterToFile(SnapshotterBase):
         "snappy": lambda n, _: SnappyFile(n, "wb"),
         "gz": lambda n, l: gzip.GzipFile(n, "wb", compresslevel=l),
         "bz2": lambda n, l: bz2.BZ2File(n, "wb", compresslevel=l),
-        "xz": lambda n, l: lzma.LZMAFile(n, "wb", preset=l)
+        "xz": lambda n, l: lzma.LZMAFile(n, "wb", preset=l),
+        "pgz": lambda n, l: ParallelBlockFile(n, "wb", l)
     }
 
     READ_CODECS = {
@@ -376,24 +783,121 @@ class SnapshotterToFile(SnapshotterBase):
         "snappy": lambda n: SnappyFile(n, "rb"),
         "gz": lambda name: gzip.GzipFile(name, "rb"),
         "bz2": lambda name: bz2.BZ2File(name, "rb"),
-        "xz": lambda name: lzma.LZMAFile(name, "rb")
+        "xz": lambda name: lzma.LZMAFile(name, "rb"),
+        "pgz": lambda name: ParallelBlockFile(name, "rb")
     }
 
     def __init__(self, workflow, **kwargs):
         kwargs["view_group"] = kwargs.get("view_group", "SERVICE")
         super(SnapshotterToFile, self).__init__(workflow, **kwargs)
         self.directory = kwargs.get("directory", root.common.dirs.snapshots)
+        self.asynchronous = kwargs.get("asynchronous", False)
+        self.max_async = kwargs.get("max_async", 1)
+        self.deduplicate = kwargs.get("deduplicate", False)
+
+    def init_unpickled(self):
+        super(SnapshotterToFile, self).init_unpickled()
+        self._async_threads_ = []
+        self._async_slots_ = None
+        self._async_counter_ = 0
+        self._async_published_ = 0
+        self._async_failed_ = []
+        self._async_lock_ = threading.Lock()
 
     def export(self):
         ext = ("." + self.compression) if self.compression else ""
         rel_file_name = "%s_%s.%d.pickle%s" % (
             self.prefix, self.suffix, best_protocol, ext)
-        self._destination = os.path.abspath(os.path.join(
+        destination = os.path.abspath(os.path.join(
             self.directory, rel_file_name))
-        self.info("Snapshotting to %s..." % self.destination)
-        with self._open_file() as fout:
+        self.info("Snapshotting to %s..." % destination)
+        blobs = None
+        asynchronous = getattr(self, "asynchronous", False)
+        if getattr(self, "deduplicate", False):
+            blobs = SnapshotBlobs(os.path.join(self.directory, "blobs"),
+                                  deferred=asynchronous)
+        if not asynchronous:
+            temp_file_name = destination + ".tmp"
+            with self._open_file(temp_file_name) as fout:
+                self._dump(fout, blobs)
+            self._finish_export(temp_file_name, destination, blobs)
+            self._link_current(rel_file_name, ext)
+            self._destination = destination
+            self.check_snapshot_size(os.path.getsize(destination))
+            return
+        # The consistent state is captured here, the rest goes to background
+        data = BytesIO()
+        self._dump(data, blobs)
+        data = data.getvalue()
+        self.check_snapshot_size(len(data))
+        if self._async_slots_ is None:
+            self._async_slots_ = threading.Semaphore(self.max_async)
+        self._async_slots_.acquire()
+        self._async_counter_ += 1
+        thread = threading.Thread(
+            target=self._export_async, name="Snapshotter",
+            args=(data, "%s.%d.tmp" % (destination, self._async_counter_),
+                  destination, rel_file_name, ext, blobs,
+                  self._async_counter_))
+        self._async_threads_ = [t for t in self._async_threads_
+                                if t.is_alive()] + [thread]
+        thread.start()
+
+    def stop(self):
+        super(SnapshotterToFile, self).stop()
+        self.wait()
+
+    def wait(self):
+        """Blocks until all the background snapshots are written.
+        :return: The list of the destinations which failed to be written
+        since the previous call.
+        """
+        for thread in self._async_threads_:
+            thread.join()
+        self._async_threads_ = []
+        with self._async_lock_:
+            failed, self._async_failed_ = self._async_failed_, []
+        return failed
+
+    def _dump(self, fout, blobs):
+        if blobs is None:
             pickle.dump(self.workflow, fout, protocol=best_protocol)
-        self.check_snapshot_size(os.path.getsize(self.destination))
+            return
+        blobs.pickler(fout).dump(self.workflow)
+
+    def _export_async(self, data, temp_file_name, destination, rel_file_name,
+                      ext, blobs, counter):
+        try:
+            with self._open_file(temp_file_name) as fout:
+                fout.write(data)
+            self._finish_export(temp_file_name, destination, blobs)
+            with self._async_lock_:
+                # the older snapshot may finish after the newer one
+                if counter > self._async_published_:
+                    self._async_published_ = counter
+                    self._destination = destination
+                    self._link_current(rel_file_name, ext)
+            self.info("Finished snapshotting to %s", destination)
+        except Exception:
+            self.exception("Failed to snapshot to %s", destination)
+            with self._async_lock_:
+                self._async_failed_.append(destination)
+            try:
+                os.remove(temp_file_name)
+            except OSError:
+                pass
+        finally:
+            self._async_slots_.release()
+
+    def _finish_export(self, temp_file_name, destination, blobs):
+        if blobs is not None:
+            blobs.flush()
+            self.info("Wrote %d new bytes of %d arrays into %s",
+                      blobs.written, len(blobs.referenced), blobs.directory)
+            blobs.write_manifest(destination + ".blobs")
+        os.rename(temp_file_name, destination)
+
+    def _link_current(self, rel_file_name, ext):
         file_name_link = os.path.join(
             self.directory, "%s_current.%d.pickle%s" % (
                 self.prefix, best_protocol, ext))
@@ -409,19 +913,30 @@ class SnapshotterToFile(SnapshotterBase):
             pass
 
     @staticmethod
-    def import_(file_name):
+    def import_(file_name, mmap=None):
+        """
+        Restores the object from the snapshot file.
+        :param file_name: The path to the snapshot.
+        :param mmap: Map the deduplicated arrays into memory instead of
+                     reading them (see :class:`SnapshotBlobs`). The default
+                     is root.common.engine.mmap_snapshots.
+        """
         file_name = file_name.strip()
         if not os.path.exists(file_name):
             raise FileNotFoundError(file_name)
         _, ext = os.path.splitext(file_name)
         codec = SnapshotterToFile.READ_CODECS[ext[1:]]
+        if mmap is None:
+            mmap = root.common.engine.mmap_snapshots
+        blobs = SnapshotBlobs(
+            os.path.join(os.path.dirname(file_name), "blobs"), mmap=mmap)
         with codec(file_name) as fin:
             logging.getLogger("Snapshotter").info("Reading %s...", file_name)
-            return SnapshotterToFile._import_fobj(fin)
+            return SnapshotterToFile._import_fobj(fin, blobs)
 
-    def _open_file(self):
+    def _open_file(self, file_name):
         return SnapshotterToFile.WRITE_CODECS[self.compression](
-            self.destination, self.compression_level)
+            file_name, self.compression_level)
 
 
 @implementer(ISnapshotter)
@@ -437,7 +952,8 @@ class SnapshotterToDB(SnapshotterBase):
         "gz": lambda n, l: gzip.GzipFile(
             fileobj=n, mode="wb", compresslevel=l),
         "bz2": lambda n, l: bz2.BZ2File(n, "wb", compresslevel=l),
-        "xz": lambda n, l: lzma.LZMAFile(n, "wb", preset=l)
+        "xz": lambda n, l: lzma.LZMAFile(n, "wb", preset=l),
+        "pgz": lambda n, l: ParallelBlockFile(n, "wb", l)
     }
 
     READ_CODECS = {
@@ -445,7 +961,8 @@ class SnapshotterToDB(SnapshotterBase):
         "snappy": lambda n: SnappyFile(n, "rb"),
         "gz": lambda name: gzip.GzipFile(fileobj=name, mode="rb"),
         "bz2": lambda name: bz2.BZ2File(name, "rb"),
-        "xz": lambda name: lzma.LZMAFile(name, "rb")
+        "xz": lambda name: lzma.LZMAFile(name, "rb"),
+        "pgz": lambda name: ParallelBlockFile(name, "rb")
     }
 
     def __init__(self, workflow, **kwargs):
@@ -527,8 +1044,8 @@ class Snapshotter(SnapshotterBase):
             return SnapshotterToFile.__new__(cls)
 
     @staticmethod
-    def import_file(file_name):
-        return SnapshotterToFile.import_(file_name)
+    def import_file(file_name, mmap=None):
+        return SnapshotterToFile.import_(file_name, mmap)
 
     @staticmethod
     def import_odbc(odbc, table, id_, log_id, name=None):
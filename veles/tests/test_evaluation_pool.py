@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+import unittest
+
+from veles.evaluation_pool import EvaluationPool
+
+
+class TestEvaluationPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = EvaluationPool(size=1, max_jobs=2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def testReuse(self):
+        self.assertEqual(self.pool.execute(["--version"]), 0)
+        self.assertEqual(self.pool.idle_workers, 1)
+        worker = self.pool._idle[0]
+        self.assertEqual(self.pool.execute(["--version"]), 0)
+        self.assertEqual(worker.jobs, 2)
+        # max_jobs was reached
+        self.assertEqual(self.pool.idle_workers, 0)
+        self.assertFalse(worker.alive)
+
+    def testFailure(self):
+        self.assertNotEqual(
+            self.pool.execute(["/nonexistent/workflow.py", "-"]), 0)
+        self.assertEqual(self.pool.idle_workers, 0)
+        self.assertEqual(self.pool.execute(["--version"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+
+import unittest
+
+from veles.event_aggregator import EventAggregator
+
+
+def event(time, etype, name="work", instance="master", eid=None):
+    return {"_id": eid if eid is not None else (time, etype, name, instance),
+            "session": "session", "instance": instance, "name": name,
+            "domain": "Workflow", "type": etype, "time": time}
+
+
+class TestEventAggregator(unittest.TestCase):
+    def setUp(self):
+        self.aggregator = EventAggregator(
+            resolutions=((10, 3), (100, 10)), lag=5)
+
+    def testDurations(self):
+        events = []
+        for i in range(10):
+            events.append(event(i * 2.0, "begin"))
+            events.append(event(i * 2.0 + 0.25 * (1 + i % 2), "end"))
+        events.append(event(5, "single", name="snapshot"))
+        self.assertEqual(self.aggregator.update(events), 21)
+        # The last events are polled again
+        self.assertEqual(self.aggregator.update(events[-5:-1]), 0)
+        result = self.aggregator.query("session", name="work")
+        self.assertEqual(len(result), 1)
+        work = result[0]
+        self.assertEqual(work["resolution"], 10)
+        self.assertEqual(work["time"], [0, 10])
+        self.assertEqual(work["count"], [5, 5])
+        self.assertEqual(work["total"], [1.75, 2.0])
+        # The upper bounds of the power-of-two bins
+        self.assertEqual(work["p50"], [0.5, 1.0])
+        self.assertEqual(work["p99"], [1.0, 1.0])
+        snapshot, = self.aggregator.query("session", name="snapshot")
+        self.assertEqual(snapshot["count"], [1])
+        self.assertEqual(snapshot["p50"], [None])
+        self.assertEqual(self.aggregator.query("other"), [])
+
+    def testDownsampling(self):
+        self.aggregator.update(
+            [event(t, "single") for t in range(0, 100, 5)])
+        series, = self.aggregator.query("session")
+        self.assertEqual(series["resolution"], 10)
+        self.assertEqual(series["time"], [70, 80, 90])
+        series, = self.aggregator.query("session", start=0)
+        self.assertEqual(series["resolution"], 100)
+        self.assertEqual(series["time"], [0])
+        self.assertEqual(series["count"], [20])
+        series, = self.aggregator.query("session", resolution=50)
+        self.assertEqual(series["resolution"], 100)
+
+    def testExpire(self):
+        self.aggregator.update([event(1, "single"),
+                                event(100, "single", instance="slave")])
+        self.aggregator.expire(50)
+        series, = self.aggregator.query("session")
+        self.assertEqual(series["instance"], "slave")
+
+
+if __name__ == "__main__":
+    unittest.main()
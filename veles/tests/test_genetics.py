@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+
+
+import unittest
+
+import numpy
+from zope.interface import implementer
+
+from veles.genetics.core import ArrayPopulation, Chromosome, IChromosome
+from veles.pickle2 import pickle
+
+
+@implementer(IChromosome)
+class SumChromosome(Chromosome):
+    def evaluate(self):
+        self.fitness = sum(self.numeric) + 100
+
+
+class SumPopulation(ArrayPopulation):
+    def evaluate_chromosome(self, chromo):
+        chromo.fitness = sum(chromo.numeric) + 100
+        chromo.snapshot = "snapshot %d" % chromo.index
+
+
+class TestArrayPopulation(unittest.TestCase):
+    def setUp(self):
+        self.population = SumPopulation(
+            SumChromosome, 3, [0, -1.0, 2], [10, 1.0, 5], 20)
+
+    def evaluate(self):
+        for index, chromo in enumerate(self.population):
+            if chromo.fitness is None:
+                self.population.evaluate(index)
+
+    def testGenerations(self):
+        population = self.population
+        self.assertEqual(len(population), 20)
+        self.assertEqual(population.pending_size, 20)
+        for generation in range(3):
+            self.evaluate()
+            self.assertEqual(population.generation, generation + 1)
+            self.assertGreater(len(population), population.size)
+            self.assertTrue((population.numeric >=
+                             population.min_array).all())
+            self.assertTrue((population.numeric <=
+                             population.max_array).all())
+            ints = population.numeric[:, population.integer_genes]
+            self.assertTrue((ints == numpy.trunc(ints)).all())
+        best = population[0]
+        self.assertEqual(best.fitness, population.best_fit)
+        self.assertIsInstance(best.numeric[0], int)
+        self.assertTrue(best.snapshot.startswith("snapshot"))
+
+    def testPickle(self):
+        self.evaluate()
+        chromo = self.population[0]
+        restored = pickle.loads(pickle.dumps(chromo))
+        self.assertIsInstance(restored, SumChromosome)
+        self.assertEqual(restored.numeric, chromo.numeric)
+        self.assertEqual(restored.fitness, chromo.fitness)
+        self.assertEqual(restored.snapshot, chromo.snapshot)
+        population = pickle.loads(pickle.dumps(self.population))
+        self.assertTrue((population.numeric ==
+                         self.population.numeric).all())
+
+    def testRouletteSelection(self):
+        self.population.fitnesses[:] = 0
+        self.population.fitnesses[3] = 1
+        self.population.fitness = 1.0
+        self.assertTrue((self.population.select_roulette() == 3).all())
+
+    def testPointedCrossing(self):
+        population = self.population
+        size = len(population)
+        population.cross_pointed(numpy.arange(size))
+        sons = population.numeric[size:]
+        self.assertEqual(
+            len(sons), 2 * int(size * population.crossing.pointed_crossings))
+        parents = population.numeric[:size]
+        for son1, son2 in zip(sons[::2], sons[1::2]):
+            # Each gene comes from one of the same two parents
+            self.assertTrue(any(
+                ((son1 == p1) | (son1 == p2)).all() and
+                ((son2 == p1) | (son2 == p2)).all() and
+                ((son1 == p1) == (son2 == p2)).all()
+                for p1 in parents for p2 in parents))
+
+
+if __name__ == "__main__":
+    unittest.main()
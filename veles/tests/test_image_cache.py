@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+from multiprocessing import Pool
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+import unittest
+
+import numpy
+
+from veles.dummy import DummyWorkflow
+from veles.loader.file_image import AutoLabelFileImageLoader
+from veles.loader.image_cache import PreprocessedImagesCache, params_key
+
+
+# The cache which is inherited by the forked process
+_forked_cache = None
+
+
+def _put_in_child(args):
+    path, key, data = args
+    _forked_cache.put_data(path, key, data, (0, 16, 0, 16))
+    return _forked_cache.take_updated()
+
+
+class TestPreprocessedImagesCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = mkdtemp(prefix="veles-test-image-cache")
+        self.cache_dir = os.path.join(self.directory, "cache")
+        self.images = []
+        for i in range(4):
+            path = os.path.join(self.directory, "%d.png" % i)
+            with open(path, "wb") as fout:
+                fout.write(b"image %d" % i)
+            self.images.append(path)
+        self.key = params_key("RGB", 0.5)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def data(self, index):
+        return numpy.full((16, 16, 3), index, numpy.float32)
+
+    def fill(self, cache):
+        for i, path in enumerate(self.images):
+            cache.put_info(path, ((32, 32), "RGB"))
+            cache.put_data(path, self.key, self.data(i), (0, 16, 0, 16))
+        cache.flush()
+
+    def blobs(self):
+        return [f for f in os.listdir(self.cache_dir)
+                if f.endswith(PreprocessedImagesCache.BLOB_SUFFIX)]
+
+    def test_hit_and_miss(self):
+        cache = PreprocessedImagesCache(self.cache_dir)
+        self.assertIsNone(cache.get_info(self.images[0]))
+        self.assertIsNone(cache.get_data(self.images[0], self.key))
+        self.fill(cache)
+        cache.close()
+        cache = PreprocessedImagesCache(self.cache_dir)
+        self.assertEqual(len(cache), len(self.images))
+        for i, path in enumerate(self.images):
+            self.assertEqual(cache.get_info(path), ((32, 32), "RGB"))
+            data, bbox = cache.get_data(path, self.key)
+            self.assertTrue((data == self.data(i)).all())
+            self.assertEqual(bbox, (0, 16, 0, 16))
+        cache.close()
+
+    def test_invalidation(self):
+        cache = PreprocessedImagesCache(self.cache_dir)
+        self.fill(cache)
+        self.assertIsNone(cache.get_data(
+            self.images[0], params_key("RGB", 0.25)))
+        with open(self.images[1], "ab") as fout:
+            fout.write(b"changed")
+        self.assertIsNone(cache.get_info(self.images[1]))
+        self.assertIsNone(cache.get_data(self.images[1], self.key))
+        self.assertIsNotNone(cache.get_data(self.images[0], self.key))
+        cache.close()
+
+    def test_preprocessing_key(self):
+        loader = AutoLabelFileImageLoader(DummyWorkflow())
+        loader.original_shape = (32, 32, 3)
+        key = loader.preprocessing_key
+        self.assertEqual(key, loader.preprocessing_key)
+        loader.color_space = "HSV"
+        self.assertNotEqual(key, loader.preprocessing_key)
+        key = loader.preprocessing_key
+        loader.scale = 0.5
+        self.assertNotEqual(key, loader.preprocessing_key)
+        key = loader.preprocessing_key
+        loader.background_color = (0, 0, 0)
+        self.assertNotEqual(key, loader.preprocessing_key)
+
+    def test_corrupted_blob(self):
+        cache = PreprocessedImagesCache(self.cache_dir)
+        self.fill(cache)
+        cache.close()
+        blob, = self.blobs()
+        path = os.path.join(self.cache_dir, blob)
+        with open(path, "r+b") as fout:
+            fout.seek(16)
+            fout.write(b"\xff" * 8)
+        cache = PreprocessedImagesCache(self.cache_dir)
+        self.assertIsNone(cache.get_data(self.images[0], self.key))
+        self.assertIsNotNone(cache.get_data(self.images[1], self.key))
+        cache.close()
+        with open(path, "r+b") as fout:
+            fout.truncate(os.path.getsize(path) // 2)
+        cache = PreprocessedImagesCache(self.cache_dir)
+        self.assertIsNotNone(cache.get_data(self.images[1], self.key))
+        self.assertIsNone(cache.get_data(self.images[3], self.key))
+        # Recomputed data replaces the broken entry
+        cache.put_data(self.images[3], self.key, self.data(3), (0, 1, 0, 1))
+        self.assertTrue((cache.get_data(self.images[3], self.key)[0] ==
+                         self.data(3)).all())
+        cache.close()
+
+    def test_eviction(self):
+        size = self.data(0).nbytes
+        # Every blob holds a single image, at most two blobs are kept
+        cache = PreprocessedImagesCache(self.cache_dir, max_size=size * 2)
+        cache.BLOBS_RATIO = 2
+        self.fill(cache)
+        self.assertLessEqual(len(self.blobs()), 2)
+        self.assertEqual(sum(
+            cache.get_data(path, self.key) is not None
+            for path in self.images), 2)
+        self.assertIsNotNone(cache.get_data(self.images[-1], self.key))
+        cache.close()
+        cache = PreprocessedImagesCache(self.cache_dir)
+        self.assertIsNone(cache.get_data(self.images[0], self.key))
+        self.assertIsNotNone(cache.get_info(self.images[0]))
+        cache.close()
+
+    def test_forked_writer(self):
+        global _forked_cache
+        cache = _forked_cache = PreprocessedImagesCache(self.cache_dir)
+        pool = Pool(1)
+        try:
+            updated = pool.map(_put_in_child, [
+                (self.images[0], self.key, self.data(7))])[0]
+        finally:
+            pool.terminate()
+            pool.join()
+            _forked_cache = None
+        self.assertIn(self.images[0], updated)
+        self.assertIsNone(cache.get_data(self.images[0], self.key))
+        cache.merge(updated)
+        cache.close()
+        cache = PreprocessedImagesCache(self.cache_dir)
+        data, _ = cache.get_data(self.images[0], self.key)
+        self.assertTrue((data == self.data(7)).all())
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
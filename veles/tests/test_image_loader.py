@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+import unittest
+from zlib import crc32
+
+import numpy
+from zope.interface import implementer
+
+from veles.dummy import DummyWorkflow
+from veles.loader.image import ImageLoader, IImageLoader
+from veles.prng import RandomGenerator
+
+
+@implementer(IImageLoader)
+class SyntheticImageLoader(ImageLoader):
+    """Generates the images from their keys.
+    """
+    SIZE = 16, 16
+    DECODING_PARAMETERS = "offset",
+
+    def __init__(self, workflow, **kwargs):
+        super(SyntheticImageLoader, self).__init__(workflow, **kwargs)
+        self.offset = 0
+
+    def get_keys(self, index):
+        return ["%d_%d" % (index, i) for i in range(10)]
+
+    def get_image_label(self, key):
+        return int(key[-1]) % 3
+
+    def get_image_info(self, key):
+        return self.SIZE, "RGB"
+
+    def get_image_data(self, key):
+        state = numpy.random.RandomState(crc32(key.encode()))
+        return state.randint(
+            0, 256, self.SIZE + (3,)).astype(numpy.float32) + self.offset
+
+
+class TestImageLoader(unittest.TestCase):
+    def setUp(self):
+        self.parent = DummyWorkflow()
+        self.keys = SyntheticImageLoader(self.parent).get_keys(2)
+
+    def create(self, **kwargs):
+        prng = RandomGenerator(None)
+        prng.state = numpy.random.RandomState(777).get_state()
+        loader = SyntheticImageLoader(self.parent, prng=prng, **kwargs)
+        loader.original_shape = SyntheticImageLoader.SIZE + (3,)
+        return loader
+
+    def load(self, loader):
+        data = numpy.zeros((len(self.keys),) + loader.shape, numpy.float32)
+        labels = [None] * len(self.keys)
+        label_values = numpy.zeros(len(self.keys), numpy.float32)
+        loader.load_keys(self.keys, None, data, labels, label_values)
+        return data, labels, label_values
+
+    def assertLoaded(self, first, second):
+        for a, b in zip(first, second):
+            self.assertTrue((numpy.asarray(a) == numpy.asarray(b)).all())
+
+    def test_serial_decoding(self):
+        serial = self.create(crop=(8, 8))
+        reference = self.create(crop=(8, 8))
+        data, _, label_values = self.load(serial)
+        for index, key in enumerate(self.keys):
+            obj, label_value, _ = reference._load_image(key)
+            self.assertTrue((data[index] == obj).all())
+            self.assertEqual(label_values[index], label_value)
+
+    def test_parallel_decoding(self):
+        two = self.create(crop=(8, 8), decoding_processes=2)
+        three = self.create(crop=(8, 8), decoding_processes=3)
+        try:
+            for _ in range(2):
+                self.assertLoaded(self.load(two), self.load(three))
+        finally:
+            two.stop()
+            three.stop()
+
+    def test_parallel_decoding_parameters(self):
+        two = self.create(crop=(8, 8), decoding_processes=2)
+        three = self.create(crop=(8, 8), decoding_processes=3)
+        try:
+            self.assertLoaded(self.load(two), self.load(three))
+            pool = two._decoding_pool_
+            for loader in two, three:
+                loader.crop = (4, 6)
+                loader.mirror = True
+            self.assertLoaded(self.load(two), self.load(three))
+            self.assertIsNot(pool, two._decoding_pool_)
+            pool = two._decoding_pool_
+            self.load(two)
+            self.assertIs(pool, two._decoding_pool_)
+            # The attributes of the subclass are tracked, too
+            two.offset = 1000
+            self.assertTrue((self.load(two)[0] >= 1000).any())
+            self.assertIsNot(pool, two._decoding_pool_)
+        finally:
+            two.stop()
+            three.stop()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -51,6 +51,7 @@ except ImportError:
     skip_hdf5 = True
 import veles.prng as rnd
 from veles.loader import IFullBatchLoader, FullBatchLoaderMSE
+from veles.timeit2 import timeit
 
 
 @implementer(IFullBatchLoader)
@@ -79,6 +80,17 @@ class Loader(FullBatchLoaderMSE):
         self.class_lengths[2] = N - self.class_lengths[1]
 
 
+class NoisyLoader(Loader):
+    """Uses prng in fill_minibatch() like the augmenting image loaders.
+    """
+    def fill_minibatch(self):
+        super(NoisyLoader, self).fill_minibatch()
+        size = self.minibatch_size
+        self.minibatch_data.mem[:size] += self.prng.uniform(
+            size=size).reshape((size,) + (1,) * (
+                len(self.minibatch_data.shape) - 1))
+
+
 @assign_backend("cuda")
 class TestFullBatchLoader(AcceleratedTest):
     def test_random(self):
@@ -89,9 +101,80 @@ class TestFullBatchLoader(AcceleratedTest):
                 max_diff = numpy.fabs(item - results[0][index]).max()
                 self.assertLess(max_diff, 1e-6, "index = %d" % index)
 
-    def _test_random(self, device, force_numpy, N=1000):
+    def test_prefetch(self):
+        results = [self._test_random(NumpyDevice(), True, **kwargs)
+                   for kwargs in ({}, {"prefetch": 3, "prefetch_workers": 2})]
+        for index, item in enumerate(results[1]):
+            self.assertTrue((item == results[0][index]).all(),
+                            "index = %d" % index)
+
+    def test_prefetch_prng(self):
+        results = [self._test_random(NumpyDevice(), True, klass=NoisyLoader,
+                                     **kwargs)
+                   for kwargs in ({}, {"prefetch": 3, "prefetch_workers": 2})]
+        for index, item in enumerate(results[1]):
+            self.assertTrue((item == results[0][index]).all(),
+                            "index = %d" % index)
+
+    def test_fill_minibatch_benchmark(self, N=200):
+        rnd.get().seed(123)
+        unit = Loader(self.parent, force_numpy=True, prng=rnd.get())
+        unit.initialize(NumpyDevice())
+        unit.minibatch_size = unit.max_minibatch_size
+        indices = unit.minibatch_indices.mem
+        samples = 0
+        elapsed = 0
+        for _ in range(N):
+            indices[:] = rnd.get().randint(0, unit.total_samples, len(indices))
+            _, delta = timeit(unit.fill_minibatch)
+            elapsed += delta
+            samples += unit.minibatch_size
+        self.assertTrue((unit.minibatch_data.mem ==
+                         unit.original_data.mem[indices]).all())
+        self.assertTrue((unit.minibatch_targets.mem ==
+                         unit.original_targets.mem[indices]).all())
+        self.assertTrue((unit.minibatch_labels.mem ==
+                         unit._mapped_original_labels_.mem[indices]).all())
+        self.info("fill_minibatch(): %d samples/sec", samples / elapsed)
+
+    def test_memmap_originals(self):
+        rnd.get().seed(123)
+        unit = Loader(self.parent, force_numpy=True, prng=rnd.get(),
+                      memmap_originals=True)
+        self.assertRaises(ValueError, unit.initialize, NumpyDevice())
+        unit = Loader(self.parent, force_numpy=True, prng=rnd.get(),
+                      memmap_originals=True,
+                      originals_cache_key="test_memmap_originals")
+        unit.initialize(NumpyDevice())
+        cache = unit.originals_cache
+        try:
+            self.assertIsInstance(unit.original_data.mem, numpy.memmap)
+            self.assertTrue(os.path.exists(cache + ".original_data"))
+            self.assertTrue(os.path.exists(cache + ".pickle"))
+            clone = Loader(self.parent, force_numpy=True, prng=rnd.get(),
+                           memmap_originals=True,
+                           originals_cache_key="test_memmap_originals")
+            clone.initialize(NumpyDevice())
+            self.assertTrue(clone._originals_cached_)
+            self.assertEqual(clone.class_lengths, unit.class_lengths)
+            self.assertEqual(clone.original_labels, unit.original_labels)
+            for name in "original_data", "original_targets":
+                self.assertTrue((getattr(clone, name).mem ==
+                                 getattr(unit, name).mem).all())
+            self.assertTrue((clone._mapped_original_labels_.mem ==
+                             unit._mapped_original_labels_.mem).all())
+        finally:
+            for suffix in ("original_data", "original_targets",
+                           "class_targets", "mapped_original_labels",
+                           "pickle"):
+                if os.path.exists("%s.%s" % (cache, suffix)):
+                    os.remove("%s.%s" % (cache, suffix))
+
+    def _test_random(self, device, force_numpy, N=1000, klass=Loader,
+                     **kwargs):
         rnd.get().seed(123)
-        unit = Loader(self.parent, force_numpy=force_numpy, prng=rnd.get())
+        unit = klass(self.parent, force_numpy=force_numpy, prng=rnd.get(),
+                     **kwargs)
         unit.initialize(device)
         self.assertTrue(unit.has_labels)
         res_data = numpy.zeros((N,) + unit.minibatch_data.shape,
@@ -108,6 +191,7 @@ class TestFullBatchLoader(AcceleratedTest):
             res_data[i] = unit.minibatch_data.mem
             res_labels[i] = unit.minibatch_labels.mem
             res_target[i] = unit.minibatch_targets.mem
+        unit.stop()
         return res_data, res_labels, res_target
 
 
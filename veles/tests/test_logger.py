@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+import logging
+import threading
+import unittest
+
+from veles.logger import Logger, MongoLogHandler
+
+
+class FakeCollection(object):
+    def __init__(self):
+        self.docs = []
+        self.bulks = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def insert_many(self, docs, ordered=True):
+        self.gate.wait()
+        self.docs.extend(docs)
+        self.bulks += 1
+
+
+class FakeLegacyCollection(object):
+    """
+    Mimics pymongo 2.x, which has no insert_many().
+    """
+    def __init__(self):
+        self.docs = []
+        self.calls = []
+
+    def insert(self, docs, **kwargs):
+        self.calls.append(kwargs)
+        self.docs.extend(docs if isinstance(docs, list) else [docs])
+
+
+class TestMongoLogHandler(unittest.TestCase):
+    def setUp(self):
+        # MongoClient connects lazily, so nothing listens on this port
+        self.handler = MongoLogHandler("127.0.0.1:1", "docid", "nodeid",
+                                       queue_size=10, batch_size=4,
+                                       flush_interval=60)
+        self.handler._collection = self.logs = FakeCollection()
+        self.handler._events = self.events = FakeCollection()
+        self.logger = logging.getLogger("TestMongoLogHandler")
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+    def testBatching(self):
+        for i in range(6):
+            self.logger.warning("message %d", i)
+        self.handler.flush()
+        self.assertEqual(len(self.logs.docs), 6)
+        self.assertEqual(set(d["session"] for d in self.logs.docs),
+                         {"docid"})
+        created = [d["created"] for d in self.logs.docs]
+        self.assertEqual(created, sorted(created))
+        self.assertEqual(self.logs.bulks, 2)
+        self.assertEqual(self.handler.shipped, 6)
+        self.assertEqual(self.handler.dropped, 0)
+
+    def testEvents(self):
+        logging.getLogger().addHandler(self.handler)
+        try:
+            Logger().event("work", "begin", height=10)
+        finally:
+            logging.getLogger().removeHandler(self.handler)
+        self.handler.flush()
+        self.assertEqual(len(self.events.docs), 1)
+        event = self.events.docs[0]
+        self.assertEqual(event["session"], "docid")
+        self.assertEqual(event["type"], "begin")
+        self.assertEqual(event["height"], 10)
+
+    def testOverflow(self):
+        self.logs.gate.clear()
+        for i in range(30):
+            self.logger.warning("message %d", i)
+        self.assertGreater(self.handler.dropped, 0)
+        self.logs.gate.set()
+        self.handler.flush()
+        self.assertEqual(self.handler.shipped + self.handler.dropped, 30)
+        self.assertEqual(len(self.logs.docs), self.handler.shipped)
+
+    def testLegacyPymongo(self):
+        self.handler._collection = logs = FakeLegacyCollection()
+        for i in range(3):
+            self.logger.warning("message %d", i)
+        self.handler.flush()
+        self.assertEqual(len(logs.docs), 3)
+        self.assertTrue(all(c["w"] == 0 for c in logs.calls))
+        self.assertEqual(self.handler.shipped, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
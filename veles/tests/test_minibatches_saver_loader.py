@@ -41,6 +41,7 @@ from zope.interface import implementer
 
 from veles.dummy import DummyWorkflow
 from veles.loader import MinibatchesSaver, MinibatchesLoader, Loader, ILoader
+from veles.loader.saver import DecodedChunksCache
 from veles.logger import Logger, logging
 
 
@@ -61,6 +62,23 @@ class MyLoader(Loader):
             self.counter += 1
 
 
+@implementer(ILoader)
+class MyShuffledLoader(MyLoader):
+    def load_data(self):
+        super(MyShuffledLoader, self).load_data()
+        self.class_lengths[0] = 50
+        self.class_lengths[1] = 150
+        self._has_labels = True
+        self.labels_mapping.update((i, i) for i in range(7))
+        self.reversed_labels_mapping[:] = range(7)
+
+    def fill_minibatch(self):
+        for i, index in enumerate(
+                self.minibatch_indices.mem[:self.minibatch_size]):
+            self.minibatch_data[i] = index
+            self.raw_minibatch_labels[i] = index % 7
+
+
 class TestMinibatchesSaverLoader(unittest.TestCase, Logger):
     def setUp(self):
         self.parent = DummyWorkflow()
@@ -84,6 +102,55 @@ class TestMinibatchesSaverLoader(unittest.TestCase, Logger):
             for i in range(100):
                 self.assertEqual(self.loader.minibatch_data[i], counter)
                 counter += 1
+        misses = self.loader.chunks_cache.misses
+        self.loader.run()
+        self.assertGreater(self.loader.chunks_cache.hits, 0)
+        self.assertEqual(self.loader.chunks_cache.misses, misses)
+        self.loader.stop()
+
+    def testDecodedChunksCache(self):
+        cache = DecodedChunksCache(100)
+        cache.put(0, "a", 40)
+        cache.put(1, "b", 40)
+        self.assertEqual(cache.get(0), "a")
+        cache.put(2, "c", 40)
+        self.assertNotIn(1, cache)
+        self.assertEqual(cache.get(1), None)
+        self.assertEqual(cache.get(2), "c")
+        self.assertEqual(cache.size, 80)
+        cache.put(3, "d", 101)
+        self.assertNotIn(3, cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def testColumnar(self):
+        for compression in "raw", "gz":
+            saver = MinibatchesSaver(
+                self.parent, layout="columnar", compression=compression,
+                block_size=30)
+            myloader = MyShuffledLoader(self.parent, minibatch_size=100)
+            myloader.initialize()
+            saver.link_attrs(myloader, *Loader.exports)
+            saver.initialize()
+            while not myloader.epoch_ended:
+                myloader.run()
+                saver.run()
+            saver.stop()
+            loader = MinibatchesLoader(self.parent, file_name=saver.file_name)
+            loader.initialize()
+            self.assertEqual(loader.columnar, True)
+            self.assertEqual(loader.has_labels, True)
+            self.assertEqual(loader.class_lengths, myloader.class_lengths)
+            served = set()
+            while not loader.epoch_ended:
+                loader.run()
+                size = loader.minibatch_size
+                indices = loader.minibatch_indices.mem[:size]
+                self.assertTrue((loader.minibatch_data.mem[:size, 0] ==
+                                 indices).all())
+                self.assertTrue((loader.minibatch_labels.mem[:size] ==
+                                 indices % 7).all())
+                served.update(indices)
+            self.assertEqual(len(served), loader.total_samples)
 
 
 if __name__ == "__main__":
@@ -37,6 +37,7 @@ import logging
 import threading
 import unittest
 
+import numpy
 from six import BytesIO, PY3
 from twisted.internet import reactor
 from veles.backends import NumpyDevice
@@ -174,6 +175,58 @@ class TestZmqConnection(unittest.TestCase):
             self.assertEqual(len(idata), len(merged))
             self.assertEqual(idata, merged)
 
+    def testZeroCopy(self):
+        class FakeFrame(object):
+            def __init__(self, data):
+                self.bytes = bytes(data)
+                self.buffer = memoryview(self.bytes)
+
+        class FakeSocket(object):
+            def __init__(self):
+                self.frames = []
+
+            def send(self, data, *args, **kwargs):
+                self.frames.append(data)
+
+        connection = ZmqConnection.__new__(ZmqConnection)
+        connection.shutted_down = False
+        connection.socket = FakeSocket()
+        connection.zerocopy_frames = []
+        big = get_rg().rand(100, 50)
+        sent = big.copy()
+        small = numpy.arange(10, dtype=numpy.int32)
+        size = connection._send_pickled(
+            {"big": big, "small": small, "text": "hello"}, True,
+            "zerocopy", None)
+        # The unit may overwrite its array before ZeroMQ transmits it
+        big[:] = 0
+        frames = [bytes(f) for f in connection.socket.frames]
+        # begin marker, specs, skeleton, one array buffer, end marker
+        self.assertEqual(len(frames), 5)
+        self.assertEqual(frames[-1], ZmqConnection.PICKLE_END)
+        self.assertGreater(size, big.nbytes)
+        unpickler = ZmqConnection.Unpickler()
+        unpickler.codec = frames[0][len(ZmqConnection.PICKLE_START)]
+        unpickler.active = True
+        for frame in frames[1:-1]:
+            self.assertTrue(unpickler.expects_frames)
+            unpickler.consume(FakeFrame(frame))
+        self.assertFalse(unpickler.expects_frames)
+        unpickler.active = False
+        obj = unpickler.object
+        self.assertTrue((obj["big"] == sent).all())
+        self.assertFalse(obj["big"].flags.writeable)
+        self.assertTrue((obj["small"] == small).all())
+        self.assertEqual(obj["text"], "hello")
+        # The frames are not referenced by ZeroMQ anymore
+        self.assertFalse(connection.zerocopy_pending)
+
+        connection.socket = FakeSocket()
+        connection._send_pickled(big, True, "zerocopy", None,
+                                 zerocopy_owned=True)
+        self.assertTrue(numpy.shares_memory(
+            numpy.asarray(connection.socket.frames[3]), big))
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
@@ -51,6 +51,7 @@ from PIL import Image
 import tempfile
 import unittest
 
+from veles.graphics_delta import PlotUpdateEncoder, PlotUpdateDecoder
 from veles.plotting_units import AccumulatingPlotter, MatrixPlotter, \
     ImagePlotter, ImmediatePlotter, Histogram
 
@@ -165,6 +166,87 @@ class Test(unittest.TestCase):
         self.compare_images(*self.run_plotter(h), tolerance=300)
 
 
+class PlotUpdatesTest(unittest.TestCase):
+    def add_ref(self, workflow):
+        pass
+
+    def encode(self, encoder, plotter):
+        plotter.stripped_pickle = True
+        try:
+            return pickle.loads(pickle.dumps(encoder.encode(plotter)))
+        finally:
+            plotter.stripped_pickle = False
+
+    def testAccumulatingPlotter(self):
+        ap = AccumulatingPlotter(self, name="Lines")
+        ap.input = numpy.arange(1, 20, 0.1)
+        encoder, decoder = PlotUpdateEncoder(60), PlotUpdateDecoder()
+        for i in range(100):
+            ap.input_field = i
+            ap.fill()
+        full = self.encode(encoder, ap)
+        self.assertTrue(full.full)
+        self.assertEqual(decoder.decode(full).values, ap.values)
+        for i in range(100, 110):
+            ap.input_field = i
+            ap.fill()
+        delta = self.encode(encoder, ap)
+        self.assertFalse(delta.full)
+        self.assertEqual(delta.base, full.version)
+        self.assertEqual(set(delta.appended), {"values"})
+        self.assertNotIn("values", delta.changed)
+        self.assertLess(delta.size, full.size / 5)
+        restored = decoder.decode(delta)
+        self.assertEqual(restored.values, ap.values)
+        self.assertEqual(restored.name, "Lines")
+        self.assertEqual(restored.id, ap.id)
+
+        # Late subscriber
+        late = PlotUpdateDecoder()
+        ap.values.append(1.0)
+        self.assertIsNone(late.decode(self.encode(encoder, ap)))
+        encoder.reset()
+        ap.values.append(2.0)
+        full = self.encode(encoder, ap)
+        self.assertTrue(full.full)
+        self.assertEqual(late.decode(full).values, ap.values)
+        self.assertEqual(decoder.decode(full).values, ap.values)
+
+        # The history is not append-only anymore
+        del ap.values[:50]
+        delta = self.encode(encoder, ap)
+        self.assertIn("values", delta.changed)
+        self.assertEqual(decoder.decode(delta).values, ap.values)
+
+    def testMatrixPlotter(self):
+        mp = MatrixPlotter(self, name="Matrix")
+        mp.input = numpy.eye(100)
+        mp.input_field = 0
+        encoder, decoder = PlotUpdateEncoder(60), PlotUpdateDecoder()
+        decoder.decode(self.encode(encoder, mp))
+        delta = self.encode(encoder, mp)
+        self.assertEqual(delta.size, 0)
+        decoder.decode(delta)
+        mp.input[0, 1] = 2
+        delta = self.encode(encoder, mp)
+        self.assertEqual(set(delta.changed), {"input"})
+        self.assertEqual(decoder.decode(delta).input[0, 1], 2)
+
+    def testLostUpdate(self):
+        ap = AccumulatingPlotter(self, name="Lines")
+        encoder, decoder = PlotUpdateEncoder(60), PlotUpdateDecoder()
+        decoder.decode(self.encode(encoder, ap))
+        ap.values.append(1.0)
+        self.encode(encoder, ap)
+        ap.values.append(2.0)
+        self.assertIsNone(decoder.decode(self.encode(encoder, ap)))
+        ap.values.append(3.0)
+        self.assertIsNone(decoder.decode(self.encode(encoder, ap)))
+        encoder.resync_interval = 0
+        self.assertEqual(decoder.decode(self.encode(encoder, ap)).values,
+                         [1.0, 2.0, 3.0])
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     unittest.main()
@@ -44,7 +44,8 @@ from veles.config import root
 from veles.memory import Array
 import veles.prng as rnd
 from veles.prng.uniform import Uniform
-from veles.tests import AcceleratedTest
+from veles.tests import AcceleratedTest, multi_device
+from veles.timeit2 import timeit
 
 
 class TestRandom1024(AcceleratedTest):
@@ -208,5 +209,72 @@ class TestRandom128(AcceleratedTest):
         self.assertEqual(numpy.count_nonzero(v_gpu - v_cpu), 0)
 
 
+def legacy_numpy_fill(states, output, num_states, n_rounds):
+    """
+    The former scalar implementation of Uniform.numpy_fill(), kept as the
+    baseline of the benchmark.
+    """
+    u64 = numpy.array([1181783497276652981], dtype=numpy.uint64)
+    s0 = numpy.zeros(1, dtype=numpy.uint64)
+    s1 = numpy.zeros(1, dtype=numpy.uint64)
+    states = states.view(dtype=numpy.uint64).reshape(-1, 16)
+    output = output.view(dtype=numpy.uint64)
+    for i in range(num_states):
+        offs = i
+        s = states[i]
+        p = 0
+        for _ in range(n_rounds * 16):
+            s0[0] = s[p]
+            p = (p + 1) & 15
+            s1[0] = s[p]
+            s1 ^= s1 << 31
+            s1 ^= s1 >> 11
+            s0 ^= s0 >> 30
+            s0 ^= s1
+            s[p] = s0[0]
+            output[offs] = (s0 * u64)[0]
+            offs += num_states
+
+
+class TestUniformBenchmark(AcceleratedTest):
+    @multi_device(True)
+    def testThroughput(self):
+        u = Uniform(self.parent, output_bytes=16 << 20)
+        u.initialize(self.device)
+
+        def fill():
+            u.run()
+            u.output.map_read()
+
+        fill()  # warm up
+        dt = timeit(fill)[1]
+        self.info("%s: %.1f MB/s", self.device.backend_name,
+                  u.output.nbytes / dt / (1 << 20))
+
+    def testNumpyVsLegacy(self):
+        num_states, n_rounds = 64, 4
+        u = Uniform(self.parent, num_states=num_states)
+        # the unit must not assume that the output consists of bytes
+        u.output.mem = numpy.zeros(num_states * 16 * n_rounds * 4,
+                                   dtype=numpy.float32)
+        u.initialize(NumpyDevice())
+        states = u.states.mem.copy()
+        legacy = numpy.zeros(num_states * 16 * n_rounds, dtype=numpy.uint64)
+        dt_legacy = timeit(legacy_numpy_fill, states, legacy, num_states,
+                           n_rounds)[1]
+        # fill only the first half
+        dt = timeit(u.fill, legacy.nbytes)[1]
+        u.output.map_read()
+        u.states.map_read()
+        output = u.output.mem.view(numpy.uint64)
+        self.assertEqual(numpy.count_nonzero(output[:legacy.size] - legacy),
+                         0)
+        self.assertEqual(numpy.count_nonzero(output[legacy.size:]), 0)
+        self.assertEqual(numpy.count_nonzero(u.states.mem - states), 0)
+        self.info("numpy: %.1f MB/s, legacy: %.1f MB/s (%.0fx)",
+                  legacy.nbytes / dt / (1 << 20),
+                  legacy.nbytes / dt_legacy / (1 << 20), dt_legacy / dt)
+
+
 if __name__ == "__main__":
     AcceleratedTest.main()
@@ -33,6 +33,7 @@ under the License.
 """
 import base64
 
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 from random import randint
@@ -46,7 +47,8 @@ from zope.interface import implementer
 
 from veles.dummy import DummyWorkflow
 from veles.loader import Loader, ILoader
-from veles.loader.restful import RestfulLoader
+from veles.loader.batching import AdaptiveBatchingPolicy
+from veles.loader.restful import RestfulLoader, QueueOverflowError
 from veles.logger import Logger
 from veles.memory import Array
 from veles.pickle2 import pickle
@@ -67,6 +69,25 @@ class DummyLoader(Loader):
         pass
 
 
+class FakeRequest(object):
+    def __init__(self, headers):
+        self.headers = headers
+        self.body = b""
+        self.finished = False
+
+    def getHeader(self, key):
+        return self.headers.get(key)
+
+    def setHeader(self, key, value):
+        self.headers[key] = value
+
+    def write(self, data):
+        self.body += data
+
+    def finish(self):
+        self.finished = True
+
+
 class RESTAPITest(unittest.TestCase):
     @timeout()
     def test_workflow(self):
@@ -175,6 +196,131 @@ class RESTAPITest(unittest.TestCase):
         self.assertEqual(arr.shape, data.shape)
         self.assertEqual(arr.dtype, data.dtype)
 
+    def test_binary(self):
+        api = RESTfulAPI(DummyWorkflow(), port=6565)
+        arr = numpy.arange(12, dtype=">i4").reshape(3, 4)
+        request = FakeRequest({b"Content-Type": b"application/octet-stream",
+                               b"X-Veles-Type": b"int32>",
+                               b"X-Veles-Shape": b"3,4"})
+        data = api._decode_binary(request, arr.tobytes())
+        self.assertEqual(data.dtype, arr.dtype)
+        self.assertTrue((arr == data).all())
+        api._arrivals_[request] = 0
+        api.respond([(request, api.encode(request, data.astype(">f4")))])
+        self.assertTrue(request.finished)
+        self.assertEqual(request.headers[b"X-Veles-Type"], b"float32<")
+        self.assertEqual(request.headers[b"X-Veles-Shape"], b"3,4")
+        self.assertIn(b"X-Veles-Latency", request.headers)
+        self.assertTrue((numpy.frombuffer(request.body, "<f4").reshape(3, 4)
+                         == arr).all())
+        self.assertEqual(api.get_metric_values()["Latency"]["requests"], 1)
+
+    def test_double_buffering(self):
+        workflow = DummyWorkflow()
+        base_loader = DummyLoader(workflow)
+        base_loader.minibatch_data.reset(numpy.zeros((10, 10, 10)))
+        base_loader.normalizer.analyze(base_loader.minibatch_data.mem)
+        loader = RestfulLoader(workflow, minibatch_size=2,
+                               max_response_time=100)
+        loader.derive_from(base_loader)
+        workflow.del_ref(base_loader)
+        loader.initialize()
+        try:
+            for i in range(2):
+                loader.feed(numpy.full((10, 10), i), i)
+            loader.fill_minibatch()
+            # The minibatch is being processed, accept the next one
+            for i in range(2, 4):
+                loader.feed(numpy.full((10, 10), i), i)
+            self.assertRaises(QueueOverflowError, loader.feed,
+                              numpy.zeros((10, 10)), 4)
+            self.assertEqual(
+                loader.get_metric_values()["Batching"]["queue depth"], 2)
+            self.assertEqual(loader.requests, [0, 1])
+            self.assertTrue((loader.minibatch_data.mem[1] == 1).all())
+            loader.fill_minibatch()
+            self.assertEqual(loader.requests, [2, 3])
+            self.assertTrue((loader.minibatch_data.mem[1] == 3).all())
+            loader.feed(numpy.full((10, 10), 4), 4)
+            loader.flush()
+            loader.fill_minibatch()
+            self.assertEqual(loader.minibatch_size, 1)
+            self.assertEqual(loader.requests, [4, None])
+        finally:
+            loader.stop()
+
+    def test_invalid_sample(self):
+        workflow = DummyWorkflow()
+        base_loader = DummyLoader(workflow)
+        base_loader.minibatch_data.reset(numpy.zeros((10, 10, 10)))
+        base_loader.normalizer.analyze(base_loader.minibatch_data.mem)
+        loader = RestfulLoader(workflow, minibatch_size=2,
+                               max_response_time=100)
+        loader.derive_from(base_loader)
+        workflow.del_ref(base_loader)
+        loader.initialize()
+        try:
+            self.assertRaises(ValueError, loader.feed, numpy.zeros((3, 3)), 0)
+            self.assertIsNone(loader._filling_)
+            loader.locked_flush()
+            loader.feed(numpy.full((10, 10), 1), 1)
+            self.assertRaises(ValueError, loader.feed, numpy.zeros((3, 3)), 2)
+            self.assertEqual(loader._filling_[1], [1])
+            loader.flush()
+            loader.fill_minibatch()
+            self.assertEqual(loader.requests, [1, None])
+        finally:
+            loader.stop()
+
+    def test_stop(self):
+        workflow = DummyWorkflow()
+        base_loader = DummyLoader(workflow)
+        base_loader.minibatch_data.reset(numpy.zeros((10, 10, 10)))
+        base_loader.normalizer.analyze(base_loader.minibatch_data.mem)
+        loader = RestfulLoader(workflow, minibatch_size=2,
+                               max_response_time=100)
+        loader.derive_from(base_loader)
+        workflow.del_ref(base_loader)
+        loader.initialize()
+        executor = loader._prefetch_executor_ = ThreadPoolExecutor(1)
+        loader.stop()
+        self.assertIsNone(loader._prefetch_executor_)
+        self.assertRaises(RuntimeError, executor.submit, int)
+        self.assertTrue(loader._event_.is_set())
+
+
+class AdaptiveBatchingPolicyTest(unittest.TestCase):
+    def test_fixed_wait(self):
+        policy = AdaptiveBatchingPolicy(10, 0.1)
+        self.assertEqual(policy.flush_time(1.0, 5, 1.0), 1.1)
+        self.assertEqual(policy.flush_time(1.0, 10, 1.0), 1.0)
+
+    def test_latency_target(self):
+        policy = AdaptiveBatchingPolicy(100, 0.5, latency_target=0.05)
+        for i in range(20):
+            policy.arrived(i * 0.001)
+        self.assertAlmostEqual(policy.arrival_rate, 1000)
+        policy.dispatched([0.0, 0.001], 0.02)
+        policy.completed(0.03)
+        self.assertAlmostEqual(policy.compute_time, 0.01)
+        self.assertAlmostEqual(policy.flush_time(1.0, 1, 1.0), 1.04)
+        # Nobody is expected to come in time
+        policy = AdaptiveBatchingPolicy(100, 0.5, latency_target=0.05)
+        policy.arrived(0)
+        policy.arrived(1)
+        self.assertEqual(policy.flush_time(1.0, 1, 1.0), 1.0)
+
+    def test_feedback(self):
+        policy = AdaptiveBatchingPolicy(4, 0.5, latency_target=0.05)
+        policy.dispatched([0.0, 0.0], 0.05)
+        policy.completed(0.1)
+        self.assertLess(policy.slack, 1)
+        metrics = policy.get_metric_values()
+        self.assertEqual(metrics["fill ratio"], 0.5)
+        self.assertEqual(sum(metrics["latency histogram"]["counts"]), 2)
+        self.assertAlmostEqual(metrics["latency p99"], 0.1)
+
+
 if __name__ == "__main__":
     Logger.setup_logging(logging.DEBUG)
     unittest.main()
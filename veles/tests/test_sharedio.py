@@ -36,10 +36,41 @@ under the License.
 from multiprocessing import Process
 import unittest
 
+import numpy
+
 from veles.txzmq import SharedIO
 from veles.pickle2 import pickle
 
 
+class Filled(object):
+    """
+    Pickles a temporary array which is freed right after it is written.
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def __getstate__(self):
+        return numpy.full(10000, self.value, numpy.float32)
+
+    def __setstate__(self, state):
+        self.value = state[0]
+
+
+class Rewind(object):
+    """
+    Makes the writer rewind the segment while the reader is loading.
+    """
+    writer = None
+
+    def __getstate__(self):
+        # __setstate__() is not called for the empty state
+        return True
+
+    def __setstate__(self, state):
+        Rewind.writer.seek(0)
+        Rewind.writer.dump(numpy.zeros(10000, numpy.float32))
+
+
 class TestSharedIO(unittest.TestCase):
     DATA = b"Hello, world!"
 
@@ -77,6 +108,85 @@ class TestSharedIO(unittest.TestCase):
         del other2
         self.assertEqual(other.refs, 1)
 
+    def testDumpLoad(self):
+        shmem = SharedIO("test veles", 1 << 20)
+        big = numpy.arange(10000, dtype=numpy.float32).reshape(100, 100)
+        small = numpy.arange(10)
+        pos = shmem.dump({"big": big, "small": small, "text": "hello"})
+        shmem.seek(pos)
+        other = pickle.loads(pickle.dumps(shmem))
+        other.zerocopy = True
+        obj = other.load()
+        self.assertTrue((obj["big"] == big).all())
+        self.assertFalse(obj["big"].flags.writeable)
+        self.assertEqual(obj["big"].ctypes.data % SharedIO.ARRAY_ALIGNMENT,
+                         0)
+        self.assertTrue((obj["small"] == small).all())
+        self.assertEqual(obj["text"], "hello")
+        shmem.seek(0)
+        shmem.dump(big)
+        other.seek(pos)
+        self.assertRaises(ValueError, other.load)
+
+    def testDumpOverflow(self):
+        shmem = SharedIO("test veles", 1024)
+        self.assertRaises(ValueError, shmem.dump, numpy.zeros(1024))
+
+    def testKeepAcrossJobs(self):
+        shmem = SharedIO("test veles jobs", 1 << 20)
+        big = numpy.arange(10000, dtype=numpy.float32)
+        pos = shmem.dump({"weights": big, "bias": big, "step": 1})
+        shmem.seek(pos)
+        other = pickle.loads(pickle.dumps(shmem))
+        self.assertFalse(other.zerocopy)
+        first = other.load()
+        self.assertIs(first["weights"], first["bias"])
+        self.assertTrue(first["weights"].flags.writeable)
+        # The next job rewinds the segment
+        shmem.seek(0)
+        pos = shmem.dump({"weights": big * 2, "bias": big * 3, "step": 2})
+        shmem.seek(pos)
+        other = pickle.loads(pickle.dumps(shmem))
+        second = other.load()
+        self.assertTrue((first["weights"] == big).all())
+        self.assertTrue((second["weights"] == big * 2).all())
+        self.assertTrue((second["bias"] == big * 3).all())
+
+    def testDumpTemporaryArrays(self):
+        shmem = SharedIO("test veles temporary", 1 << 20)
+        pos = shmem.dump([Filled(i) for i in range(10)])
+        shmem.seek(pos)
+        other = pickle.loads(pickle.dumps(shmem))
+        self.assertEqual([f.value for f in other.load()], list(range(10)))
+
+    def testTornLoad(self):
+        shmem = SharedIO("test veles torn", 1 << 20)
+        big = numpy.arange(10000, dtype=numpy.float32)
+        pos = shmem.dump([big, Rewind(), big + 1])
+        shmem.seek(pos)
+        other = pickle.loads(pickle.dumps(shmem))
+        Rewind.writer = shmem
+        try:
+            self.assertRaises(ValueError, other.load)
+        finally:
+            Rewind.writer = None
+
+    def testZeroCopyRewind(self):
+        shmem = SharedIO("test veles zerocopy", 1 << 20)
+        big = numpy.arange(10000, dtype=numpy.float32)
+        pos = shmem.dump({"weights": big})
+        shmem.seek(pos)
+        other = pickle.loads(pickle.dumps(shmem))
+        other.zerocopy = True
+        first = other.load()
+        other.check()
+        # The next message is written while the views are still alive
+        shmem.seek(0)
+        shmem.dump({"weights": big * 2})
+        self.assertTrue((first["weights"] == big * 2).all())
+        self.assertRaises(ValueError, other.check)
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testReadWrite']
     unittest.main()
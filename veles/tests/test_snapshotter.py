@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+Tests for the snapshot blobs.
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+import os
+import shutil
+from six import BytesIO
+from tempfile import mkdtemp
+import unittest
+
+import numpy
+
+from veles.dummy import DummyWorkflow
+from veles.pickle2 import pickle, best_protocol
+from veles.snapshotter import SnapshotBlobs, SnapshotterBase, \
+    SnapshotterToFile, ParallelBlockFile
+
+
+class Arrays(object):
+    """
+    _import_fobj() marks the restored object, so it cannot be a dict.
+    """
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class TestSnapshotBlobs(unittest.TestCase):
+    def setUp(self):
+        self.directory = mkdtemp(prefix="veles-test-snapshotter")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def dump(self, obj):
+        blobs = SnapshotBlobs(os.path.join(self.directory, "blobs"))
+        fio = BytesIO()
+        blobs.pickler(fio).dump(obj)
+        return blobs, fio
+
+    def testDeduplication(self):
+        big = numpy.random.rand(100, 100)
+        obj = Arrays(a=big, b=big.copy(), small=numpy.arange(10))
+        blobs, fio = self.dump(obj)
+        self.assertEqual(len(blobs.referenced), 1)
+        self.assertEqual(blobs.written, big.nbytes)
+        self.assertLess(len(fio.getvalue()), big.nbytes)
+        blobs2, _ = self.dump(obj)
+        self.assertEqual(blobs2.written, 0)
+        fio.seek(0)
+        restored = SnapshotterBase._import_fobj(
+            fio, SnapshotBlobs(blobs.directory))
+        self.assertTrue((restored.a == big).all())
+        self.assertTrue((restored.b == big).all())
+        self.assertTrue((restored.small == numpy.arange(10)).all())
+        self.assertIsNot(restored.a, restored.b)
+
+    def testSharedArray(self):
+        big = numpy.random.rand(100, 100)
+        blobs, fio = self.dump(Arrays(a=big, b=big, c=[big, big.copy()]))
+        self.assertEqual(len(blobs.referenced), 1)
+        fio.seek(0)
+        restored = SnapshotterBase._import_fobj(
+            fio, SnapshotBlobs(blobs.directory))
+        self.assertIs(restored.a, restored.b)
+        self.assertIs(restored.a, restored.c[0])
+        self.assertIsNot(restored.a, restored.c[1])
+        self.assertTrue((restored.c[1] == big).all())
+
+    def testDeferred(self):
+        big = numpy.random.rand(100, 100)
+        saved = big.copy()
+        blobs = SnapshotBlobs(os.path.join(self.directory, "blobs"),
+                              deferred=True)
+        fio = BytesIO()
+        blobs.pickler(fio).dump(Arrays(a=big))
+        self.assertEqual(blobs.written, 0)
+        self.assertFalse(os.path.exists(blobs.directory))
+        big[:] = 0
+        blobs.flush()
+        self.assertEqual(blobs.written, big.nbytes)
+        self.assertEqual(blobs.pending, {})
+        fio.seek(0)
+        restored = SnapshotterBase._import_fobj(
+            fio, SnapshotBlobs(blobs.directory))
+        self.assertTrue((restored.a == saved).all())
+
+    def testMemoryMapping(self):
+        big = numpy.random.rand(100, 100)
+        blobs, fio = self.dump(Arrays(a=big))
+        fio.seek(0)
+        restored = SnapshotterBase._import_fobj(
+            fio, SnapshotBlobs(blobs.directory, mmap=True))
+        self.assertIsInstance(restored.a, numpy.memmap)
+        self.assertTrue((restored.a == big).all())
+        restored.a[0, 0] = -1
+        fio.seek(0)
+        restored = SnapshotterBase._import_fobj(
+            fio, SnapshotBlobs(blobs.directory))
+        self.assertNotIsInstance(restored.a, numpy.memmap)
+        self.assertEqual(restored.a[0, 0], big[0, 0])
+
+    def testCollectGarbage(self):
+        snapshot = os.path.join(self.directory, "wf_1.4.pickle")
+        kept = numpy.random.rand(100, 100)
+        blobs, fio = self.dump(kept)
+        with open(snapshot, "wb") as fout:
+            fout.write(fio.getvalue())
+        blobs.write_manifest(snapshot + ".blobs")
+        gone, fio = self.dump(numpy.random.rand(100, 100))
+        blobs.write_manifest(
+            os.path.join(self.directory, "wf_0.4.pickle.blobs"))
+        removed, freed = SnapshotBlobs.collect_garbage(self.directory, 0)
+        self.assertEqual(removed, 1)
+        self.assertEqual(freed, kept.nbytes)
+        self.assertFalse(os.path.exists(
+            blobs.path(next(iter(gone.referenced)))))
+        self.assertTrue(os.path.exists(
+            blobs.path(next(iter(blobs.referenced)))))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, "wf_0.4.pickle.blobs")))
+
+    def testCollectGarbagePending(self):
+        old = numpy.random.rand(100, 100)
+        blobs, _ = self.dump(old)
+        path = blobs.path(next(iter(blobs.referenced)))
+        os.utime(path, (0, 0))
+        # the snapshot which references the old blob again is not renamed yet
+        pending, _ = self.dump(old)
+        self.assertGreater(os.path.getmtime(path), 0)
+        pending.write_manifest(
+            os.path.join(self.directory, "wf_2.4.pickle.blobs"))
+        removed, _ = SnapshotBlobs.collect_garbage(self.directory)
+        self.assertEqual(removed, 0)
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, "wf_2.4.pickle.blobs")))
+
+
+class TestParallelBlockFile(unittest.TestCase):
+    def testCompressDecompress(self):
+        data = numpy.random.randint(0, 4, 100000).astype(numpy.uint8)
+        data = data.tobytes() + b"line\nend"
+        compressed = ParallelBlockFile.compress(data)
+        self.assertLess(len(compressed), len(data))
+        self.assertEqual(ParallelBlockFile.decompress(compressed), data)
+        self.assertEqual(ParallelBlockFile.decompress(
+            ParallelBlockFile.compress(b"")), b"")
+
+    def testPickle(self):
+        obj = {"array": numpy.random.rand(1000), "list": list(range(10000))}
+        fio = BytesIO()
+        fio.write(b"prefix")
+        with ParallelBlockFile(fio, "wb", block_size=1000, threads=3) as fout:
+            pickle.dump(obj, fout, protocol=best_protocol)
+        self.assertFalse(fio.closed)
+        fio.seek(len(b"prefix"))
+        with ParallelBlockFile(fio, "rb") as fin:
+            restored = pickle.load(fin)
+        self.assertTrue((restored["array"] == obj["array"]).all())
+        self.assertEqual(restored["list"], obj["list"])
+
+    def testSharedExecutor(self):
+        data = numpy.random.randint(0, 4, 10000).astype(numpy.uint8).tobytes()
+        for _ in range(3):
+            fio = BytesIO()
+            with ParallelBlockFile(fio, "wb", block_size=1000,
+                                   threads=5) as fout:
+                fout.write(data)
+            self.assertEqual(ParallelBlockFile.decompress(fio.getvalue()),
+                             data)
+        self.assertIn(5, ParallelBlockFile._executors)
+        executor = ParallelBlockFile._executors[5]
+        with ParallelBlockFile(BytesIO(), "wb", threads=5) as fout:
+            fout.write(data)
+        self.assertIs(executor, ParallelBlockFile._executors[5])
+
+
+class TestSnapshotterToFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = mkdtemp(prefix="veles-test-snapshotter")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create(self, **kwargs):
+        # the units refer to their workflow weakly
+        self.workflow = workflow = DummyWorkflow()
+        snapshotter = SnapshotterToFile(
+            workflow, directory=self.directory, asynchronous=True,
+            prefix="test", time_interval=0, **kwargs)
+        snapshotter.suffix = "async"
+        snapshotter.initialize()
+        workflow.weights = numpy.random.rand(100, 100)
+        return snapshotter
+
+    def assertComplete(self, snapshotter):
+        self.assertTrue(os.path.exists(snapshotter.destination))
+        restored = SnapshotterToFile.import_(snapshotter.destination)
+        self.assertTrue(
+            (restored.weights == snapshotter.workflow.weights).all())
+        self.assertEqual([f for f in os.listdir(self.directory)
+                          if f.endswith(".tmp")], [])
+
+    def testExportWait(self):
+        snapshotter = self.create()
+        snapshotter.export()
+        self.assertEqual(snapshotter.wait(), [])
+        self.assertComplete(snapshotter)
+        first = snapshotter.destination
+        snapshotter.suffix = "next"
+        snapshotter.export()
+        snapshotter.export()
+        self.assertEqual(snapshotter.wait(), [])
+        self.assertNotEqual(snapshotter.destination, first)
+        self.assertComplete(snapshotter)
+        link, = [f for f in os.listdir(self.directory) if "_current" in f]
+        self.assertEqual(
+            os.path.realpath(os.path.join(self.directory, link)),
+            os.path.realpath(snapshotter.destination))
+
+    def testDeduplicate(self):
+        snapshotter = self.create(deduplicate=True)
+        weights = snapshotter.workflow.weights.copy()
+        snapshotter.export()
+        # the blobs are written in background from the captured copies
+        snapshotter.workflow.weights[:] = 0
+        self.assertEqual(snapshotter.wait(), [])
+        restored = SnapshotterToFile.import_(snapshotter.destination)
+        self.assertTrue((restored.weights == weights).all())
+        # root.common.engine.mmap_snapshots is off by default
+        self.assertNotIsInstance(restored.weights, numpy.memmap)
+        restored = SnapshotterToFile.import_(snapshotter.destination, True)
+        self.assertIsInstance(restored.weights, numpy.memmap)
+
+    def testStop(self):
+        snapshotter = self.create(interval=2)
+        snapshotter.run()
+        self.assertEqual(snapshotter.destination, "")
+        snapshotter.stop()
+        self.assertComplete(snapshotter)
+
+    def testFailure(self):
+        snapshotter = self.create(compression="unknown")
+        with self.assertLogs(level="ERROR"):
+            snapshotter.export()
+            failed = snapshotter.wait()
+        self.assertEqual(len(failed), 1)
+        self.assertTrue(failed[0].endswith(".pickle.unknown"))
+        self.assertEqual(snapshotter.destination, "")
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(snapshotter.wait(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+Tests for the timeline tracer.
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+import json
+import os
+from tempfile import mkstemp
+import threading
+import unittest
+
+from veles.config import root
+from veles.tracer import Tracer, ThreadBuffer
+from veles.units import TrivialUnit
+from veles.tests import DummyWorkflow
+
+
+class TestTracer(unittest.TestCase):
+    def testRingBuffer(self):
+        buffer = ThreadBuffer(4)
+        for i in range(6):
+            buffer.append(i)
+        self.assertEqual(list(buffer), [2, 3, 4, 5])
+
+    def testExport(self):
+        tracer = Tracer()
+        tracer.enable()
+
+        def work(name):
+            for i in range(10):
+                tracer.record(name, "run", i, i + 0.5, i % 2)
+
+        threads = [threading.Thread(target=work, args=("unit%d" % i,))
+                   for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        tracer.disable()
+        self.assertEqual(len(tracer.records), 20)
+        summary = tracer.summary()
+        self.assertEqual(len(summary), 2)
+        self.assertEqual(summary[0][2], 10)
+        self.assertAlmostEqual(summary[0][3], 5)
+        fd, file_name = mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            tracer.export_chrome_trace(file_name)
+            with open(file_name) as fin:
+                events = json.load(fin)["traceEvents"]
+        finally:
+            os.remove(file_name)
+        spans = [e for e in events if e["ph"] == "X"]
+        self.assertEqual(len(spans), 20)
+        self.assertEqual(spans[0]["dur"], 500000)
+        self.assertEqual(len([e for e in events if e["ph"] == "M"]), 2)
+
+    def testUnitRun(self):
+        from veles.tracer import tracer
+        self.assertFalse(root.common.trace.timeline)
+        unit = TrivialUnit(DummyWorkflow())
+        unit.initialize()
+        tracer.enable()
+        try:
+            unit.run()
+        finally:
+            tracer.disable()
+        self.assertEqual([r[:2] for r in tracer.records],
+                         [(unit.name, "run")])
+
+    def testLateConfig(self):
+        tracer = Tracer()
+        self.assertFalse(tracer.enabled)
+        root.common.trace.timeline = True
+        try:
+            self.assertFalse(tracer.enabled)
+            tracer.configure()
+            self.assertTrue(tracer.enabled)
+            tracer.record("unit", "run", 0, 1)
+            self.assertEqual(len(tracer.records), 1)
+            tracer.disable()
+            self.assertFalse(tracer.enabled)
+            tracer.configure()
+            self.assertFalse(tracer.enabled)
+        finally:
+            root.common.trace.timeline = False
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+Tests for the job and update encoders.
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+import unittest
+
+import numpy
+
+from veles.config import root
+from veles.dummy import DummyWorkflow
+from veles.pickle2 import pickle
+from veles.update_encoding import UpdateEncoding, UpdateEncoderRegistry
+
+
+class TestUpdateEncoding(unittest.TestCase):
+    def roundtrip(self, name, data):
+        encoder = UpdateEncoderRegistry.encoders[name]()
+        decoder = UpdateEncoderRegistry.encoders[name]()
+        return decoder.decode(pickle.loads(pickle.dumps(
+            encoder.encode(data))))
+
+    def testXor(self):
+        encoder = UpdateEncoderRegistry.encoders["xor"]()
+        decoder = UpdateEncoderRegistry.encoders["xor"]()
+        weights = numpy.random.rand(50, 20).astype(numpy.float32)
+        for _ in range(3):
+            data = [{"weights": weights, "epoch": 1}, None,
+                    (numpy.arange(10),)]
+            encoded = encoder.encode(data)
+            decoded = decoder.decode(pickle.loads(pickle.dumps(encoded)))
+            self.assertTrue((decoded[0]["weights"] == weights).all())
+            self.assertEqual(decoded[0]["epoch"], 1)
+            self.assertIsNone(decoded[1])
+            self.assertTrue((decoded[2][0] == numpy.arange(10)).all())
+            encoder.ack(decoder.generation)
+            weights = weights + 0.001
+        self.assertEqual(encoded[0]["weights"].kind, "xor")
+
+    def testXorLostMessage(self):
+        master = UpdateEncoding("xor", "xor")
+        slave = UpdateEncoding("xor", "xor")
+        weights = numpy.random.rand(50, 20)
+        for i in range(6):
+            job = master.encode_job([weights + i])
+            if i == 2:
+                # generated, but never sent to the slave
+                continue
+            job = pickle.loads(pickle.dumps(job))
+            self.assertTrue((slave.decode_job(job)[0] == weights + i).all())
+            update = slave.encode_update([weights - i])
+            self.assertTrue(
+                (master.decode_update(update)[0] == weights - i).all())
+        self.assertEqual(master.job._state[(0,)][0], 6)
+        self.assertEqual(len(master.job._sent), 0)
+        self.assertEqual(list(slave.job._state[(0,)]), [5, 6])
+
+    def testNotNegotiated(self):
+        encoding = UpdateEncoding()
+        data = [numpy.arange(10)]
+        self.assertIs(encoding.encode_job(data), data)
+        self.assertIs(encoding.decode_update(data), data)
+
+    def testTopK(self):
+        encoder = UpdateEncoderRegistry.encoders["topk"]()
+        decoder = UpdateEncoderRegistry.encoders["topk"]()
+        grad = numpy.random.rand(100, 100) - 0.5
+        total = numpy.zeros_like(grad)
+        rounds = int(1 / encoder.ratio)
+        for _ in range(rounds):
+            decoded = decoder.decode(encoder.encode([grad]))[0]
+            self.assertEqual(decoded.shape, grad.shape)
+            self.assertEqual(numpy.count_nonzero(decoded),
+                             int(encoder.ratio * grad.size))
+            total += decoded
+        # error feedback: nothing is lost, only delayed
+        residual = encoder._state[(0,)]
+        self.assertLess(
+            numpy.abs(total + residual.reshape(grad.shape) -
+                      grad * rounds).max(), 1e-9)
+
+    def testFloat16(self):
+        arr = numpy.random.rand(100).astype(numpy.float32)
+        decoded = self.roundtrip("float16", {"arr": arr})["arr"]
+        self.assertEqual(decoded.dtype, numpy.float32)
+        self.assertLess(numpy.abs(decoded - arr).max(), 1e-3)
+
+    def testNegotiate(self):
+        cfg = root.common.engine.update_encoding
+        job, update = cfg.job, cfg.update
+        try:
+            cfg.job = "xor"
+            cfg.update = "topk"
+            encoding = UpdateEncoding.negotiate(["xor", "float16"])
+            self.assertEqual(encoding.names, {"job": "xor", "update": None})
+            self.assertIsNotNone(encoding.job)
+            self.assertIsNone(encoding.update)
+        finally:
+            cfg.job, cfg.update = job, update
+
+    def testDroppedSlave(self):
+        class Slave(object):
+            id = "slave"
+
+        workflow = DummyWorkflow()
+        slave = UpdateEncoding("xor", "xor")
+        update = slave.encode_update(
+            [None] * len(workflow.units_in_dependency_order))
+        with self.assertLogs(level="WARNING"):
+            self.assertFalse(workflow.apply_data_from_slave(update, Slave()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -35,6 +35,7 @@ under the License.
 
 import gc
 import six
+import time
 import unittest
 import weakref
 from zope.interface.verify import verifyObject
@@ -268,6 +269,39 @@ class Test(unittest.TestCase):
             self.assertTrue(flag[0])
             self.assertTrue(flag[1])
 
+    def testCompiledPlan(self):
+        order = []
+
+        class MyUnit(TrivialUnit):
+            def run(self):
+                order.append(self.name)
+
+        dl = DummyLauncher()
+        wf = Workflow(dl, compiled_plan=True)
+        a = MyUnit(wf, name="a")
+        a.link_from(wf.start_point)
+        b = MyUnit(wf, name="b")
+        b.link_from(a)
+        c = MyUnit(wf, name="c")
+        c.link_from(a)
+        d = MyUnit(wf, name="d")
+        d.link_from(b, c)
+        wf.end_point.link_from(d)
+        wf.initialize()
+        self.assertEqual(a._compiled_links_, (b, c))
+        wf.start_point.run_dependent()
+        for _ in range(100):
+            if len(order) == 4:
+                break
+            time.sleep(0.05)
+        self.assertEqual(order[0], "a")
+        self.assertEqual(set(order[1:3]), {"b", "c"})
+        self.assertEqual(order[3:], ["d"])
+        e = MyUnit(wf, name="e")
+        e.link_from(a)
+        self.assertIsNone(a._compiled_links_)
+        self.assertEqual(b._compiled_links_, (d,))
+
     def testPickling(self):
         dl = DummyLauncher()
         wf = Workflow(dl)
@@ -53,6 +53,7 @@ from veles.external import manhole
 import veles.logger as logger
 from veles.cmdline import CommandLineArgumentsRegistry, classproperty
 from veles.compat import from_none, is_interactive
+from veles.tracer import tracer
 
 
 def errback(failure, thread_pool=None):
@@ -127,6 +128,8 @@ class ThreadPool(threadpool.ThreadPool, logger.Logger):
             if not ThreadPool.manhole:
                 signal.signal(signal.SIGUSR1, self.sigusr1_handler)
                 signal.signal(signal.SIGUSR2, self.sigusr2_handler)
+            if hasattr(signal, "SIGRTMIN"):
+                signal.signal(signal.SIGRTMIN, ThreadPool.sigrtmin_handler)
         ThreadPool.pools.append(self)
 
     def __del__(self):
@@ -170,6 +173,8 @@ class ThreadPool(threadpool.ThreadPool, logger.Logger):
         self._not_paused.wait()
         if self._stopping:
             return
+        if tracer.enabled:
+            func = self._trace_queueing(func)
         with self._lock:
             if self._dead:
                 return
@@ -177,6 +182,16 @@ class ThreadPool(threadpool.ThreadPool, logger.Logger):
                 functools.partial(self._on_result, onResult),
                 func, *args, **kw)
 
+    def _trace_queueing(self, func):
+        name = getattr(getattr(func, "__self__", None), "name", self.name)
+        enqueued = tracer.now()
+
+        def wrapped_trace_queueing(*args, **kwargs):
+            tracer.record(name, "queued", enqueued, tracer.now())
+            return func(*args, **kwargs)
+
+        return wrapped_trace_queueing
+
     def start(self):
         if self._stopping:
             return
@@ -532,6 +547,15 @@ class ThreadPool(threadpool.ThreadPool, logger.Logger):
             self.warning("SIGUSR2 was received, unable to install the manhole "
                          "because no workflow's been registered")
 
+    @staticmethod
+    def sigrtmin_handler(sign, frame):
+        """
+        Private method - handler for SIGRTMIN which toggles the timeline
+        tracing (see :mod:`veles.tracer`). The export and the summary are
+        not done inside the signal handler.
+        """
+        reactor.callFromThread(tracer.toggle)
+
     @staticmethod
     def print_thread_stacks():
         if not hasattr(sys, "_current_frames"):
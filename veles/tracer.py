@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+Timeline of unit method calls with Chrome trace export.
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+import json
+import os
+import threading
+
+import numpy
+
+from veles.config import root
+from veles.external.prettytable import PrettyTable
+from veles.logger import Logger
+from veles.timeit2 import perf_counter
+
+
+class ThreadBuffer(object):
+    """
+    Ring buffer of the records of a single thread. Only the owning thread
+    writes into it, so no locking is needed.
+    """
+
+    def __init__(self, capacity):
+        self.thread = threading.current_thread()
+        self.records = [None] * capacity
+        self.pos = 0
+
+    def append(self, record):
+        self.records[self.pos % len(self.records)] = record
+        self.pos += 1
+
+    def __iter__(self):
+        capacity = len(self.records)
+        if self.pos <= capacity:
+            return iter(self.records[:self.pos])
+        start = self.pos % capacity
+        return iter(self.records[start:] + self.records[:start])
+
+
+class Tracer(Logger):
+    """
+    Records (unit, method, start, end, minibatch class) spans into the
+    per-thread ring buffers while enabled. The recording is fed from
+    :meth:`veles.units.Unit._measure_time` and the thread pool. Toggle it
+    with enable()/disable() from the manhole or with SIGRTMIN (see
+    :class:`veles.thread_pool.ThreadPool`). Until then, it follows
+    root.common.trace.timeline, which is read in configure().
+    """
+
+    def __init__(self):
+        super(Tracer, self).__init__()
+        # A plain attribute since it is checked on every unit call
+        self.enabled = False
+        self._explicit = False
+        self._local = threading.local()
+        self._buffers = []
+
+    def configure(self):
+        """
+        Applies root.common.trace.timeline unless enable() or disable() has
+        been called. Workflow.initialize() calls it.
+        """
+        if not self._explicit:
+            self.enabled = bool(root.common.trace.timeline)
+
+    @staticmethod
+    def now():
+        return perf_counter()
+
+    def enable(self):
+        self.clear()
+        self.enabled = self._explicit = True
+        self.info("Enabled the timeline tracing")
+
+    def disable(self):
+        self.enabled = False
+        self._explicit = True
+        self.info("Disabled the timeline tracing")
+
+    def toggle(self, file_name=None):
+        """
+        Enables the tracing or disables it and exports the timeline.
+        """
+        if not self.enabled:
+            self.enable()
+            return
+        self.disable()
+        if file_name is None:
+            file_name = os.path.join(
+                root.common.dirs.cache, "timeline_%d.json" % os.getpid())
+        self.export_chrome_trace(file_name)
+        self.print_summary()
+
+    def clear(self):
+        self._buffers = []
+        self._local = threading.local()
+
+    def record(self, name, method, start, end, minibatch_class=None):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = ThreadBuffer(
+                root.common.trace.timeline_capacity)
+            self._buffers.append(buffer)
+        buffer.append((name, method, start, end, minibatch_class))
+
+    @property
+    def records(self):
+        """
+        :return: The list of (unit, method, thread, start, end,
+        minibatch class) tuples sorted by start time.
+        """
+        result = []
+        for buffer in list(self._buffers):
+            thread = buffer.thread.name
+            result.extend((r[0], r[1], thread) + r[2:] for r in buffer)
+        result.sort(key=lambda r: r[3])
+        return result
+
+    def export_chrome_trace(self, file_name):
+        """
+        Writes the records in Chrome trace event format, which can be opened
+        in chrome://tracing or in Perfetto UI.
+        """
+        pid = os.getpid()
+        tids = {}
+        events = []
+        for name, method, thread, start, end, mbclass in self.records:
+            tid = tids.setdefault(thread, len(tids) + 1)
+            event = {"name": "%s.%s" % (name, method), "cat": method,
+                     "ph": "X", "pid": pid, "tid": tid,
+                     "ts": start * 1000000, "dur": (end - start) * 1000000}
+            if mbclass is not None:
+                event["args"] = {"minibatch_class": str(mbclass)}
+            events.append(event)
+        for thread, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid,
+                           "tid": tid, "args": {"name": thread}})
+        with open(file_name, "w") as fout:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fout)
+        self.info("Exported %d timeline records to %s", len(events) -
+                  len(tids), file_name)
+
+    def summary(self):
+        """
+        :return: The list of (unit, method, count, total, p50, p90, p99, max)
+        sorted by the total time, durations are in seconds.
+        """
+        durations = {}
+        for name, method, _, start, end, _ in self.records:
+            durations.setdefault((name, method), []).append(end - start)
+        result = []
+        for (name, method), values in durations.items():
+            values = numpy.array(values)
+            p50, p90, p99 = numpy.percentile(values, (50, 90, 99))
+            result.append((name, method, len(values), values.sum(), p50, p90,
+                           p99, values.max()))
+        result.sort(key=lambda r: r[3], reverse=True)
+        return result
+
+    def print_summary(self, top_number=20):
+        table = PrettyTable("unit", "method", "calls", "total", "p50, ms",
+                            "p90, ms", "p99, ms", "max, ms")
+        table.align["unit"] = "l"
+        table.align["method"] = "l"
+        for name, method, count, total, p50, p90, p99, vmax in \
+                self.summary()[:top_number]:
+            table.add_row(name, method, count, "%.3f" % total,
+                          "%.3f" % (p50 * 1000), "%.3f" % (p90 * 1000),
+                          "%.3f" % (p99 * 1000), "%.3f" % (vmax * 1000))
+        self.info("Timeline summary:\n%s", table)
+
+
+tracer = Tracer()
@@ -44,7 +44,9 @@ import os
 import time
 from tempfile import mkstemp
 
+import numpy
 import six
+from six import BytesIO
 from six.moves import cPickle as pickle
 import snappy
 from zmq import constants, error, Socket, ZMQError
@@ -140,7 +142,10 @@ class ZmqConnection(Logger):
     PICKLE_START = b'vpb'
     PICKLE_END = b'vpe'
     CODECS = {None: b'\x00', "": b'\x00', "gzip": b'\x01', "snappy": b'\x02',
-              "xz": b'\x03'}
+              "xz": b'\x03', "zerocopy": b'\x04'}
+    ZEROCOPY_CODEC = 4
+    # numpy arrays smaller than this are pickled in-band in "zerocopy" mode
+    ZEROCOPY_THRESHOLD = 4096
 
     def __init__(self, endpoints, identity=None, **kwargs):
         """
@@ -162,6 +167,7 @@ class ZmqConnection(Logger):
         self.read_scheduled = None
         self.shutted_down = False
         self.pickles_compression = "snappy"
+        self.zerocopy_frames = []
         self._last_read_time = 0.0
 
         self.fd = self.socket.get(constants.FD)
@@ -233,7 +239,7 @@ class ZmqConnection(Logger):
 
     @pickles_compression.setter
     def pickles_compression(self, value):
-        if value not in (None, "", "gzip", "snappy", "xz"):
+        if value not in ZmqConnection.CODECS:
             raise ValueError()
         self._pickles_compression = value
 
@@ -258,6 +264,11 @@ class ZmqConnection(Logger):
         or raising exception (in case of no more messages available).
         """
         while True:
+            if unpickler.expects_frames:
+                # "zerocopy" skeleton and array buffers
+                unpickler.consume(
+                    self.socket.recv(constants.NOBLOCK, copy=False))
+                continue
             part = self.socket.recv(constants.NOBLOCK)
             if part.startswith(ZmqConnection.PICKLE_START):
                 self.messageHeaderReceived(self.recv_parts)
@@ -268,7 +279,7 @@ class ZmqConnection(Logger):
                 unpickler.active = False
                 obj = unpickler.object
                 if isinstance(obj, SharedIO):
-                    obj = pickle.load(obj)
+                    obj = obj.load()
                 self.recv_parts.append(obj)
             elif not unpickler.active:
                 self.recv_parts.append(part)
@@ -285,6 +296,9 @@ class ZmqConnection(Logger):
             self._data = []
             self._active = False
             self._decompressor = None
+            self._codec = 0
+            self._specs = None
+            self._arrays = []
 
         @property
         def active(self):
@@ -294,10 +308,26 @@ class ZmqConnection(Logger):
         def active(self, value):
             self._active = value
             if not value:
-                buffer = self.merge_chunks()
-                self._object = pickle.loads(buffer if six.PY3 else str(buffer))
+                if self.codec == ZmqConnection.ZEROCOPY_CODEC:
+                    self._object = self.load_skeleton()
+                else:
+                    buffer = self.merge_chunks()
+                    self._object = pickle.loads(
+                        buffer if six.PY3 else str(buffer))
             self._data = []
 
+        @property
+        def expects_frames(self):
+            """
+            Indicates whether the next "zerocopy" frames belong to the current
+            object, that is, they must be received without copying and must
+            not be checked for the pickle markers.
+            """
+            if not self.active or self.codec != ZmqConnection.ZEROCOPY_CODEC:
+                return False
+            return self._specs is None or len(self._data) == 0 or \
+                len(self._arrays) < len(self._specs)
+
         @property
         def codec(self):
             return self._codec
@@ -305,7 +335,9 @@ class ZmqConnection(Logger):
         @codec.setter
         def codec(self, value):
             self._codec = value if six.PY3 else ord(value)
-            if self.codec == 0:
+            self._specs = None
+            self._arrays = []
+            if self.codec in (0, ZmqConnection.ZEROCOPY_CODEC):
                 pass
             elif self.codec == 1:
                 self._decompressor = \
@@ -335,10 +367,37 @@ class ZmqConnection(Logger):
             return buffer
 
         def consume(self, data):
+            if self.codec == ZmqConnection.ZEROCOPY_CODEC:
+                self.consume_frame(data)
+                return
             if self.codec > 0:
                 data = self._decompressor.decompress(data)
             self._data.append(data)
 
+        def consume_frame(self, frame):
+            """
+            The first frame is the list of (dtype, shape) of the sent arrays,
+            the second is the pickled skeleton, the rest are the array
+            buffers which are wrapped without copying. The resulting arrays
+            are read-only.
+            """
+            if self._specs is None:
+                self._specs = pickle.loads(frame.bytes)
+            elif len(self._data) == 0:
+                self._data.append(frame.bytes)
+            else:
+                dtype, shape = self._specs[len(self._arrays)]
+                self._arrays.append(numpy.frombuffer(
+                    frame.buffer, dtype=dtype).reshape(shape))
+
+        def load_skeleton(self):
+            unpickler = pickle.Unpickler(BytesIO(self._data[0]))
+            unpickler.persistent_load = self._arrays.__getitem__
+            obj = unpickler.load()
+            self._specs = None
+            self._arrays = []
+            return obj
+
     def doRead(self):
         """
         Some data is available for reading on ZeroMQ descriptor.
@@ -407,14 +466,24 @@ class ZmqConnection(Logger):
         an instance of bytes, it will be sent as-is, otherwise, it will be\
         pickled and optionally compressed. Object must not be a string.
         :param pickles_compression: the compression to apply to pickled\
-        objects. Supported values are None or "", "gzip", "snappy" and "xz".
+        objects. Supported values are None or "", "gzip", "snappy", "xz" and\
+        "zerocopy". The latter sends numpy arrays as separate frames;\
+        the receiving side gets read-only arrays.
         :type pickles_compression: str
+        :param zerocopy_owned: the caller does not change the numpy arrays\
+        until ZeroMQ transmits them (see :attr:`zerocopy_pending`), so\
+        "zerocopy" does not copy them. By default, the arrays are copied\
+        once before sending since the units keep writing into theirs.
+        :type zerocopy_owned: bool
         :param io: a SharedIO object where to put pickles into instead of the\
-        socket. Can be None.
+        socket. numpy arrays are placed there raw and are copied out by the\
+        receiver (or mapped as read-only views, see SharedIO.zerocopy).\
+        Can be None.
         """
         if self.shutted_down:
             return
         pickles_compression = kwargs.get("pickles_compression", "snappy")
+        zerocopy_owned = kwargs.get("zerocopy_owned", False)
         pickles_size = 0
         io = kwargs.get("io")
         io_overflow = False
@@ -427,7 +496,8 @@ class ZmqConnection(Logger):
             if isinstance(msg, str):
                 raise ValueError("All strings must be encoded into bytes")
             return self._send_pickled(msg, last, pickles_compression,
-                                      io if not io_overflow else None)
+                                      io if not io_overflow else None,
+                                      zerocopy_owned)
 
         for i, m in enumerate(message):
             try:
@@ -515,7 +585,22 @@ class ZmqConnection(Logger):
         def flush(self):
             self._compressor.flush()
 
-    def _send_pickled(self, message, last, compression, io):
+    @property
+    def zerocopy_pending(self):
+        """
+        Indicates whether ZeroMQ still references some of the arrays sent in
+        "zerocopy" mode.
+        """
+        self._forget_transmitted_frames()
+        return len(self.zerocopy_frames) > 0
+
+    def _forget_transmitted_frames(self):
+        self.zerocopy_frames = [(tracker, arr) for tracker, arr
+                                in self.zerocopy_frames
+                                if tracker is not None and not tracker.done]
+
+    def _send_pickled(self, message, last, compression, io,
+                      zerocopy_owned=False):
         if self.shutted_down:
             return
 
@@ -535,7 +620,47 @@ class ZmqConnection(Logger):
                 ZmqConnection.PICKLE_END,
                 constants.NOBLOCK | (constants.SNDMORE if not last else 0))
 
+        def send_zerocopy():
+            send_pickle_beg_marker(codec)
+            buffers = []
+            specs = []
+
+            def persistent_id(obj):
+                if not isinstance(obj, numpy.ndarray) or \
+                        obj.dtype.hasobject or \
+                        not obj.flags.c_contiguous or \
+                        obj.nbytes < ZmqConnection.ZEROCOPY_THRESHOLD:
+                    return None
+                specs.append((obj.dtype, obj.shape))
+                buffers.append(obj)
+                return len(buffers) - 1
+
+            skeleton = BytesIO()
+            pickler = pickle.Pickler(skeleton, protocol=best_protocol)
+            pickler.persistent_id = persistent_id
+            pickler.dump(message)
+            skeleton = skeleton.getvalue()
+            self.socket.send(pickle.dumps(specs, protocol=best_protocol),
+                             constants.NOBLOCK | constants.SNDMORE)
+            self.socket.send(skeleton, constants.NOBLOCK | constants.SNDMORE)
+            size = len(skeleton)
+            self._forget_transmitted_frames()
+            for arr in buffers:
+                if not zerocopy_owned:
+                    arr = arr.copy()
+                raw = memoryview(arr.reshape(-1).view(numpy.uint8))
+                # The array is kept alive until the tracker is done
+                tracker = self.socket.send(
+                    raw, constants.NOBLOCK | constants.SNDMORE,
+                    copy=False, track=True)
+                self.zerocopy_frames.append((tracker, arr))
+                size += arr.nbytes
+            send_pickle_end_marker()
+            return size
+
         def send_to_socket():
+            if codec == ZmqConnection.CODECS["zerocopy"]:
+                return send_zerocopy()
             send_pickle_beg_marker(codec)
             pickler = ZmqConnection.Pickler(self.socket, codec[0])
             dump(pickler)
@@ -548,10 +673,10 @@ class ZmqConnection(Logger):
         else:
             try:
                 initial_pos = io.tell()
-                dump(io)
+                pickle_pos = io.dump(message)
                 new_pos = io.tell()
                 send_pickle_beg_marker(b'\x00')
-                io.seek(initial_pos)
+                io.seek(pickle_pos)
                 self.socket.send(pickle.dumps(io, protocol=best_protocol),
                                  constants.NOBLOCK | constants.SNDMORE)
                 io.seek(new_pos)
@@ -38,23 +38,45 @@ under the License.
 
 
 from mmap import mmap
+import struct
+
+import numpy
 from posix_ipc import SharedMemory, O_CREAT, ExistentialError
+from six import BytesIO
+from six.moves import cPickle as pickle
+
+from veles.pickle2 import best_protocol
 
 
 class SharedIO(object):
     """
     A version of BytesIO which is shared between multiple processes, suitable
     for IPC.
+
+    Attributes:
+        zerocopy: load() returns read-only views of the shared memory instead
+                  of the copies of numpy arrays. The views are valid only
+                  until the writer rewinds the segment with the next dump(),
+                  so the reader must finish consuming them before it replies
+                  to the writer; check() tells whether they are still intact.
     """
 
     CACHE = {}
-
-    def __init__(self, name, size):
+    # magic and generation counter at the beginning of the segment
+    HEADER = struct.Struct("<4sxxxxQ")
+    MAGIC = b"VSIO"
+    # numpy arrays smaller than this are pickled by dump() as usual
+    ARRAY_THRESHOLD = 4096
+    ARRAY_ALIGNMENT = 64
+
+    def __init__(self, name, size, zerocopy=False):
         self.shmem = None
         self.shmem = SharedMemory(name, flags=O_CREAT, mode=0o666, size=size)
         self.file = mmap(self.shmem.fd, size)
         self.__init_file_methods()
         self.__shmem_refs = [1]
+        self.generation = 0
+        self.zerocopy = zerocopy
 
     def __del__(self):
         if self.shmem is None:
@@ -70,7 +92,9 @@ class SharedIO(object):
     def __getstate__(self):
         return {"name": self.name,
                 "size": self.size,
-                "pos": self.tell()}
+                "pos": self.tell(),
+                "generation": self.generation,
+                "zerocopy": self.zerocopy}
 
     def __setstate__(self, state):
         name = state["name"]
@@ -87,6 +111,8 @@ class SharedIO(object):
             self.__init__(name, size)
             SharedIO.CACHE["%s:%d" % (name, size)] = self
         self.seek(state["pos"])
+        self.generation = state.get("generation", 0)
+        self.zerocopy = state.get("zerocopy", False)
 
     @property
     def name(self):
@@ -103,3 +129,98 @@ class SharedIO(object):
     def __init_file_methods(self):
         for name in ("read", "readline", "write", "tell", "close", "seek"):
             setattr(self, name, getattr(self.file, name))
+
+    def dump(self, obj):
+        """
+        Writes the object to the current position. numpy arrays are copied
+        into the segment as is and the rest is pickled after them, so that
+        load() maps the arrays without deserializing. If the position is
+        inside the header, a new generation starts and any objects
+        written before become stale.
+
+        :return: The offset of the pickle which must be passed to load().
+        """
+        if self.tell() < SharedIO.HEADER.size:
+            self.seek(0)
+            self.generation = self.read_generation() + 1
+            self.write(SharedIO.HEADER.pack(SharedIO.MAGIC, self.generation))
+        # The arrays created by __getstate__() or __reduce__() may be freed
+        # while pickling, so they are kept alive till the end in order not
+        # to reuse their ids.
+        written = {}
+
+        def persistent_id(arr):
+            if not isinstance(arr, numpy.ndarray) or arr.dtype.hasobject or \
+                    not arr.flags.c_contiguous or \
+                    arr.nbytes < SharedIO.ARRAY_THRESHOLD:
+                return None
+            known = written.get(id(arr))
+            if known is not None:
+                return known[1]
+            align = SharedIO.ARRAY_ALIGNMENT
+            offset = (self.tell() + align - 1) // align * align
+            self.seek(offset)
+            self.write(memoryview(arr.reshape(-1).view(numpy.uint8)))
+            pid = offset, arr.dtype, arr.shape
+            written[id(arr)] = arr, pid
+            return pid
+
+        skeleton = BytesIO()
+        pickler = pickle.Pickler(skeleton, protocol=best_protocol)
+        pickler.persistent_id = persistent_id
+        pickler.dump(obj)
+        pos = self.tell()
+        self.write(skeleton.getvalue())
+        return pos
+
+    def load(self):
+        """
+        Reads the object written by dump() from the current position.
+        The arrays inside are copied out of the shared memory, or are
+        read-only views of it if zerocopy is True (see check()). The same
+        array dumped several times is loaded as a single object.
+        The generation is checked both before and after reading (seqlock),
+        so a message which the writer overwrote meanwhile raises ValueError
+        instead of being returned torn.
+        """
+        self.check()
+        loaded = {}
+
+        def persistent_load(pid):
+            offset, dtype, shape = pid
+            arr = loaded.get(offset)
+            if arr is not None:
+                return arr
+            arr = numpy.frombuffer(
+                self.file, dtype=dtype, count=int(numpy.prod(shape)),
+                offset=offset).reshape(shape)
+            if self.zerocopy:
+                arr.flags.writeable = False
+            else:
+                arr = arr.copy()
+            loaded[offset] = arr
+            return arr
+
+        unpickler = pickle.Unpickler(self)
+        unpickler.persistent_load = persistent_load
+        obj = unpickler.load()
+        self.check()
+        return obj
+
+    def check(self):
+        """
+        Raises ValueError if the writer has started a new generation since
+        the object was written, that is, the zero-copy views returned by
+        load() are overwritten.
+        """
+        generation = self.read_generation()
+        if generation != self.generation:
+            raise ValueError(
+                "Shared memory %s was overwritten (generation %d, expected "
+                "%d)" % (self.name, generation, self.generation))
+
+    def read_generation(self):
+        if self.size < SharedIO.HEADER.size:
+            return 0
+        magic, generation = SharedIO.HEADER.unpack_from(self.file, 0)
+        return generation if magic == SharedIO.MAGIC else 0
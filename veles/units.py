@@ -51,7 +51,8 @@ from veles.external.progressbar import spin
 from veles.mutable import Bool, LinkableAttribute
 from veles.prng.random_generator import RandomGenerator
 import veles.thread_pool as thread_pool
-from veles.timeit2 import timeit
+from veles.timeit2 import perf_counter
+from veles.tracer import tracer
 from veles.unit_registry import UnitRegistry
 from veles.verified import Verified
 
@@ -167,7 +168,8 @@ class Unit(Distributable, Verified):
         def wrap_to_measure_time(name):
             func = getattr(self, name, None)
             if func is not None:
-                setattr(self, name, self._measure_time(func, Unit.timers))
+                setattr(self, name,
+                        self._measure_time(func, Unit.timers, name))
 
         # Important: these 4 decorator applications must stand before
         # super(...).init_unpickled since it will call
@@ -179,18 +181,21 @@ class Unit(Distributable, Verified):
         super(Unit, self).init_unpickled()
         self._gate_lock_ = threading.Lock()
         self._run_lock_ = threading.Lock()
+        self._compiled_links_ = None
         self._is_initialized = False
         self._stopped_ = False
         if hasattr(self, "run"):
             self.run = self._check_run_conditions(self.run)
             self.run = self._track_call(self.run, "run_was_called")
-            self.run = self._measure_time(self.run, Unit.timers)
+            self.run = self._measure_time(self.run, Unit.timers, "run")
         if hasattr(self, "initialize"):
             self.initialize = self._ensure_reproducible_rg(self.initialize)
             self.initialize = self._retry_call(
                 self.initialize, "_is_initialized")
             self.initialize = self._check_attrs(
                 self.initialize, self.demanded)
+            self.initialize = self._measure_time(
+                self.initialize, None, "initialize")
         if hasattr(self, "stop"):
             self.stop = self._track_call(self.stop, "_stopped")
         Unit.timers[self.id] = 0
@@ -487,6 +492,9 @@ class Unit(Distributable, Verified):
         """
         if self.stopped and not isinstance(self, Container):
             return
+        if self._compiled_links_ is not None:
+            self._run_compiled_dependent()
+            return
         links = self.links_to_sorted
         # We must create a copy of gate_block-s because they can change
         # while the loop is working
@@ -504,6 +512,48 @@ class Unit(Distributable, Verified):
                     self.thread_pool.start()
                 self.thread_pool.callInThread(dst._check_gate_and_run, self)
 
+    def compile_links(self):
+        """Caches the sorted dependent units for run_dependent(). Called by
+        :meth:`veles.workflow.Workflow.compile_plan`. Any change of links_to
+        drops the cache.
+        """
+        self._compiled_links_ = tuple(self.links_to_sorted)
+
+    def _run_compiled_dependent(self):
+        """Invokes run() on dependent units using the compiled links.
+        Sequential chains are executed inline in a loop instead of the
+        recursion, the gates of join points are checked before dispatching
+        and only the truly parallel branches go to the thread pool.
+        """
+        pending = [self]
+        while len(pending) > 0:
+            src = pending.pop()
+            if src.stopped and not isinstance(src, Container):
+                continue
+            links = src._compiled_links_
+            if links is None:
+                src.run_dependent()
+                continue
+            ready = []
+            for dst in links:
+                if dst.gate_block:
+                    continue
+                if len(dst.links_from) > 1 and not dst.open_gate(src):
+                    continue
+                ready.append(dst)
+            if root.common.trace.run:
+                for index, dst in enumerate(ready):
+                    self.debug("%s -> %s (%d/%d) @%s", src, dst, index + 1,
+                               len(ready), threading.current_thread().name)
+            if len(ready) == 0:
+                continue
+            if len(ready) > 1 and not self.thread_pool.started:
+                self.thread_pool.start()
+            for dst in ready[:-1]:
+                self.thread_pool.callInThread(dst._run_and_run_dependent)
+            if ready[-1]._run_with_open_gate():
+                pending.append(ready[-1])
+
     def dependent_units(self, with_open_gate=False):
         yield self
         walk = []
@@ -565,6 +615,7 @@ class Unit(Distributable, Verified):
                 else:
                     with src._gate_lock_:
                         src.links_to[weakref.ref(self)] = False
+                src._compiled_links_ = None
         return self
 
     def unlink_from(self, *args):
@@ -574,6 +625,7 @@ class Unit(Distributable, Verified):
             for src in args:
                 with src._gate_lock_:
                     self._del_link(src.links_to, self)
+                    src._compiled_links_ = None
                 self._del_link(self.links_from, src)
         return self
 
@@ -592,6 +644,7 @@ class Unit(Distributable, Verified):
             for src in self._iter_links(self.links_from):
                 with src._gate_lock_:
                     self._del_link(src.links_to, self)
+                    src._compiled_links_ = None
             self.links_from.clear()
         return self
 
@@ -604,6 +657,7 @@ class Unit(Distributable, Verified):
                 with dst._gate_lock_:
                     self._del_link(dst.links_from, self)
             self.links_to.clear()
+            self._compiled_links_ = None
         return self
 
     def insert_after(self, *chain):
@@ -784,14 +838,27 @@ class Unit(Distributable, Verified):
         """
         if not self.open_gate(src):  # gate has priority over skip
             return
+        self._run_and_run_dependent()
+
+    def _run_and_run_dependent(self):
+        if self._run_with_open_gate():
+            self.run_dependent()
+
+    def _run_with_open_gate(self):
+        """Runs the unit which gate is already open.
+
+        Returns:
+            True: dependent units must be notified.
+            False: the execution was discarded.
+        """
         if self.thread_pool.failure is not None:
             # something went wrong in the thread pool
-            return
+            return False
         # Optionally skip the execution
         if not self.gate_skip:
             # If previous run has not yet finished, discard notification.
             if not self._run_lock_.acquire(False):
-                return
+                return False
             try:
                 if not self._is_initialized:
                     self.error("%s is not initialized", self.name)
@@ -800,15 +867,21 @@ class Unit(Distributable, Verified):
                 self.run()
             finally:
                 self._run_lock_.release()
-        self.run_dependent()
+        return True
 
-    def _measure_time(self, fn, storage):
+    def _measure_time(self, fn, storage, method):
         def wrapped_measure_time(*args, **kwargs):
-            res, delta = timeit(fn, *args, **kwargs)
-            if self.id in storage:
+            start = perf_counter()
+            res = fn(*args, **kwargs)
+            finish = perf_counter()
+            delta = finish - start
+            if storage is not None and self.id in storage:
                 storage[self.id] += delta
             if self.timings:
                 self.debug("%s took %.6f sec", fn.__name__, delta)
+            if tracer.enabled:
+                tracer.record(self.name, method, start, finish,
+                              getattr(self, "minibatch_class", None))
             return res
 
         name = getattr(fn, '__name__',
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+.. invisible:
+     _   _ _____ _     _____ _____
+    | | | |  ___| |   |  ___/  ___|
+    | | | | |__ | |   | |__ \ `--.
+    | | | |  __|| |   |  __| `--. \
+    \ \_/ / |___| |___| |___/\__/ /
+     \___/\____/\_____|____/\____/
+
+Created on Oct 16, 2026
+
+Encodings of the jobs and the updates exchanged between master and slaves.
+
+███████████████████████████████████████████████████████████████████████████████
+
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+
+███████████████████████████████████████████████████████████████████████████████
+"""
+
+
+from math import ceil
+
+import numpy
+from six import add_metaclass
+
+from veles.config import root
+from veles.mapped_object_registry import MappedObjectsRegistry
+
+
+class UpdateEncoderRegistry(MappedObjectsRegistry):
+    """Metaclass to record the update encoders. Used by
+    :class:`UpdateEncoding`.
+    """
+    mapping = "encoders"
+
+
+class EncodedArray(object):
+    """
+    Replaces a numpy array inside the encoded job or update.
+    """
+
+    def __init__(self, kind, dtype, shape, payload):
+        self.kind = kind
+        self.dtype = dtype
+        self.shape = shape
+        self.payload = payload
+
+    def __getstate__(self):
+        return self.kind, self.dtype, self.shape, self.payload
+
+    def __setstate__(self, state):
+        self.kind, self.dtype, self.shape, self.payload = state
+
+
+class EncodedMessage(object):
+    """
+    The encoded job or update together with the generation of the last
+    message which the sender has decoded from the peer.
+    """
+
+    def __init__(self, payload, ack):
+        self.payload = payload
+        self.ack = ack
+
+    def __getstate__(self):
+        return self.payload, self.ack
+
+    def __setstate__(self, state):
+        self.payload, self.ack = state
+
+
+@add_metaclass(UpdateEncoderRegistry)
+class UpdateEncoder(object):
+    """
+    Base class of the stateful numpy array encoders. The same instance must
+    not be used for both encoding and decoding. Arrays are matched between
+    subsequent calls by their path inside the nested lists, tuples and dicts
+    of the job or the update.
+
+    Attributes:
+        generation: the number of the last encoded or decoded message.
+    """
+
+    def __init__(self):
+        self._state = {}
+        self.generation = 0
+
+    def encode(self, data):
+        self.generation += 1
+        return self._walk(data, (), self._encode)
+
+    def ack(self, generation):
+        """
+        Called when the peer confirms that it has decoded the message
+        with the specified generation.
+        """
+        pass
+
+    def decode(self, data):
+        return self._walk(data, (), self._decode)
+
+    def encode_array(self, path, arr):
+        """
+        :return: :class:`EncodedArray` or arr if it was not encoded.
+        """
+        raise NotImplementedError()
+
+    def decode_array(self, path, encoded):
+        raise NotImplementedError()
+
+    def _encode(self, path, obj):
+        if not isinstance(obj, numpy.ndarray) or obj.dtype.hasobject:
+            return obj
+        return self.encode_array(path, obj)
+
+    def _decode(self, path, obj):
+        if not isinstance(obj, EncodedArray):
+            return obj
+        return self.decode_array(path, obj)
+
+    def _walk(self, data, path, fn):
+        if type(data) is list:
+            return [self._walk(v, path + (i,), fn)
+                    for i, v in enumerate(data)]
+        if type(data) is tuple:
+            return tuple(self._walk(v, path + (i,), fn)
+                         for i, v in enumerate(data))
+        if type(data) is dict:
+            return {k: self._walk(v, path + (k,), fn)
+                    for k, v in data.items()}
+        return fn(path, data)
+
+
+class XorDeltaEncoder(UpdateEncoder):
+    """
+    Lossless: sends the bitwise XOR with the last version of the same array
+    which the peer has acknowledged (see :meth:`ack`). The unchanged bits
+    become zeros, so this is intended to be used together with the network
+    compression. The messages which were encoded but never reached the peer
+    do not break the decoding of the next ones.
+    """
+    MAPPING = "xor"
+
+    def __init__(self):
+        super(XorDeltaEncoder, self).__init__()
+        # generation -> {path: array} of the messages not acknowledged yet
+        self._sent = {}
+
+    @staticmethod
+    def bits(arr):
+        return arr.view("u%d" % arr.dtype.itemsize)
+
+    def ack(self, generation):
+        for gen in sorted(self._sent):
+            if gen > generation:
+                break
+            for path, arr in self._sent.pop(gen).items():
+                self._state[path] = gen, arr
+
+    def encode_array(self, path, arr):
+        if arr.dtype.kind not in "biuf" or arr.dtype.itemsize not in \
+                (1, 2, 4, 8):
+            return arr
+        arr = numpy.ascontiguousarray(arr)
+        self._sent.setdefault(self.generation, {})[path] = arr.copy()
+        base, prev = self._state.get(path, (None, None))
+        if prev is None or prev.shape != arr.shape or \
+                prev.dtype != arr.dtype:
+            return EncodedArray("raw", arr.dtype, arr.shape,
+                                (self.generation, None, arr))
+        return EncodedArray("xor", arr.dtype, arr.shape,
+                            (self.generation, base,
+                             self.bits(arr) ^ self.bits(prev)))
+
+    def decode_array(self, path, encoded):
+        generation, base, payload = encoded.payload
+        versions = self._state.setdefault(path, {})
+        if encoded.kind == "raw":
+            arr = numpy.array(payload)
+        else:
+            prev = versions.get(base)
+            if prev is None:
+                raise ValueError(
+                    "Generation %d of %s is missing" % (base, path))
+            arr = (payload ^ self.bits(prev)).view(encoded.dtype)
+            # the peer never refers to the versions older than base again
+            for gen in [g for g in versions if g < base]:
+                del versions[gen]
+        versions[generation] = arr.copy()
+        self.generation = max(self.generation, generation)
+        return arr
+
+
+class TopKEncoder(UpdateEncoder):
+    """
+    Lossy: sends only the largest by magnitude topk_ratio share of each
+    floating point array. What is left is accumulated and added to the next
+    version of the same array (error feedback). Suitable for the gradients,
+    not for the weights.
+    """
+    MAPPING = "topk"
+    MIN_SIZE = 1024
+
+    def __init__(self):
+        super(TopKEncoder, self).__init__()
+        self.ratio = root.common.engine.update_encoding.topk_ratio
+
+    def encode_array(self, path, arr):
+        if arr.dtype.kind != "f" or arr.size < TopKEncoder.MIN_SIZE:
+            return arr
+        residual = self._state.get(path)
+        if residual is not None and residual.size == arr.size and \
+                residual.dtype == arr.dtype:
+            vec = arr.ravel() + residual
+        else:
+            vec = arr.ravel().copy()
+        k = max(1, int(ceil(self.ratio * vec.size)))
+        indices = numpy.argpartition(numpy.abs(vec), vec.size - k)[-k:]
+        values = vec[indices]
+        vec[indices] = 0
+        self._state[path] = vec
+        return EncodedArray("topk", arr.dtype, arr.shape,
+                            (indices.astype(numpy.uint32), values))
+
+    def decode_array(self, path, encoded):
+        indices, values = encoded.payload
+        arr = numpy.zeros(int(numpy.prod(encoded.shape)), encoded.dtype)
+        arr[indices] = values
+        return arr.reshape(encoded.shape)
+
+
+class Float16Encoder(UpdateEncoder):
+    """
+    Lossy: sends floating point arrays as float16.
+    """
+    MAPPING = "float16"
+
+    def encode_array(self, path, arr):
+        if arr.dtype.kind != "f" or arr.dtype.itemsize <= 2:
+            return arr
+        return EncodedArray("float16", arr.dtype, arr.shape,
+                            arr.astype(numpy.float16))
+
+    def decode_array(self, path, encoded):
+        return encoded.payload.astype(encoded.dtype)
+
+
+class UpdateEncoding(object):
+    """
+    Pair of encoders of the jobs (master -> slave) and of the updates
+    (slave -> master) negotiated with a single peer.
+    """
+
+    def __init__(self, job=None, update=None):
+        self.names = {"job": job, "update": update}
+        self.job = self.create(job)
+        self.update = self.create(update)
+        # the slave applies its own updates in async mode, mirroring master
+        self.update_mirror = self.create(update)
+
+    @property
+    def active(self):
+        return self.job is not None or self.update is not None
+
+    def encode_job(self, data):
+        """
+        Run by the master. Acknowledges the last decoded update.
+        """
+        return self._encode(data, self.job, self.update)
+
+    def decode_job(self, data):
+        """
+        Run by the slave.
+        """
+        return self._decode(data, self.job, self.update)
+
+    def encode_update(self, data):
+        """
+        Run by the slave. Acknowledges the last decoded job.
+        """
+        return self._encode(data, self.update, self.job)
+
+    def decode_update(self, data):
+        """
+        Run by the master.
+        """
+        return self._decode(data, self.update, self.job)
+
+    def decode_own_update(self, data):
+        """
+        Run by the slave which applies its own updates in async mode.
+        """
+        return self._decode(data, self.update_mirror, None)
+
+    def _encode(self, data, encoder, decoder):
+        if not self.active:
+            return data
+        if encoder is not None:
+            data = encoder.encode(data)
+        return EncodedMessage(
+            data, decoder.generation if decoder is not None else 0)
+
+    @staticmethod
+    def _decode(data, decoder, peer_encoder):
+        if not isinstance(data, EncodedMessage):
+            return data
+        if peer_encoder is not None:
+            peer_encoder.ack(data.ack)
+        if decoder is not None:
+            return decoder.decode(data.payload)
+        return data.payload
+
+    @staticmethod
+    def create(name):
+        if name is None:
+            return None
+        return UpdateEncoderRegistry.encoders[name]()
+
+    @staticmethod
+    def supported():
+        return sorted(UpdateEncoderRegistry.encoders)
+
+    @staticmethod
+    def negotiate(supported):
+        """
+        Chooses the encodings configured in
+        root.common.engine.update_encoding which the slave supports.
+        """
+        cfg = root.common.engine.update_encoding
+        return UpdateEncoding(
+            *(cfg[kind] if cfg[kind] in supported else None
+              for kind in ("job", "update")))
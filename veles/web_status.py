@@ -56,6 +56,7 @@ import tornado.web as web
 
 from veles.compat import PermissionError, BrokenPipeError
 from veles.config import root
+from veles.event_aggregator import EventAggregator
 import veles.external.daemon as daemon
 from veles.logger import Logger
 
@@ -147,6 +148,12 @@ class WebServer(Logger):
             "mongo_drop_time_threshold", root.common.web.drop_time)
         self.mongo_dropper = PeriodicCallback(
             self.drop_old_mongo_records, self.mongo_drop_time_threshold * 1000)
+        self.event_aggregator = EventAggregator(
+            root.common.web.metrics.resolutions, root.common.web.metrics.lag)
+        self.event_aggregator.watermark = \
+            time.time() - self.event_aggregator.retention
+        self.events_poller = PeriodicCallback(
+            self.poll_events, root.common.web.notification_interval * 1000)
 
     @property
     def port(self):
@@ -193,6 +200,23 @@ class WebServer(Logger):
             self.info("Removed %d sessions in %s with status %s",
                       ack["n"], col, "ok" if ack["ok"] else "error")
 
+    @gen.coroutine
+    def poll_events(self):
+        """
+        Feeds the new events from MongoDB to the event aggregator.
+        """
+        aggregator = self.event_aggregator
+        cursor = self.db.events.find(
+            {"time": {"$gt": aggregator.watermark - aggregator.lag}}).sort(
+            "time", 1)
+        events = []
+        while (yield cursor.fetch_next):
+            events.append(cursor.next_object())
+        added = aggregator.update(events)
+        aggregator.expire(time.time() - self.mongo_drop_time_threshold)
+        if added > 0:
+            self.debug("Aggregated %d events", added)
+
     @gen.coroutine
     def receive_request(self, handler, data):
         rtype = data["request"]
@@ -238,6 +262,12 @@ class WebServer(Logger):
                 count += 1
             handler.finish("]}")
             self.debug("Fetched %d \"%s\" documents", count, rtype)
+        elif rtype == "metrics":
+            # Served from memory, the arguments are those of
+            # EventAggregator.query()
+            handler.finish({"request": rtype,
+                            "result": self.event_aggregator.query(
+                                **data["args"])})
         else:
             handler.finish({"request": rtype, "result": None})
 
@@ -256,10 +286,12 @@ class WebServer(Logger):
             self.port)
         IOLoop.instance().add_callback(self.drop_old_mongo_records)
         self.mongo_dropper.start()
+        self.events_poller.start()
         IOLoop.instance().start()
 
     def stop(self):
         self.mongo_dropper.stop()
+        self.events_poller.stop()
         IOLoop.instance().stop()
 
 
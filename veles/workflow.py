@@ -63,10 +63,12 @@ from veles.json_encoders import NumpyJSONEncoder
 from veles.result_provider import IResultProvider
 from veles.units import Unit, IUnit, Container
 from veles.plumbing import StartPoint, EndPoint, Repeater
+from veles.update_encoding import EncodedMessage, UpdateEncoding
 from veles.external.prettytable import PrettyTable
 from veles.external.progressbar import ProgressBar, Percentage, Bar
 import veles.external.pydot as pydot
 from veles.timeit2 import timeit
+from veles.tracer import tracer
 
 
 class MultiMap(OrderedDict):
@@ -96,6 +98,8 @@ class Workflow(Container):
         _units: the list of units belonging to this Workflow, in
                 semi-alphabetical order.
         _sync: flag which makes Workflow.run() either blocking or non-blocking.
+        compiled_plan: compile the execution plan after initialize(), see
+                       compile_plan().
         _sync_event_: threading.Event enabling synchronous run().
         _run_time: the total time workflow has been running for.
         _method_time: Workflow's method timings measured by method_timed
@@ -110,6 +114,8 @@ class Workflow(Container):
         self._sync = kwargs.get("sync", True)  # do not move down
         self._units = tuple()
         self._result_file = kwargs.get("result_file")
+        self.compiled_plan = kwargs.get(
+            "compiled_plan", root.common.engine.compiled_plan)
         super(Workflow, self).__init__(workflow,
                                        generate_data_for_slave_threadsafe=True,
                                        apply_data_from_slave_threadsafe=True,
@@ -135,6 +141,7 @@ class Workflow(Container):
         self._sync_event_.set()
         self._run_time_ = 0
         self._method_time_ = {"run": 0}
+        self._update_encodings_ = {}
         del Unit.timers[self.id]
         units = self._units
         self._units = MultiMap()
@@ -304,6 +311,7 @@ class Workflow(Container):
         """Initializes all the units belonging to this Workflow, in dependency
         order.
         """
+        tracer.configure()
         units_number = len(self)
         fin_text = "%d units were initialized" % units_number
         maxlen = max([len(u.name) for u in self] + [len(fin_text)])
@@ -347,6 +355,21 @@ class Workflow(Container):
                          units_number - initialized_units_number,
                          set(self) - set(units_in_dependency_order))
         self._restored_from_snapshot_ = None
+        if getattr(self, "compiled_plan", False):
+            self.compile_plan()
+
+    def compile_plan(self):
+        """Caches the sorted links of every unit, so that run_dependent()
+        executes sequential chains inline and dispatches only the parallel
+        branches to the thread pool. Relinking a unit drops its cache.
+        """
+        fanouts = joins = 0
+        for unit in self:
+            unit.compile_links()
+            fanouts += len(unit.links_to) > 1
+            joins += len(unit.links_from) > 1
+        self.debug("Compiled the execution plan of %d units: %d fan-outs, "
+                   "%d joins", len(self), fanouts, joins)
 
     def run(self):
         """Starts executing the workflow. This function is synchronous
@@ -469,6 +492,9 @@ class Workflow(Container):
                     raise
             else:
                 data.append(None)
+        encoding = self._update_encodings_.get(None)
+        if encoding is not None:
+            data = encoding.encode_update(data)
         self.event("generate_data", "end")
         self.debug("Done with generating the update for master")
         return data
@@ -506,6 +532,9 @@ class Workflow(Container):
                     raise
             else:
                 data.append(None)
+        encoding = self._update_encodings_.get(slave.id)
+        if encoding is not None:
+            data = encoding.encode_job(data)
         self.event("generate_data", "end", slave=slave.id)
         self.debug("Done with generating a job for slave %s", slave.id)
         return data
@@ -513,6 +542,9 @@ class Workflow(Container):
     @run_timed
     @method_timed
     def apply_data_from_master(self, data):
+        encoding = self._update_encodings_.get(None)
+        if encoding is not None:
+            data = encoding.decode_job(data)
         if not isinstance(data, list):
             raise ValueError("data must be a list")
         self.debug("Applying the job from master")
@@ -531,6 +563,18 @@ class Workflow(Container):
     @run_timed
     @method_timed
     def apply_data_from_slave(self, data, slave):
+        encoding = self._update_encodings_.get(
+            slave.id if slave is not None else None)
+        if encoding is not None:
+            data = encoding.decode_update(data) if slave is not None \
+                else encoding.decode_own_update(data)
+        elif isinstance(data, EncodedMessage):
+            # The deltas refer to the state which was discarded in
+            # drop_slave(), so they cannot be applied
+            self.warning("Discarded the encoded update from slave %s which "
+                         "has been dropped", slave.id if slave is not None
+                         else "self")
+            return False
         if not isinstance(data, list):
             raise ValueError("data must be a list")
         sid = slave.id if slave is not None else "self"
@@ -552,9 +596,29 @@ class Workflow(Container):
     def drop_slave(self, slave):
         for i in range(len(self)):
             self[i].drop_slave(slave)
+        self._update_encodings_.pop(slave.id, None)
         self.event("drop_slave", "single", slave=slave.id)
         self.warning("Dropped the job from %s", slave.id)
 
+    def negotiate_update_encoding(self, slave_id, supported):
+        """
+        Chooses the encodings of the jobs and the updates for the slave which
+        supports the specified encoders. Run by a master.
+        :return: The chosen encodings which must be sent to the slave.
+        """
+        encoding = UpdateEncoding.negotiate(supported)
+        self._update_encodings_[slave_id] = encoding
+        self.debug("Negotiated the update encoding with %s: %s", slave_id,
+                   encoding.names)
+        return encoding.names
+
+    def set_update_encoding(self, names):
+        """
+        Applies the encodings of the jobs and the updates chosen by master.
+        Run by a slave.
+        """
+        self._update_encodings_[None] = UpdateEncoding(**(names or {}))
+
     def do_job(self, data, update, callback):
         """
         Executes this workflow on the given source data. Run by a slave.
@@ -823,6 +887,8 @@ class Workflow(Container):
                               datetime.timedelta(seconds=time_all))
             if time_all > 0:
                 self.info(u"Workflow methods run time:\n%s", table)
+        if tracer.enabled:
+            tracer.print_summary()
 
     def gather_results(self):
         results = {"id": self.launcher.id, "log_id": self.launcher.log_id}